@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+'''Compare the memory used by attachment dictionaries and records
+
+The attachments used to be dictionaries, with a key for each value. They
+are now :class:`gs.group.list.base.attachment.Attachment` instances, which
+keep their values in ``__slots__``. This script creates 100,000 of each,
+and reports the memory that is used by the instances (not the payloads,
+which are shared)::
+
+    $ python benchmarks/attachments.py [count]
+
+:mod:`tracemalloc` is needed, so Python 3.4 or later is required.'''
+import sys
+import tracemalloc
+from gs.group.list.base.attachment import Attachment
+
+PAYLOAD = b'Tonight on Ethel the Frog we look at violence.\n'
+
+
+def make_dict(i):
+    retval = {
+        'payload': PAYLOAD, 'fileid': '2kxkamRQ35fmTJ6pTRK8yN',
+        'filename': '', 'length': len(PAYLOAD), 'md5': None,
+        'charset': 'utf-8', 'maintype': 'text', 'subtype': 'plain',
+        'mimetype': 'text/plain', 'contentid': '', }
+    return retval
+
+
+def make_attachment(i):
+    retval = Attachment(
+        payload=PAYLOAD, fileid='2kxkamRQ35fmTJ6pTRK8yN', filename='',
+        length=len(PAYLOAD), md5=None, charset='utf-8', maintype='text',
+        subtype='plain', mimetype='text/plain', contentid='')
+    return retval
+
+
+def measure(factory, count):
+    tracemalloc.start()
+    items = [factory(i) for i in range(count)]
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(items) == count
+    return size
+
+
+def main(count=100000):
+    dictSize = measure(make_dict, count)
+    attachmentSize = measure(make_attachment, count)
+    m = '{0:<12} {1:>12,} bytes {2:>8.1f} bytes/part'
+    print(m.format('dict', dictSize, dictSize / count))
+    print(m.format('Attachment', attachmentSize, attachmentSize / count))
+    saving = 100.0 * (dictSize - attachmentSize) / dictSize
+    print('Saving: {0:.1f}%'.format(saving))
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    main(count)
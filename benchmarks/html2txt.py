@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+'''Compare concatenating the text with buffering it in lists
+
+The :class:`gs.group.list.base.html2txt.HTMLConverter` collects the
+text in lists, which are joined once. This script times it against a
+converter that concatenates strings (as it used to) on a large HTML
+document, with many small text nodes and entity references. It also
+times the :class:`gs.group.list.base.html2txt.StreamingHTMLConverter`,
+fed 64KiB at a time::
+
+    $ python benchmarks/html2txt.py [megabytes]'''
+import sys
+from timeit import default_timer
+from gs.group.list.base.html2txt import (HTMLConverter,
+                                         iter_convert_to_txt)
+
+
+class ConcatenatingConverter(HTMLConverter):
+    'A converter that concatenates the text, rather than buffering it'
+    outText = ''
+
+    def handle_starttag(self, tag, attrs):
+        HTMLConverter.handle_starttag(self, tag, attrs)
+        if tag == 'p':
+            self.outP = ''
+
+    def handle_endtag(self, tag):
+        if tag == 'p':
+            self.outP = [self.outP]
+            self.emit(self.end_paragraph())
+        else:
+            HTMLConverter.handle_endtag(self, tag)
+
+    def emit(self, c):
+        if self.outP is None:
+            self.outText = self.outText + c
+        else:
+            self.outP = self.outP + c
+
+
+def make_html(size):
+    sentence = (
+        'Ethel the <b>Frog</b> &amp; the <i>Piranha</i> brothers '
+        '&mdash; caf&eacute; na&iuml;ve &#8220;quoted&#8221; '
+        '<a href="http://example.com/">a link</a>. ')
+    paragraph = '<p>' + (sentence * 20) + '</p>\n'
+    document = ['<html><body>']
+    # Mix of long paragraphs, and text outside the paragraphs
+    n = 0
+    while n < size:
+        document.append(paragraph)
+        document.append('<div>Not in a <span>paragraph</span> &lt;</div>')
+        n += len(paragraph) + 45
+    document.append('</body></html>')
+    retval = ''.join(document)
+    return retval
+
+
+def convert(converterClass, html):
+    converter = converterClass()
+    start = default_timer()
+    converter.feed(html)
+    converter.close()
+    retval = '{0}'.format(converter)
+    t = default_timer() - start
+    return t, retval
+
+
+def stream(html, size=65536):
+    chunks = (html[i:i + size] for i in range(0, len(html), size))
+    start = default_timer()
+    retval = '\n\n'.join(iter_convert_to_txt(chunks))
+    t = default_timer() - start
+    return t, retval
+
+
+def main(megabytes=4):
+    html = make_html(int(megabytes * 1024 * 1024))
+    m = '{0:<14} {1:>8.2f} s {2:>12,} characters'
+    for name, converterClass in (('concatenate', ConcatenatingConverter),
+                                 ('buffer', HTMLConverter)):
+        t, text = convert(converterClass, html)
+        print(m.format(name, t, len(text)))
+    t, text = stream(html)
+    print(m.format('stream', t, len(text)))
+
+if __name__ == '__main__':
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    main(megabytes)
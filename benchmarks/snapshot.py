@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+'''Compare parsing a message again with loading a snapshot
+
+A message that is parsed in one process can be passed to another as the
+raw message (which is parsed again), or as a
+:class:`gs.group.list.base.snapshot.ParsedPost` (as a pickle, or in the
+binary format). This script times each, using the test messages::
+
+    $ python benchmarks/snapshot.py [repeats]'''
+from glob import glob
+import os
+from pickle import dumps, loads, HIGHEST_PROTOCOL
+from pkg_resources import resource_filename
+import sys
+from timeit import timeit
+from gs.group.list.base.emailmessage import EmailMessage
+from gs.group.list.base.snapshot import ParsedPost
+
+
+def load_messages():
+    dirName = resource_filename('gs.group.list.base',
+                                os.path.join('tests', 'emails'))
+    retval = []
+    for fileName in sorted(glob(os.path.join(dirName, '*.eml'))):
+        with open(fileName, 'rb') as infile:
+            retval.append(infile.read())
+    return retval
+
+
+def main(repeats=100):
+    messages = load_messages()
+    snapshots = [EmailMessage(m).snapshot() for m in messages]
+    pickles = [dumps(s, HIGHEST_PROTOCOL) for s in snapshots]
+    binaries = [s.to_bytes() for s in snapshots]
+
+    def reparse():
+        for m in messages:
+            EmailMessage(m).snapshot()
+
+    def unpickle():
+        for p in pickles:
+            loads(p)
+
+    def frombytes():
+        for b in binaries:
+            ParsedPost.from_bytes(b)
+
+    m = '{0:<10} {1:>10.1f} µs/message {2:>8,} bytes'
+    n = repeats * len(messages)
+    for name, f, data in (('reparse', reparse, messages),
+                          ('pickle', unpickle, pickles),
+                          ('bytes', frombytes, binaries)):
+        t = timeit(f, number=repeats)
+        size = sum(len(d) for d in data)
+        print(m.format(name, t / n * 1e6, size))
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    main(repeats)
@@ -1,6 +1,19 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 #lint:disable
-from .emailmessage import EmailMessage
+from .attachment import (Attachment, AttachmentInfo)
+from .attachmentstore import FileAttachmentStore
+from .batch import parse_many
+from .builder import (EmailMessageBuilder, MessageTooLargeError)
+from .cache import LRUCache
+from .charset import CharsetResolver
+from .emailmessage import (CompactedMessageError, EmailMessage)
+from .listcontext import (get_list_context, ListContext)
+from .parsecache import ParseCache
+from .postidfilter import PostIdFilter
 from .replyto import (replyto, ReplyTo)
+from .senderid import (CachedSenderIdCallback, CallbackResolver,
+                       resolve_sender_ids)
+from .snapshot import ParsedPost
+from .subject import (SubjectMode, SubjectStripper)
 #lint:enable
@@ -0,0 +1,535 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from base64 import b64decode
+from collections import namedtuple
+from hashlib import md5
+from io import BytesIO, StringIO
+from quopri import decodestring
+import sys
+from tempfile import SpooledTemporaryFile
+from threading import Lock
+from gs.core import to_unicode_or_bust, convert_int2b62
+from .charset import charsetResolver
+
+if (sys.version_info < (3, )):
+    INT = long
+    unicodeOrString = unicode
+    bytesOrString = str
+else:
+    INT = int
+    unicodeOrString = str
+    bytesOrString = bytes
+
+
+#: The metadata about an attachment, without the payload.
+AttachmentInfo = namedtuple(
+    'AttachmentInfo', ['fileid', 'filename', 'length', 'md5', 'charset',
+                       'mimetype', 'contentid'])
+
+#: The number of zero-bytes between the saved MD5 states (see
+#: :func:`md5_zeros`).
+ZERO_CHECKPOINT = 16 * 1024 * 1024
+#: The size of the blocks used to decode a payload.
+BLOCK_SIZE = 64 * 1024
+zeroBlock = b'\x00' * (1024 * 1024)
+zeroCheckpoints = [md5()]
+zeroCheckpointsLock = Lock()
+
+
+def md5_zeros(n):
+    '''Get the MD5 sum of a run of zero-bytes
+
+:param int n: The number of zero-bytes.
+:returns: The MD5 object, having been updated with the zero-bytes.
+
+The MD5 object after every :const:`ZERO_CHECKPOINT` zero-bytes is saved,
+so only the remainder has to be hashed the next time a long run is
+needed. The new checkpoints are hashed without holding the lock on the
+saved states, so other threads are not blocked.'''
+    checkpoint, remainder = divmod(n, ZERO_CHECKPOINT)
+    retval = None
+    while retval is None:
+        with zeroCheckpointsLock:
+            known = len(zeroCheckpoints)
+            if checkpoint < known:
+                retval = zeroCheckpoints[checkpoint].copy()
+            else:
+                m = zeroCheckpoints[-1].copy()
+        if retval is None:
+            update_zeros(m, ZERO_CHECKPOINT)
+            with zeroCheckpointsLock:
+                # Another thread may have saved the checkpoint already
+                if len(zeroCheckpoints) == known:
+                    zeroCheckpoints.append(m)
+    update_zeros(retval, remainder)
+    return retval
+
+
+def update_zeros(md5_sum, n):
+    '''Update an MD5 object with a run of zero-bytes
+
+:param md5_sum: The MD5 object to update.
+:param int n: The number of zero-bytes.'''
+    blocks, remainder = divmod(n, len(zeroBlock))
+    for i in range(blocks):
+        md5_sum.update(zeroBlock)
+    md5_sum.update(zeroBlock[:remainder])
+
+
+class FileIdHasher(object):
+    '''Calculate the identifier of a file a block at a time
+
+Calling :meth:`update` with each block of the file, and then
+:meth:`file_id`, produces the same identifier as
+:func:`calculate_file_id`.'''
+    def __init__(self):
+        self.length = 0
+        self.md5 = None
+        # The zero-bytes that have yet to be added to the MD5
+        self.zeros = 0
+
+    def update(self, data):
+        '''Add a block of the file
+
+:param data: The next block of the file, as bytes or a string.'''
+        self.length += len(data)
+        if isinstance(data, unicodeOrString):
+            self.update_md5(data.encode('ascii', 'xmlcharrefreplace'))
+        elif isinstance(data, bytesOrString) and (bytesOrString == str):
+            # Python 2
+            self.update_md5(data)
+        elif ((bytesOrString != str)
+              and isinstance(data, (bytes, bytearray, memoryview))):
+            # --=mpj17=-- In Python 3 each item of a bytes-like object is
+            # an int, and bytes(i) is a run of i zero-bytes. So the MD5 has
+            # always been of a run of zero-bytes that is as long as the sum
+            # of the bytes. That is kept, so the identifiers stay the same.
+            self.zeros += sum(data)
+        else:
+            for c in data:
+                if type(c) == unicodeOrString:
+                    self.update_md5(c.encode('ascii', 'xmlcharrefreplace'))
+                else:
+                    self.update_md5(bytesOrString(c))
+
+    def update_md5(self, data):
+        if self.md5 is None:
+            self.md5 = md5_zeros(self.zeros)
+        else:
+            update_zeros(self.md5, self.zeros)
+        self.zeros = 0
+        self.md5.update(data)
+
+    def file_id(self, mime_type):
+        '''Get the file identifier
+
+:param string mime_type: The MIME-type of the file
+:returns: A 3-tuple of ``(identifier, length, fileMD5)``'''
+        if self.md5 is None:
+            md5_sum = md5_zeros(self.zeros)
+        else:
+            md5_sum = self.md5.copy()
+            update_zeros(md5_sum, self.zeros)
+        file_md5 = md5_sum.hexdigest()
+        lenStr = ':%d:' % self.length
+        md5_sum.update(lenStr.encode('ascii', 'xmlcharrefreplace'))
+        mimeStr = to_unicode_or_bust(mime_type)
+        md5_sum.update(mimeStr.encode('ascii', 'xmlcharrefreplace'))
+        vNum = convert_int2b62(INT(md5_sum.hexdigest(), 16))
+        retval = (to_unicode_or_bust(vNum), self.length, file_md5)
+        return retval
+
+
+def calculate_file_id(file_body, mime_type):
+    '''Generate a new identifer for a file
+
+:param bytes file_body: The body of the file
+:param string mime_type: The MIME-type of the file
+:returns: A 3-tuple of ``(identifier, length, fileMD5)``
+
+Two files will have the same ID if
+
+* They have the same MD5 Sum, *and*
+* They have the same length, *and*
+* They have the same MIME-type.'''
+    hasher = FileIdHasher()
+    hasher.update(file_body)
+    retval = hasher.file_id(mime_type)
+    return retval
+
+
+def iter_base64(encoded, blockSize):
+    '''Decode base64 a block at a time
+
+:param str encoded: The encoded payload.
+:param int blockSize: The number of characters to decode at once.
+:returns: A generator of decoded blocks.
+:raises ValueError: The payload is not strictly valid base64, so it has
+                    to be decoded all at once.'''
+    # The padding, and any trailing newlines, goes in the last block
+    contentEnd = len(encoded)
+    while (contentEnd > 0) and (encoded[contentEnd - 1] in '\r\n='):
+        contentEnd -= 1
+    remainder = b''
+    for i in range(0, contentEnd, blockSize):
+        last = (i + blockSize) >= contentEnd
+        end = len(encoded) if last else (i + blockSize)
+        block = encoded[i:end].encode('ascii')
+        block = remainder + block.replace(b'\r', b'').replace(b'\n', b'')
+        if last:
+            # Fix the padding, like email.message.Message.get_payload does
+            padErr = len(block) % 4
+            block += b'==='[:4 - padErr] if padErr else b''
+        elif b'=' in block:
+            raise ValueError('Padding before the end of the payload')
+        else:
+            blockEnd = len(block) - (len(block) % 4)
+            block, remainder = block[:blockEnd], block[blockEnd:]
+        yield b64decode(block, validate=True)
+
+
+def iter_quoted_printable(encoded, blockSize):
+    '''Decode quoted-printable a block of lines at a time
+
+:param str encoded: The encoded payload.
+:param int blockSize: The (approximate) number of characters to decode at
+                      once.
+:returns: A generator of decoded blocks.'''
+    start = 0
+    while start < len(encoded):
+        end = encoded.find('\n', start + blockSize)
+        end = len(encoded) if end == -1 else end + 1
+        yield decodestring(encoded[start:end].encode('ascii'))
+        start = end
+
+
+#: The decoders that can decode a payload a block at a time.
+blockDecoders = {
+    'base64': iter_base64,
+    'quoted-printable': iter_quoted_printable, }
+
+
+def iter_decoded(part, blockSize=BLOCK_SIZE):
+    '''Decode the payload of part of a message a block at a time
+
+:param part: The part of the message.
+:type part: :class:`email.message.Message`
+:param int blockSize: The (approximate) size of the encoded blocks.
+:returns: A generator of decoded blocks, which join to make the same
+          payload as :meth:`email.message.Message.get_payload` does.
+:raises ValueError: The payload cannot be decoded a block at a time.'''
+    cte = str(part.get('content-transfer-encoding', '')).lower()
+    encoded = part.get_payload(decode=False)
+    if (sys.version_info < (3, )) or (cte not in blockDecoders):
+        raise ValueError('Cannot decode {0} in blocks'.format(cte))
+    if not isinstance(encoded, unicodeOrString):
+        raise ValueError('The payload is not a string')
+    # --=mpj17=-- The decoders raise a UnicodeEncodeError, which is a
+    # ValueError, if the payload is not ASCII (and the email package would
+    # do something odd).
+    return blockDecoders[cte](encoded, blockSize)
+
+
+def has_raw_bytes(part):
+    '''Check if the payload of part of a message holds undecoded bytes
+
+:param part: The part of the message.
+:type part: :class:`email.message.Message`
+:returns: ``True`` if the part was parsed from bytes, and its payload has
+          bytes that are not ASCII.'''
+    # --=mpj17=-- The email.parser.BytesParser keeps the bytes that are not
+    # ASCII as lone surrogates in the payload, which is what the email
+    # package looks for. A payload parsed from a string never has them.
+    payload = part._payload
+    retval = False
+    if (sys.version_info >= (3, )) and isinstance(payload, str):
+        try:
+            payload.encode('utf-8')
+        except UnicodeEncodeError:
+            retval = True
+    return retval
+
+
+class Attachment(object):
+    '''A file attached to an email message
+
+:param payload: The content of the attachment.
+:param str fileid: The GroupServer file identifier.
+:param str filename: The name of the file.
+:param int length: The length of the file.
+:param str md5: The MD5 sum of the file.
+:param str charset: The character set of the file, or ``None``.
+:param str maintype: The main-type of the MIME-type.
+:param str subtype: The sub-type of the MIME-type.
+:param str mimetype: The MIME-type of the file.
+:param str contentid: The :mailheader:`Content-ID` of the file.
+:param int spool_threshold: The size above which the payload is spooled
+                            to disk, or ``None`` to always keep the
+                            payload in memory.
+:param part: The part of the message that holds the attachment.
+:type part: :class:`email.message.Message`
+
+The attributes of the attachment can also be accessed like a dictionary
+(``attachment['payload']``) because the attachments used to be
+dictionaries.
+
+If the ``part`` is given then the ``payload``, ``fileid``, ``length`` and
+``md5`` are ignored. Instead the part is decoded the first time that the
+:attr:`payload` is accessed, and the identifier calculated the first time
+that the :attr:`fileid`, :attr:`length` or :attr:`md5` is accessed (see
+:meth:`from_part`). The decoded payload is only held if it is needed.
+
+A payload that is larger than the ``spool_threshold`` is written to a
+:class:`tempfile.SpooledTemporaryFile`, rather than being held in memory.
+It is read back every time the :attr:`payload` is accessed, so large
+payloads are better read through the file-like object returned by
+:meth:`open`.
+
+Digests and archives keep thousands of attachments in memory, so the
+attributes are held in ``__slots__`` rather than in a dictionary for each
+attachment.'''
+    fields = ('payload', 'fileid', 'filename', 'length', 'md5', 'charset',
+              'maintype', 'subtype', 'mimetype', 'contentid')
+    __slots__ = ('filename', 'charset', 'maintype', 'subtype', 'mimetype',
+                 'contentid', 'spool_threshold', 'spool', 'memoryPayload',
+                 'fileIdentifier', 'part')
+
+    def __init__(self, payload=None, fileid=None, filename='', length=0,
+                 md5=None, charset=None, maintype='', subtype='',
+                 mimetype='', contentid='', spool_threshold=None,
+                 part=None):
+        self.filename = filename
+        self.charset = charset
+        self.maintype = maintype
+        self.subtype = subtype
+        self.mimetype = mimetype
+        self.contentid = contentid
+        self.spool_threshold = spool_threshold
+        self.spool = None
+        self.memoryPayload = None
+        self.fileIdentifier = None
+        self.part = part
+        if part is None:
+            self.set_payload(payload, fileid, length, md5)
+
+    @classmethod
+    def from_part(cls, part, charset, spool_threshold=None):
+        '''Create an attachment from part of a message
+
+:param part: The part of the message that holds the attachment.
+:type part: :class:`email.message.Message`
+:param str charset: The character set of the attachment.
+:param int spool_threshold: The size above which the payload is spooled
+                            to disk.
+:returns: The attachment.
+:rtype: :class:`Attachment`
+
+Only the headers of the part are examined. The payload is decoded when it
+is needed.'''
+        # We only care about filenames in the content-disposion
+        # header, rather than the random ones that are part of the
+        # HTML message.
+        filename = ''
+        if part.get('Content-Disposition', ''):
+            filename = part.get_filename('')
+        retval = cls(filename=filename, charset=charset,
+                     maintype=part.get_content_maintype(),
+                     subtype=part.get_content_subtype(),
+                     mimetype=part.get_content_type(),
+                     contentid=part.get('content-id', ''),
+                     spool_threshold=spool_threshold, part=part)
+        return retval
+
+    @staticmethod
+    def decode_part(part, charset=None):
+        '''Decode the payload of part of a message
+
+:param part: The part of the message.
+:type part: :class:`email.message.Message`
+:param str charset: The character set of the part, which is used to
+                    decode an ``8bit`` payload that was parsed from
+                    bytes.
+:returns: The payload of the part.'''
+        # --=mpj17=-- The decode flag to the
+        # email.message.Message.get_payload method is tricky. I quote
+        # <https://docs.python.org/3.4/library/email.message.html>.
+        #
+        #   When decode is False (the default) the body is returned as a
+        #   string without decoding the Content-Transfer-Encoding.
+        #   However, for a Content-Transfer-Encoding of 8bit, an attempt
+        #   is made to decode the original bytes using the charset
+        #   specified by the Content-Type header, using the replace
+        #   error handler. If no charset is specified, or if the charset
+        #   given is not recognized by the email package, the body is
+        #   decoded using the default ASCII charset.
+        #
+        # So the original bytes (which get_payload(decode=True) returns)
+        # are decoded here by the charset resolver, which corrects the
+        # bogus labels and tries the fallbacks before replacing anything.
+        if part.get('Content-transfer-encoding', '') == '8bit':
+            retval = part.get_payload(decode=False)
+            if has_raw_bytes(part):
+                raw = part.get_payload(decode=True)
+                retval = charsetResolver.decode(raw, charset)
+        else:
+            retval = part.get_payload(decode=True)
+        return retval
+
+    def set_payload(self, payload, fileid, length, md5):
+        self.fileIdentifier = (fileid, length, md5)
+        threshold = self.spool_threshold
+        if ((threshold is not None) and (length > threshold) and
+                (not isinstance(payload, unicodeOrString))):
+            self.spool = SpooledTemporaryFile(max_size=threshold)
+            self.spool.write(payload)
+        else:
+            self.memoryPayload = payload
+
+    def load(self):
+        '''Decode the payload and calculate the file identifier, if that
+has not been done already.'''
+        if self.part is not None:
+            payload = self.decode_part(self.part, self.charset)
+            if self.fileIdentifier is None:
+                fileid, length, md5Sum = calculate_file_id(payload,
+                                                           self.mimetype)
+            else:
+                fileid, length, md5Sum = self.fileIdentifier
+            self.set_payload(payload, fileid, length, md5Sum)
+            self.part = None
+
+    def load_file_id(self):
+        '''Calculate the file identifier, if that has not been done
+already.
+
+Base64 and quoted-printable payloads are decoded a block at a time, with
+each block being passed to a :class:`FileIdHasher`, so the decoded
+payload is not held in memory. Other payloads are decoded all at once by
+:meth:`load`.'''
+        if (self.part is not None) and (self.fileIdentifier is None):
+            hasher = FileIdHasher()
+            try:
+                for block in iter_decoded(self.part):
+                    hasher.update(block)
+            except ValueError:
+                self.load()
+            else:
+                self.fileIdentifier = hasher.file_id(self.mimetype)
+
+    @property
+    def fileid(self):
+        'The GroupServer file identifier'
+        self.load_file_id()
+        return self.fileIdentifier[0]
+
+    @property
+    def length(self):
+        'The length of the payload'
+        self.load_file_id()
+        return self.fileIdentifier[1]
+
+    @property
+    def md5(self):
+        'The MD5 sum of the payload'
+        self.load_file_id()
+        return self.fileIdentifier[2]
+
+    @property
+    def spooled(self):
+        '``True`` if the payload has been spooled to disk'
+        self.load()
+        return self.spool is not None
+
+    @property
+    def payload(self):
+        'The content of the attachment'
+        self.load()
+        if self.spool is not None:
+            self.spool.seek(0)
+            retval = self.spool.read()
+        else:
+            retval = self.memoryPayload
+        return retval
+
+    def open(self):
+        '''Get a file-like object for reading the payload
+
+:returns: A file-like object, at the start of the payload.
+
+The same file-like object is returned for a spooled payload each time
+this method is called, so only read from one at a time.'''
+        self.load()
+        if self.spool is not None:
+            self.spool.seek(0)
+            retval = self.spool
+        elif isinstance(self.memoryPayload, unicodeOrString):
+            retval = StringIO(self.memoryPayload)
+        else:
+            payload = self.memoryPayload
+            retval = BytesIO(payload if payload is not None else b'')
+        return retval
+
+    def info(self):
+        '''Get the metadata about the attachment
+
+:returns: The metadata, without the payload.
+:rtype: :class:`AttachmentInfo`'''
+        retval = AttachmentInfo(self.fileid, self.filename, self.length,
+                                self.md5, self.charset, self.mimetype,
+                                self.contentid)
+        return retval
+
+    def close(self):
+        'Close the spooled file, discarding the payload on the disk.'
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+
+    def __getitem__(self, key):
+        if key not in self.fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        retval = self[key] if key in self.fields else default
+        return retval
+
+    def __contains__(self, key):
+        return key in self.fields
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def keys(self):
+        return list(self.fields)
+
+    def items(self):
+        retval = [(k, self[k]) for k in self.fields]
+        return retval
+
+    def __getstate__(self):
+        # --=mpj17=-- Needed to pickle the slots with protocols 0 and 1.
+        # The spool is a file, so it is read back into memory.
+        self.load()
+        retval = {k: getattr(self, k) for k in self.__slots__}
+        if self.spool is not None:
+            retval['memoryPayload'] = self.payload
+            retval['spool'] = None
+        return retval
+
+    def __setstate__(self, state):
+        for k in self.__slots__:
+            setattr(self, k, state[k])
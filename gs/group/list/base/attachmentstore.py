@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from hashlib import sha256
+import json
+import os
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from zope.interface import implementer
+from .interfaces import IAttachmentStore
+
+#: The size of the blocks the payloads are read and written in
+BLOCK_SIZE = 64 * 1024
+
+
+def replace_file(src, dst):
+    'Rename a file, replacing the destination if it exists'
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)
+    else:  # Python 2
+        os.rename(src, dst)
+
+
+def iter_blocks(attachment):
+    '''Read the payload of an attachment a block at a time
+
+:param attachment: The attachment.
+:type attachment: :class:`.attachment.Attachment`
+:returns: A generator of blocks of bytes.
+
+A text payload (from an ``8bit`` part) is encoded as UTF-8.'''
+    infile = attachment.open()
+    while True:
+        block = infile.read(BLOCK_SIZE)
+        if not block:
+            break
+        if not isinstance(block, bytes):
+            block = block.encode('utf-8')
+        yield block
+
+
+@implementer(IAttachmentStore)
+class FileAttachmentStore(object):
+    '''A content-addressed attachment store in a directory
+
+:param str root: The directory that holds the attachments (which is
+                 created if it does not exist).
+
+The same newsletter logo, or PDF, is attached to many messages. This
+store keeps one copy of each file, keyed by the
+:attr:`.attachment.Attachment.fileid`, and counts the references to it.
+:meth:`put` only writes an attachment that is not already stored, and
+:meth:`release` only deletes it when the last reference is released.
+
+Two different files can have the same ``fileid`` (see
+:func:`.attachment.calculate_file_id`), so the SHA-256 of each stored
+file is recorded as well. A file with the same ``fileid`` as a stored
+file, but different content, is stored with a numeric suffix on the key
+(``fileid-1``). Always use the key returned by :meth:`put`.
+
+Each file is stored as ``root/xx/key``, where ``xx`` is the first two
+characters of the key, with the metadata (including the reference
+count) in ``root/xx/key.json``. The store is safe to use from many
+threads, but not from many processes at once.'''
+    def __init__(self, root):
+        self.root = root
+        self.lock = Lock()
+        if not os.path.isdir(root):
+            os.makedirs(root)
+
+    def path(self, key):
+        '''Get the path to a stored file
+
+:param str key: The key for the file.
+:returns: The path to the file.
+:rtype: str'''
+        if ((not key) or ('/' in key) or (os.sep in key) or
+                key.startswith('.')):
+            raise ValueError('Invalid key "{0}"'.format(key))
+        retval = os.path.join(self.root, key[:2], key)
+        return retval
+
+    def read_meta(self, key):
+        retval = None
+        try:
+            with open(self.path(key) + '.json', 'r') as infile:
+                retval = json.load(infile)
+        except IOError:  # Not stored. (Python 2 lacks FileNotFoundError)
+            pass
+        return retval
+
+    def write_meta(self, key, meta):
+        path = self.path(key) + '.json'
+        with NamedTemporaryFile('w', dir=os.path.dirname(path),
+                                delete=False) as outfile:
+            json.dump(meta, outfile)
+        replace_file(outfile.name, path)
+
+    @staticmethod
+    def hash_payload(attachment):
+        '''Calculate the SHA-256 of the payload of an attachment
+
+:returns: The hex-digest of the payload.
+:rtype: str'''
+        h = sha256()
+        for block in iter_blocks(attachment):
+            h.update(block)
+        retval = h.hexdigest()
+        return retval
+
+    def write_payload(self, key, attachment):
+        '''Write the payload of an attachment
+
+:returns: The number of bytes that were written.
+:rtype: int'''
+        path = self.path(key)
+        dirName = os.path.dirname(path)
+        if not os.path.isdir(dirName):
+            os.makedirs(dirName)
+        retval = 0
+        with NamedTemporaryFile('wb', dir=dirName, delete=False) as outfile:
+            for block in iter_blocks(attachment):
+                outfile.write(block)
+                retval += len(block)
+        replace_file(outfile.name, path)
+        return retval
+
+    def stored_keys(self, fileid):
+        '''Get the keys of the stored files with a file identifier
+
+:param str fileid: The file identifier.
+:returns: The keys (``fileid``, and ``fileid-1``, ``fileid-2``...) in
+          order of the suffix.
+:rtype: list'''
+        dirName = os.path.dirname(self.path(fileid))
+        names = os.listdir(dirName) if os.path.isdir(dirName) else []
+        prefix = fileid + '-'
+        suffixes = []
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            key = name[:-len('.json')]
+            if key == fileid:
+                suffixes.append(0)
+            elif key.startswith(prefix) and key[len(prefix):].isdigit():
+                suffixes.append(int(key[len(prefix):]))
+        retval = [self.key(fileid, suffix) for suffix in sorted(suffixes)]
+        return retval
+
+    @staticmethod
+    def key(fileid, suffix):
+        retval = '{0}-{1}'.format(fileid, suffix) if suffix else fileid
+        return retval
+
+    def put(self, attachment):
+        '''Store an attachment, or add a reference to the stored copy
+
+:param attachment: The attachment.
+:type attachment: :class:`.attachment.Attachment`
+:returns: The key for the stored attachment.
+:rtype: str
+
+The payload is only written if no file with the same content has been
+stored. Every stored file with the same ``fileid`` is checked (a file
+with a suffix can outlive the file without one), before the first free
+key is used.'''
+        fileid = attachment.fileid
+        digest = self.hash_payload(attachment)
+        with self.lock:
+            keys = self.stored_keys(fileid)
+            for key in keys:
+                meta = self.read_meta(key)
+                if meta['sha256'] == digest:
+                    meta['refs'] += 1
+                    break
+            else:
+                # A new file: use the first key that is free
+                suffix = 0
+                while self.key(fileid, suffix) in keys:
+                    suffix += 1
+                key = self.key(fileid, suffix)
+                length = self.write_payload(key, attachment)
+                meta = {'sha256': digest, 'refs': 1, 'length': length,
+                        'mimetype': attachment.mimetype}
+            self.write_meta(key, meta)
+        return key
+
+    def open(self, key):
+        '''Open a stored attachment for reading
+
+:param str key: The key for the attachment.
+:returns: The file, opened in binary mode.
+:raises KeyError: The attachment is not stored.'''
+        if self.read_meta(key) is None:
+            raise KeyError(key)
+        retval = open(self.path(key), 'rb')
+        return retval
+
+    def refcount(self, key):
+        '''Get the number of references to a stored attachment
+
+:param str key: The key for the attachment.
+:returns: The number of references, or 0 if the attachment is not stored.
+:rtype: int'''
+        meta = self.read_meta(key)
+        retval = meta['refs'] if meta else 0
+        return retval
+
+    def __contains__(self, key):
+        return self.read_meta(key) is not None
+
+    def release(self, key):
+        '''Release a reference to a stored attachment
+
+:param str key: The key for the attachment.
+:raises KeyError: The attachment is not stored.
+
+The attachment is deleted when the last reference is released.'''
+        with self.lock:
+            meta = self.read_meta(key)
+            if meta is None:
+                raise KeyError(key)
+            meta['refs'] -= 1
+            if meta['refs'] > 0:
+                self.write_meta(key, meta)
+            else:
+                path = self.path(key)
+                os.remove(path + '.json')
+                os.remove(path)
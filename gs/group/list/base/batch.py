@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from collections import deque, namedtuple
+from functools import partial
+from multiprocessing import Pool, cpu_count
+from .emailmessage import EmailMessage
+from .listcontext import get_list_context
+
+#: The result for a message that could not be parsed: the ``index`` of the
+#: message in the messages given to :func:`parse_many`, and the ``error``
+#: (the name of the exception and its message).
+ParseFailure = namedtuple('ParseFailure', ['index', 'error'])
+
+
+def parse_message(messageString, list_title='', group_id='', site_id=''):
+    '''Parse a message, and summarise the result
+
+:param messageString: The email message, as a string or bytes.
+:returns: The snapshot of the message.
+:rtype: :class:`.snapshot.ParsedPost`'''
+    listContext = get_list_context(list_title, group_id, site_id)
+    message = EmailMessage(messageString, list_context=listContext)
+    retval = message.snapshot()
+    return retval
+
+
+def parse_safely(parse, index, messageString):
+    '''Parse a message, turning an exception into a :class:`ParseFailure`
+
+:param function parse: The function that parses the message.
+:param int index: The index of the message.
+:param messageString: The email message, as a string or bytes.
+:returns: The result of ``parse``, or a failure.'''
+    try:
+        retval = parse(messageString)
+    except Exception as e:
+        # --=mpj17=-- The exception may not pickle, so only the name and
+        # message are sent back from the process.
+        error = '{0}: {1}'.format(type(e).__name__, e)
+        retval = ParseFailure(index, error)
+    return retval
+
+
+def parse_chunk(parse, start, chunk):
+    retval = [parse_safely(parse, i, m)
+              for i, m in enumerate(chunk, start)]
+    return retval
+
+
+def parse_many(messages, workers=None, list_title='', group_id='',
+               site_id='', chunksize=8):
+    '''Parse many messages using a pool of processes
+
+:param messages: The email messages, as strings or bytes.
+:param int workers: The number of processes to use. If ``None`` the
+                    number of CPUs is used; if ``1`` the messages are
+                    parsed in this process.
+:param str list_title: The name of the group.
+:param str group_id: The identifier for the group.
+:param str site_id: The identifier for the site that contains the group.
+:param int chunksize: The number of messages to send to a process at
+                      once.
+:returns: A generator of results, in the same order as the messages.
+:rtype: A generator of :class:`.snapshot.ParsedPost` instances, with a
+        :class:`ParseFailure` for each message that could not be parsed.
+
+Re-importing the archive of a group means parsing a lot of messages. The
+messages are sent to a :class:`multiprocessing.Pool` as they are read
+from ``messages``, and the results are yielded in order as they become
+available. Only a few chunks are outstanding at any one time, so neither
+the messages nor the results are all held in memory.
+
+A message that cannot be parsed does not stop the import. Instead a
+:class:`ParseFailure` is yielded in its place, which records the index of
+the message and the error, and the rest of the messages are parsed.'''
+    parse = partial(parse_message, list_title=list_title,
+                    group_id=group_id, site_id=site_id)
+    if workers == 1:
+        for i, m in enumerate(messages):
+            yield parse_safely(parse, i, m)
+    else:
+        workers = workers if workers else cpu_count()
+        pool = Pool(workers)
+        finished = False
+        try:
+            # Allow two chunks per process to be outstanding, so the
+            # processes are kept busy while the results are yielded.
+            maxPending = workers * 2
+            pending = deque()
+            chunk = []
+            start = 0
+            for m in messages:
+                chunk.append(m)
+                if len(chunk) >= chunksize:
+                    pending.append(pool.apply_async(parse_chunk,
+                                                    (parse, start, chunk)))
+                    start += len(chunk)
+                    chunk = []
+                if len(pending) >= maxPending:
+                    for r in pending.popleft().get():
+                        yield r
+            if chunk:
+                pending.append(pool.apply_async(parse_chunk,
+                                                (parse, start, chunk)))
+            while pending:
+                for r in pending.popleft().get():
+                    yield r
+            finished = True
+        finally:
+            if finished:
+                pool.close()
+            else:
+                # Stop the processes if the results are no longer wanted,
+                # or if something went wrong.
+                pool.terminate()
+            pool.join()
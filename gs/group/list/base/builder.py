@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from email.feedparser import FeedParser
+try:
+    from email.feedparser import BytesFeedParser
+except ImportError:  # Python 2
+    from email.feedparser import FeedParser as BytesFeedParser  # lint:ok
+import sys
+from .emailmessage import EmailMessage
+
+if (sys.version_info < (3, )):
+    unicodeOrString = unicode
+else:
+    unicodeOrString = str
+
+
+class MessageTooLargeError(ValueError):
+    '''The message is larger than the maximum size of the builder'''
+
+
+class EmailMessageBuilder(object):
+    '''Build an email message incrementally
+
+:param str list_title: The name of the group.
+:param str group_id: The identifier for the group.
+:param str site_id: The identifier for the site that contains the group.
+:param function sender_id_cb: The function to call to get the identifer of
+                              the message author from an email address.
+:param int max_size: The maximum size of the message, or ``None`` if the
+                     size is unlimited.
+:param list_context: The context for the list, which is used in place of
+                     the ``list_title``, ``group_id`` and ``site_id``.
+:type list_context: :class:`.listcontext.ListContext`
+
+Messages that arrive over a socket or a pipe arrive in chunks. Rather than
+buffering the entire message, each chunk can be passed to :meth:`feed` as
+it arrives, and a :class:`EmailMessage` is returned by :meth:`close`. The
+chunks are parsed by a :class:`email.feedparser.BytesFeedParser` if they
+are bytes, and a :class:`email.feedparser.FeedParser` if they are strings.
+All the chunks of a message must be the same type.
+
+If the message grows larger than ``max_size`` (in bytes, or characters
+for strings) a :class:`MessageTooLargeError` is raised by :meth:`feed`,
+and the partly parsed message is discarded.
+
+Once :meth:`close` has been called (or :meth:`reset`) the builder can
+build another message.'''
+    def __init__(self, list_title='', group_id='', site_id='',
+                 sender_id_cb=None, max_size=None, list_context=None):
+        self.list_title = list_title
+        self.group_id = group_id
+        self.site_id = site_id
+        self.sender_id_cb = sender_id_cb
+        self.max_size = max_size
+        self.list_context = list_context
+        self.reset()
+
+    def reset(self):
+        '''Discard the message that is being built, so another message can
+be built'''
+        self.size = 0
+        self.tooLarge = False
+        self.parser = None
+        # True if the chunks are strings, or None before the first chunk
+        self.textChunks = None
+
+    @staticmethod
+    def new_parser(chunk):
+        if isinstance(chunk, unicodeOrString):
+            retval = FeedParser()
+        else:
+            retval = BytesFeedParser()
+        return retval
+
+    def check_size(self):
+        if self.tooLarge:
+            m = 'The message is larger than the maximum size ({0})'
+            msg = m.format(self.max_size)
+            raise MessageTooLargeError(msg)
+
+    def feed(self, chunk):
+        '''Add some more of the message
+
+:param chunk: The next part of the message, as bytes or a string.
+:raises MessageTooLargeError: The message is larger than the maximum
+                              size.
+:raises TypeError: The chunk is bytes and the earlier chunks were
+                   strings, or the other way around.'''
+        self.check_size()
+        textChunk = isinstance(chunk, unicodeOrString)
+        if self.textChunks is None:
+            self.textChunks = textChunk
+        elif textChunk != self.textChunks:
+            m = 'Cannot add {0} to a message that was started with {1}'
+            names = ('bytes', 'strings')
+            msg = m.format(names[textChunk], names[self.textChunks])
+            raise TypeError(msg)
+        self.size += len(chunk)
+        if (self.max_size is not None) and (self.size > self.max_size):
+            # Drop the partly-parsed message, rather than holding onto it.
+            self.tooLarge = True
+            self.parser = None
+            self.check_size()
+        if self.parser is None:
+            self.parser = self.new_parser(chunk)
+        self.parser.feed(chunk)
+
+    def close(self):
+        '''Finish building the message
+
+:returns: The message.
+:rtype: :class:`EmailMessage`
+:raises MessageTooLargeError: The message is larger than the maximum
+                              size.'''
+        try:
+            self.check_size()
+            if self.parser is None:
+                self.parser = FeedParser()
+            message = self.parser.close()
+        finally:
+            self.reset()
+        retval = EmailMessage(message, self.list_title, self.group_id,
+                              self.site_id, self.sender_id_cb,
+                              list_context=self.list_context)
+        return retval
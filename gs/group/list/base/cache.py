@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache(object):
+    '''A bounded, thread-safe, least-recently-used cache
+
+:param int maxsize: The maximum number of items in the cache.
+
+The items that have been used least recently are evicted when the cache
+is full. The number of :attr:`hits`, :attr:`misses` and :attr:`evictions`
+are counted, so the cache can be sized.'''
+    def __init__(self, maxsize=128):
+        if maxsize < 1:
+            m = 'The maximum size must be at least 1, not {0}'
+            raise ValueError(m.format(maxsize))
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key, default=None):
+        '''Get an item from the cache
+
+:param key: The key for the item.
+:param default: The value to return if the item is absent.
+:returns: The cached value, or ``default``.'''
+        with self.lock:
+            try:
+                value = self.items.pop(key)
+            except KeyError:
+                self.misses += 1
+                retval = default
+            else:
+                # Re-insert the item, so it is the most recently used
+                self.items[key] = value
+                self.hits += 1
+                retval = value
+        return retval
+
+    def set(self, key, value):
+        '''Add an item to the cache
+
+:param key: The key for the item.
+:param value: The value to cache.'''
+        with self.lock:
+            self.items.pop(key, None)
+            self.items[key] = value
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_set(self, key, factory):
+        '''Get an item from the cache, creating it if it is absent
+
+:param key: The key for the item.
+:param factory: The function that is called (with no arguments) to
+                create the value if it is absent.
+:returns: The cached value.
+
+The ``factory`` is called without holding the lock, so it may be called
+more than once for the same key by different threads.'''
+        marker = self.items  # Never a cached value
+        retval = self.get(key, marker)
+        if retval is marker:
+            retval = factory()
+            self.set(key, retval)
+        return retval
+
+    def delete(self, key):
+        '''Remove an item from the cache, if it is present
+
+:param key: The key for the item.'''
+        with self.lock:
+            self.items.pop(key, None)
+
+    def clear(self):
+        'Remove all the items from the cache, and reset the counters'
+        with self.lock:
+            self.items.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    @property
+    def stats(self):
+        '''The counters for the cache
+
+:rtype: dict'''
+        retval = {'hits': self.hits, 'misses': self.misses,
+                  'evictions': self.evictions, 'size': len(self.items),
+                  'maxsize': self.maxsize}
+        return retval
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+import codecs
+from collections import Counter
+import sys
+from threading import Lock
+from .cache import LRUCache
+
+if (sys.version_info < (3, )):
+    unicodeOrString = unicode
+    stringTypes = (str, unicode)
+else:
+    unicodeOrString = str
+    stringTypes = (str, )
+
+#: The character-set labels that are wrong, mapped to the correct codec
+#: (or ``None`` if the label says nothing useful about the encoding).
+ALIASES = {
+    'macintosh': 'mac_roman',
+    'x-mac-roman': 'mac_roman',
+    'utf8': 'utf-8',
+    'unicode-1-1-utf-8': 'utf-8',
+    'x-unicode20utf8': 'utf-8',
+    'unicode-1-1-utf-7': 'utf-7',
+    'cp-850': 'cp850',
+    'cp-1252': 'cp1252',
+    'windows-874': 'cp874',
+    'iso-8859-8-i': 'iso-8859-8',
+    'iso-8859-6-i': 'iso-8859-6',
+    # Outlook means the Microsoft supersets
+    'ks_c_5601-1987': 'cp949',
+    'gb2312': 'gb18030',
+    'x-sjis': 'shift_jis',
+    'x-euc-jp': 'euc_jp',
+    'x-unknown': None,
+    'unknown-8bit': None,
+    'unknown': None,
+    'x-user-defined': None,
+    'default': None,
+    'none': None,
+    '': None,
+}
+
+
+class CharsetResolver(object):
+    '''Turn the character-set labels in messages into codecs
+
+:param str default: The encoding to use if the label is a mystery.
+:param fallbacks: The encodings to try, in order, if the text cannot be
+                  decoded using its label.
+:type fallbacks: A sequence of strings.
+:param int sample_size: The number of bytes that the ``fallbacks`` are
+                        tried on before the whole text is decoded.
+:param int maxsize: The maximum number of labels to remember.
+
+Email messages have a horrid habbit of using encodings that are wrong.
+The :meth:`resolve` method corrects the common bogus labels (see
+:data:`ALIASES`), and checks that the :mod:`codecs` module knows about
+the encoding, remembering the result for each label so each label is
+only looked up once. The :meth:`decode` method decodes text that lies
+about its encoding by trying a short list of likely encodings, rather
+than throwing away the characters that cannot be decoded.
+
+How often each path is taken is counted in :attr:`counts`.'''
+    def __init__(self, default='utf-8', fallbacks=('utf-8', 'windows-1252'),
+                 sample_size=4096, maxsize=256):
+        self.default = default
+        self.fallbacks = tuple(fallbacks)
+        self.sample_size = sample_size
+        self.labels = LRUCache(maxsize)
+        self.counts = Counter()
+        self.lock = Lock()
+
+    def count(self, path):
+        with self.lock:
+            self.counts[path] += 1
+
+    def lookup(self, label):
+        '''Find the codec for a character-set label
+
+:param str label: The label from the message.
+:returns: The name of the encoding, or ``None`` if the label is a
+          mystery.
+:rtype: str'''
+        if not isinstance(label, stringTypes):
+            # Such as an RFC 2231 tuple that was never collapsed
+            retval = None
+        else:
+            marker = self.labels  # Never a cached value
+            retval = self.labels.get(label, marker)
+            if retval is marker:
+                retval = self.lookup_label(label)
+                self.labels.set(label, retval)
+            else:
+                self.count('cached')
+        return retval
+
+    def lookup_label(self, label):
+        name = label.strip().strip('"\'').lower()
+        if name in ALIASES:
+            self.count('alias')
+            retval = ALIASES[name]
+        else:
+            retval = label
+        if retval is not None:
+            try:
+                info = codecs.lookup(retval)
+            except LookupError:
+                retval = None
+            else:
+                # Codecs such as base64 and rot13 are not for text
+                if not getattr(info, '_is_text_encoding', True):
+                    retval = None
+        self.count('lookup' if retval is not None else 'unknown')
+        return retval
+
+    def resolve(self, label):
+        '''Get the correct encoding for a character-set label
+
+:param str label: The label from the message.
+:returns: The encoding, or the ``default`` if the label is a mystery.
+:rtype: str'''
+        retval = self.lookup(label)
+        if retval is None:
+            retval = self.default
+        return retval
+
+    def sample_decodes(self, data, encoding):
+        '''Check if the start of some data can be decoded
+
+:param bytes data: The data.
+:param str encoding: The encoding to try.
+:returns: ``True`` if the first ``sample_size`` bytes can be decoded.'''
+        decoder = codecs.getincrementaldecoder(encoding)('strict')
+        sample = data[:self.sample_size]
+        try:
+            # A character that is cut at the end of the sample is fine
+            decoder.decode(sample, final=(len(data) <= self.sample_size))
+        except UnicodeDecodeError:
+            retval = False
+        else:
+            retval = True
+        return retval
+
+    def decode(self, data, label=None):
+        '''Decode some text
+
+:param bytes data: The encoded text.
+:param str label: The character-set label from the message.
+:returns: The decoded text.
+:rtype: unicode
+
+The text is decoded using the encoding from :meth:`resolve`. If that
+fails each of the ``fallbacks`` is tried on a sample of the text, and the
+first that can decode the sample is used to decode the whole text. Only
+when all the encodings fail is the text decoded lossily, with the
+characters that cannot be decoded replaced with U+FFFD.'''
+        if isinstance(data, unicodeOrString):
+            retval = data
+        else:
+            encoding = self.resolve(label)
+            try:
+                retval = data.decode(encoding)
+                self.count('declared')
+            except UnicodeDecodeError:
+                retval = None
+                for fallback in self.fallbacks:
+                    if ((fallback == encoding) or
+                            (not self.sample_decodes(data, fallback))):
+                        continue
+                    try:
+                        retval = data.decode(fallback)
+                    except UnicodeDecodeError:
+                        continue
+                    self.count('fallback')
+                    self.count('fallback:' + fallback)
+                    break
+                if retval is None:
+                    self.count('lossy')
+                    retval = data.decode(encoding, 'replace')
+        return retval
+
+    @property
+    def stats(self):
+        '''The counters for the resolver
+
+:rtype: dict'''
+        with self.lock:
+            retval = dict(self.counts)
+        retval['labels'] = self.labels.stats
+        return retval
+
+
+#: The resolver used by :class:`.emailmessage.EmailMessage`
+charsetResolver = CharsetResolver()
@@ -13,9 +13,13 @@
 #
 ############################################################################
 from __future__ import absolute_import, unicode_literals
-import codecs
 from email.header import decode_header
+from email.message import Message
 from email.parser import Parser
+try:
+    from email.parser import BytesParser
+except ImportError:  # Python 2
+    from email.parser import Parser as BytesParser  # lint:ok
 from email.utils import parseaddr
 from hashlib import md5
 import re
@@ -23,7 +27,14 @@ import string
 import sys
 from zope.cachedescriptors.property import Lazy
 from gs.core import to_unicode_or_bust, convert_int2b62
+from .attachment import Attachment, calculate_file_id
+from .cache import LRUCache
+from .charset import charsetResolver
+from .headers import HeaderLazy, HeaderOverlay
 from .html2txt import convert_to_txt
+from .listcontext import get_list_context
+from .snapshot import ParsedPost
+from .subject import SubjectMode, SubjectStripper
 
 if (sys.version_info < (3, )):
     INT = long
@@ -41,30 +52,307 @@ uParaRegexep = re.compile('[\u2028\u2029]+')
 annoyingChars = string.whitespace + '\uFFF9\uFFFA\uFFFB\uFFFC\uFEFF'
 annoyingCharsL = annoyingChars + '\u202A\u202D'
 annoyingCharsR = annoyingChars + '\u202B\u202E'
+whitespaceRegexp = re.compile(r'\s+')
+# The blank line that ends the headers (or a blank first line)
+headerEndRegexp = re.compile(r'(?:^|\r?\n)\r?\n')
+headerEndBytesRegexp = re.compile(br'(?:^|\r?\n)\r?\n')
+#: The topic identifiers, keyed by the compressed subject, group
+#: identifier and site identifier. The ``hits``, ``misses`` and
+#: ``evictions`` of the cache are counted.
+topicIdCache = LRUCache(4096)
+
+
+class CompactedMessageError(RuntimeError):
+    '''The parsed message was dropped by :meth:`EmailMessage.compact`'''
 
 
 class EmailMessage(object):
     '''An email message with a bit of list and Unicode knowlege
 
-:param str messageString: The email message.
+:param str messageString: The email message, or an already parsed
+                          :class:`email.message.Message`.
 :param str listTitle: The name of the group.
 :param str group_id: The identifier for the group.
 :param str site_id: The identifier for the site that contains the group.
 :param function sender_id_cb: The function to call to get the identifer of
                               the message author from an email address.
+:param bool headers_only: Only parse the headers, leaving the body to be
+                          parsed when it is needed (see
+                          :meth:`parse_body`).
+:param list_context: The context for the list, which is used in place of
+                     the ``list_title``, ``group_id`` and ``site_id``.
+:type list_context: :class:`.listcontext.ListContext`
 
 The standard Python :class:`email.message.Message` is great. Really. Use it.
 About the only thing it lacks is some nouse about GroupServer groups, and
 it does not provide Unicode versions of the headers by default.'''
+    #: The size (in bytes) above which the payload of an attachment is
+    #: spooled to disk, or ``None`` to keep all payloads in memory.
+    spool_threshold = None
+
+    #: The limits on converting the HTML body to the plain-text body, which
+    #: are passed to :func:`.html2txt.convert_to_txt`. There is no time
+    #: limit, so the body (and the post identifier) is the same each time
+    #: the message is parsed. Instead the limits are low enough that the
+    #: worst HTML takes well under a second to convert.
+    htmlLimits = {'max_input': 512 * 1024,
+                  'max_output': 256 * 1024,
+                  'max_elements': 50000,
+                  'max_references': 50000}
+
+    #: The values that are calculated by :meth:`compact`
+    compactedValues = ('encoding', 'html_body', 'body', 'topic_id',
+                       'post_id')
+
     def __init__(self, messageString, list_title='', group_id='',
-                 site_id='', sender_id_cb=None):
-        self.list_title = list_title
-        self.group_id = group_id
-        self.site_id = site_id
+                 site_id='', sender_id_cb=None, headers_only=False,
+                 list_context=None):
+        if list_context is None:
+            list_context = get_list_context(list_title, group_id, site_id)
+        self.listContext = list_context
+        self.list_title = list_context.list_title
+        self.group_id = list_context.group_id
+        self.site_id = list_context.site_id
         self.sender_id_cb = sender_id_cb
+        self.decodedHeaders = {}
+        self.headerOverlay = HeaderOverlay(None)
         # --=mpj17=-- self.message is not @Lazy, because it is mutable.
-        parser = Parser()
-        self.message = parser.parsestr(messageString)
+        self._unparsed = None
+        if isinstance(messageString, Message):
+            self.message = messageString
+        else:
+            self.message = self.parse_message(messageString, headers_only)
+            if headers_only:
+                self._unparsed = (self.message, messageString)
+
+    @classmethod
+    def from_bytes(cls, messageBytes, list_title='', group_id='',
+                   site_id='', sender_id_cb=None, headers_only=False,
+                   list_context=None):
+        '''Create an email message from the raw bytes of a message
+
+:param bytes messageBytes: The email message, as it came from the MTA.
+:returns: The email message.
+:rtype: :class:`EmailMessage`
+
+The other parameters are the same as the :class:`EmailMessage`
+constructor. The bytes are parsed with :class:`email.parser.BytesParser`,
+so the message need not be decoded to a string first. The identifiers
+are the same as if the message had been decoded and passed to the
+constructor.'''
+        retval = cls(messageBytes, list_title, group_id, site_id,
+                     sender_id_cb, headers_only, list_context)
+        return retval
+
+    @classmethod
+    def from_file(cls, infile, list_title='', group_id='', site_id='',
+                  sender_id_cb=None, headers_only=False, list_context=None):
+        '''Create an email message from a file
+
+:param file infile: The email message, as a file opened in **binary**
+                    mode.
+:returns: The email message.
+:rtype: :class:`EmailMessage`
+
+The other parameters are the same as the :class:`EmailMessage`
+constructor. The file is read in blocks by the
+:class:`email.parser.BytesParser`, rather than being read into memory
+all at once. (If ``headers_only`` is set the file is read into memory, so
+the body can be parsed later.)'''
+        if headers_only:
+            retval = cls.from_bytes(infile.read(), list_title, group_id,
+                                    site_id, sender_id_cb, headers_only,
+                                    list_context)
+        else:
+            parser = BytesParser()
+            message = parser.parse(infile)
+            retval = cls(message, list_title, group_id, site_id,
+                         sender_id_cb, list_context=list_context)
+        return retval
+
+    @property
+    def message(self):
+        '''The parsed message
+
+:rtype: :class:`email.message.Message`
+
+Replacing the message increments the :attr:`headersVersion`. Changes to
+the headers should be made with :meth:`add_header`,
+:meth:`replace_header` and :meth:`del_header`, rather than to the message
+itself, so the values that depend on the headers are updated.
+
+:raises CompactedMessageError: The message was dropped by
+                               :meth:`compact`.'''
+        if self.compacted:
+            m = 'The parsed message was dropped when the message was '\
+                'compacted'
+            raise CompactedMessageError(m)
+        return self.headerOverlay.message
+
+    @message.setter
+    def message(self, message):
+        self.compacted = False
+        self.headerOverlay.set_message(message)
+
+    def compact(self):
+        '''Calculate the values that need the parsed message, and drop it
+
+:returns: This message.
+:rtype: :class:`EmailMessage`
+
+The parsed :attr:`message` holds every part of the message, including
+the encoded payloads of the attachments. Once the :attr:`attachments`
+(with their payloads), :attr:`body`, :attr:`html_body`,
+:attr:`topic_id` and :attr:`post_id` have been calculated the parsed
+message is no longer needed, so this method calculates them and then
+drops it. The headers are kept, so :meth:`get`, :attr:`headers` and the
+values that depend on the headers still work, as do header edits.
+Accessing the :attr:`message` afterwards raises a
+:exc:`CompactedMessageError`.'''
+        if not self.compacted:
+            for attachment in self.attachments:
+                attachment.load()
+            # Calculate (and cache) the values
+            for name in self.compactedValues:
+                getattr(self, name)
+            self._unparsed = None
+            self.headerOverlay.detach()
+            self.compacted = True
+        return self
+
+    def close(self):
+        '''Close the attachments
+
+The payloads of the attachments that were spooled to disk (see
+:attr:`spool_threshold`) are discarded. The message can also be used as
+a context manager, which calls this method on exit.'''
+        # Only the attachments that have been created need closing
+        if 'attachments' in self.__dict__:
+            for attachment in self.attachments:
+                attachment.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    @property
+    def headersVersion(self):
+        'The number of times the headers have been changed'
+        return self.headerOverlay.version
+
+    def snapshot(self):
+        '''Take a snapshot of the values calculated from the message
+
+:returns: The snapshot.
+:rtype: :class:`.snapshot.ParsedPost`
+
+The snapshot can be pickled, or written with
+:meth:`.snapshot.ParsedPost.to_bytes`, and passed to another process
+much more cheaply than the message can be parsed again. The payloads of
+the attachments are not part of the snapshot.'''
+        retval = ParsedPost.from_message(self)
+        return retval
+
+    def store_attachments(self, store, bodies=False):
+        '''Write the attachments to a store
+
+:param store: The store for the attachments.
+:type store: :class:`.interfaces.IAttachmentStore`
+:param bool bodies: If ``True`` the plain-text and HTML bodies (the
+                    attachments without filenames) are stored as well.
+:returns: The attachments that were stored, and their keys in the store.
+:rtype: A list of ``(attachment, key)`` 2-tuples.
+
+A content-addressed store (such as
+:class:`.attachmentstore.FileAttachmentStore`) only writes a file the
+first time it is stored, so files that are attached to many messages are
+only written once.'''
+        retval = [(a, store.put(a)) for a in self.attachments
+                  if bodies or a['filename']]
+        return retval
+
+    def add_header(self, name, value):
+        '''Add a header to the message
+
+:param str name: The name of the header.
+:param str value: The value of the header.
+
+The header is recorded by the :class:`.headers.HeaderOverlay`, rather
+than being added to the :attr:`message`.'''
+        self.headerOverlay.add(name, value)
+
+    def replace_header(self, name, value):
+        '''Replace the first header with a name
+
+:param str name: The name of the header.
+:param str value: The new value of the header.
+:raises KeyError: There is no header with that name.'''
+        self.headerOverlay.replace(name, value)
+
+    def del_header(self, name):
+        '''Delete all the headers with a name
+
+:param str name: The name of the headers.'''
+        self.headerOverlay.delete(name)
+
+    @staticmethod
+    def split_headers(messageString):
+        '''Get the headers of an email message
+
+:param messageString: The email message, as a string or as bytes.
+:returns: The headers, up to the first blank line.
+:rtype: The same type as ``messageString``.'''
+        if isinstance(messageString, unicodeOrString):
+            m = headerEndRegexp.search(messageString)
+        else:
+            m = headerEndBytesRegexp.search(messageString)
+        retval = messageString[:m.start()] if m else messageString
+        return retval
+
+    @classmethod
+    def parse_message(cls, messageString, headers_only=False):
+        '''Parse an email message
+
+:param messageString: The email message, as a string or as bytes.
+:param bool headers_only: If ``True`` only the headers are parsed.
+:returns: The parsed message.
+:rtype: :class:`email.message.Message`
+
+If ``headers_only`` is set the headers are split from the body at the
+first blank line, and only the headers are given to the parser, so the
+time taken does not depend on the size of the body. The parsed message
+has an empty payload.'''
+        if headers_only:
+            messageString = cls.split_headers(messageString)
+        if ((not isinstance(messageString, unicodeOrString)) and
+                hasattr(BytesParser, 'parsebytes')):
+            retval = BytesParser().parsebytes(messageString, headers_only)
+        else:
+            retval = Parser().parsestr(messageString, headers_only)
+        return retval
+
+    def parse_body(self):
+        '''Parse the body of a message that was created with
+``headers_only`` set.
+
+The headers of the message are all that is needed for the
+:attr:`subject`, :attr:`sender`, :attr:`compressed_subject` and
+:attr:`topic_id`. The rest of the message is parsed by this method, which
+is called when the :attr:`attachments` (and so the :attr:`body` and
+:attr:`post_id`) are first needed. It does nothing if the message has
+already been fully parsed, or if :attr:`message` has been replaced.
+
+The headers of the fully parsed message are the same, so the
+:attr:`headersVersion` is not changed, and the values that depend on the
+headers (such as the :attr:`sender_id`) are not calculated again.'''
+        if self._unparsed is not None:
+            headerMessage, messageString = self._unparsed
+            self._unparsed = None
+            if self.message is headerMessage:
+                message = self.parse_message(messageString)
+                self.headerOverlay.set_message(message, bump=False)
 
     @staticmethod
     def check_encoding(encoding):
@@ -75,30 +363,23 @@ it does not provide Unicode versions of the headers by default.'''
 :rtype: str
 
 Email messages have a horrid habbit of using encodings that are wrong. This
-method checks to see if the :mod:`codecs` module knows about the
-encoding. If the encoding is a mystery ``utf-8`` is returned.'''
-        # A slightly wierd encoding that isn't in the standard encoding
-        # table
-        if encoding.lower() == 'macintosh':
-            encoding = 'mac_roman'
-        try:
-            codecs.lookup(encoding)
-        except:
-            # play it pretty safe ... we're going to be ignoring errors in
-            # the encoding anyway, and UTF-8 is going to be right more of
-            # the time in the very, very rare case that we have to force
-            # this!
-            encoding = 'utf-8'
-        return encoding
+method corrects the common bogus labels, and checks to see if the
+:mod:`codecs` module knows about the encoding, using the
+:class:`.charset.CharsetResolver`. If the encoding is a mystery
+``utf-8`` is returned.'''
+        retval = charsetResolver.resolve(encoding)
+        return retval
 
     @staticmethod
     def decode_header_value_tuple(headerValueTuple):
         val, encoding = headerValueTuple
-        # Tradition assumes ASCII, but I (mpj17) will assume UTF-8.
-        encoding = encoding if encoding else 'utf-8'
+        # Tradition assumes ASCII, but I (mpj17) will assume UTF-8. The
+        # raw 8-bit headers that email.parser.BytesParser leaves alone are
+        # labelled unknown-8bit, which the resolver also turns into UTF-8.
+        encoding = charsetResolver.resolve(encoding) if encoding else 'utf-8'
         try:
             retval = to_unicode_or_bust(val, encoding)
-        except UnicodeDecodeError:
+        except (UnicodeDecodeError, LookupError):
             # Unless something goes wrong. It could be Latin-1, but
             # I cannot be bothered with that.
             retval = val.decode('ascii', 'ignore')
@@ -114,20 +395,46 @@ encoding. If the encoding is a mystery ``utf-8`` is returned.'''
 
 The :meth:`email.message.Message.get` method returns the header as an
 ASCII string. This method uses :func:`email.header.decode_header` to
-convert the string to Unicode, if necessary.'''
-        # The value of a can be a series of words, each with a different
-        # encoding. First, get a list of (word, encoding) 2-tuples.
-        value = self.message.get(name, default)
-        # Next, decode each onto Unicode.
-        headerParts = [self.decode_header_value_tuple(t)
-                       for t in decode_header(value)]
-        # Finally, join them all together.
-        retval = ' '.join(headerParts)
+convert the string to Unicode, if necessary.
+
+The decoded values are cached, keyed by the raw value of the header, so
+a header is decoded again only if it changes.'''
+        value = self.headerOverlay.get(name, default)
+        try:
+            retval = self.decodedHeaders[value]
+        except (KeyError, TypeError):  # TypeError: unhashable Header
+            retval = self.decode_header_value(value)
+            if isinstance(value, (unicodeOrString, str)):
+                self.decodedHeaders[value] = retval
         return retval
 
-    @Lazy
+    @classmethod
+    def decode_header_value(cls, value):
+        '''Decode the value of a header
+
+:param str value: The raw value of the header.
+:returns: The value of the header.
+:rtype: unicode'''
+        if isinstance(value, (unicodeOrString, str)) and ('=?' not in value):
+            # There are no encoded-words, so there is nothing for
+            # email.header.decode_header to do.
+            retval = cls.decode_header_value_tuple((value, None))
+        else:
+            # The value of a can be a series of words, each with a
+            # different encoding. First, get a list of (word, encoding)
+            # 2-tuples.  Next, decode each onto Unicode.
+            headerParts = [cls.decode_header_value_tuple(t)
+                           for t in decode_header(value)]
+            # Finally, join them all together.
+            retval = ' '.join(headerParts)
+        return retval
+
+    @HeaderLazy.keyed('sender')
     def sender_id(self):
-        '''Get the identifier of the author of the document.'''
+        '''Get the identifier of the author of the document.
+
+The ``sender_id_cb`` is called again only when the :attr:`sender`
+changes, rather than when any header changes.'''
         # FIXME: rewrite into a query.
         retval = ''
         if self.sender_id_cb:
@@ -147,7 +454,7 @@ lies.'''
     def headers(self):
         'A flattened version of the headers in the message'
         # --=mpj17=-- Not @Lazy because self.message. changes.
-        headers = [': '.join(x) for x in self.message.items()]
+        headers = [': '.join(x) for x in self.headerOverlay.items()]
         header_string = '\n'.join(headers)
         retval = to_unicode_or_bust(header_string, self.encoding)
         return retval
@@ -165,26 +472,17 @@ Two files will have the same ID if
 * They have the same MD5 Sum, *and*
 * They have the same length, *and*
 * They have the same MIME-type.'''
-        length = len(file_body)
-        md5_sum = md5()
-        for c in file_body:
-            if type(c) == unicodeOrString:
-                md5_sum.update(c.encode('ascii', 'xmlcharrefreplace'))
-            else:
-                val = bytesOrString(c)
-                md5_sum.update(val)
-        file_md5 = md5_sum.hexdigest()
-        lenStr = ':%d:' % length
-        md5_sum.update(lenStr.encode('ascii', 'xmlcharrefreplace'))
-        mimeStr = to_unicode_or_bust(mime_type)
-        md5_sum.update(mimeStr.encode('ascii', 'xmlcharrefreplace'))
-        vNum = convert_int2b62(INT(md5_sum.hexdigest(), 16))
-        retval = (to_unicode_or_bust(vNum), length, file_md5)
+        retval = calculate_file_id(file_body, mime_type)
         return retval
 
     @Lazy
     def attachments(self):
-        'Get the attachments, including the bodies.'
+        '''Get the attachments, including the bodies.
+
+:returns: The attachments, in the order they appear in the message.
+:rtype: A list of :class:`.attachment.Attachment` instances.'''
+        self.parse_body()
+
         def split_multipart(msg, pl):
             if msg.is_multipart():
                 for b in msg.get_payload():
@@ -201,73 +499,20 @@ Two files will have the same ID if
                 outmessages = split_multipart(i, outmessages)
 
             for msg in outmessages:
-                if msg.get('Content-transfer-encoding', '') == '8bit':
-                    actualPayload = msg.get_payload(decode=False)
-                else:
-                    actualPayload = msg.get_payload(decode=True)
                 charset = None
                 if msg.get_content_maintype() == 'text':
                     charset = msg.get_param('charset', self.encoding)
                     charset = charset if charset is not None else 'utf-8'
                     charset = charset if charset != 'None' else 'utf-8'
-                # We only care about filenames in the content-disposion
-                # header, rather than the random ones that are part of the
-                # HTML message.
-                filename = ''
-                if msg.get('Content-Disposition', ''):
-                    filename = msg.get_filename('')
-
-                fileid, length, md5Sum = self.calculate_file_id(
-                    actualPayload, msg.get_content_type())
-                retval.append({
-                    'payload': actualPayload,
-                    'fileid': fileid,
-                    'filename': filename,
-                    'length': length,
-                    'md5': md5Sum,
-                    'charset': charset,  # --=mpj17=-- Issues?
-                    'maintype': msg.get_content_maintype(),
-                    'subtype': msg.get_content_subtype(),
-                    'mimetype': msg.get_content_type(),
-                    'contentid': msg.get('content-id', '')})
+                # --=mpj17=-- Issues with the charset?
+                retval.append(Attachment.from_part(msg, charset,
+                                                   self.spool_threshold))
         else:
-            # Since we aren't a bunch of attachments, actually decode the
-            #   body
-            # --=mpj17=-- The decode flag to the
-            # email.message.Message.get_payload method is tricky. I quote
-            # <https://docs.python.org/3.4/library/email.message.html>.
-            #
-            #   When decode is False (the default) the body is returned as a
-            #   string without decoding the Content-Transfer-Encoding.
-            #   However, for a Content-Transfer-Encoding of 8bit, an attempt
-            #   is made to decode the original bytes using the charset
-            #   specified by the Content-Type header, using the replace
-            #   error handler. If no charset is specified, or if the charset
-            #   given is not recognized by the email package, the body is
-            #   decoded using the default ASCII charset.
-            if self.message.get('Content-transfer-encoding', '') == '8bit':
-                payload = self.message.get_payload(decode=False)
-            else:
-                payload = self.message.get_payload(decode=True)
-
-            filename = ''
-            if self.message.get('Content-disposition', ''):
-                filename = self.message.get_filename('')
+            # Since we aren't a bunch of attachments, the message is the
+            # body
             charset = self.message.get_content_charset(self.encoding)
-
-            fileid, length, md5_sum = self.calculate_file_id(
-                payload, self.message.get_content_type())
-            retval = [{
-                      'payload': payload,
-                      'md5': md5_sum,
-                      'fileid': fileid,
-                      'filename': filename,
-                      'length': length,
-                      'charset': charset,
-                      'maintype': self.message.get_content_maintype(),
-                      'subtype': self.message.get_content_subtype(),
-                      'mimetype': self.message.get_content_type(),
-                      'contentid': self.message.get('content-id', '')}]
+            retval = [Attachment.from_part(self.message, charset,
+                                           self.spool_threshold)]
         assert retval is not None
         assert type(retval) == list
         return retval
@@ -283,13 +528,10 @@ Two files will have the same ID if
                     charset = 'utf-8'
                 payload = item['payload'] if item['payload'] is not None \
                     else b''
-                try:
-                    retval = to_unicode_or_bust(payload, charset)
-                except UnicodeDecodeError:
-                    # We could mess about and try a number of likely
-                    # encodings to see if we get one that works. For now
-                    # assume UTF-8 and discard all the other characters
-                    retval = payload.decode('utf-8', 'ignore')
+                # If the charset lies some likely encodings are tried,
+                # before the characters that cannot be decoded are
+                # replaced.
+                retval = charsetResolver.decode(payload, charset)
         return retval
 
     @Lazy
@@ -302,13 +544,11 @@ Two files will have the same ID if
                 charset = charset if charset is not None else 'utf-8'
                 payload = item['payload'] if item['payload'] is not None \
                     else b''
-                try:
-                    retval = to_unicode_or_bust(payload, charset)
-                except UnicodeDecodeError:
-                    retval = payload.decode('utf-8', 'ignore')
+                retval = charsetResolver.decode(payload, charset)
                 break
         if self.html_body and (not retval):
-            retval = convert_to_txt(self.html_body).strip()
+            retval = convert_to_txt(self.html_body,
+                                    **self.htmlLimits).strip()
         assert retval is not None
         return retval
 
@@ -327,8 +567,40 @@ square brackets::
     Subject: [Ethel the Frog] Violence in British Gangland
 
 The group name is useful, but not for the *group*. So this method
-removes it."""
-        subject = self.strip_list_title(subject, list_title)
+removes it.
+
+How the subject is stripped depends on the ``subject_mode`` of the
+:attr:`listContext`. The :attr:`.subject.SubjectMode.legacy` mode (the
+default) produces the same :attr:`topic_id` values as earlier releases,
+while the :attr:`.subject.SubjectMode.prefix` mode uses the
+:class:`.subject.SubjectStripper`."""
+        if self.listContext.subject_mode == SubjectMode.prefix:
+            if list_title == self.listContext.list_title:
+                stripper = self.listContext.subjectStripper
+            else:
+                stripper = SubjectStripper(list_title)
+            retval = stripper.strip(subject, remove_re)
+        else:
+            retval = self.strip_subject_legacy(subject, list_title,
+                                               remove_re)
+        return retval
+
+    def strip_subject_legacy(self, subject, list_title, remove_re=True):
+        '''Tidy the subject line, as earlier releases did
+
+:param str subject: The subject
+:param str list_title: The name of the group
+:param bool remove_re: Weather to remove re
+:returns: The subject without the group name
+:rtype: Unicode
+
+The list title, ``Re:``, ``Fw:`` and ``Fwd:`` are removed from anywhere
+in the subject, as are the square brackets around the entire subject.'''
+        if list_title == self.listContext.list_title:
+            # Use the regular expression that the context compiled
+            subject = self.listContext.strip_list_title(subject)
+        else:
+            subject = self.strip_list_title(subject, list_title)
         subject = self.strip_bracket(subject)
 
         subject = uParaRegexep.sub(' ', subject)
@@ -341,7 +613,7 @@ removes it."""
         # "Re: [Fwd: I am a fish]"
         subject = self.strip_bracket(subject)
         # compress up the whitespace into a single space
-        subject = re.sub('\s+', ' ', subject).strip()
+        subject = whitespaceRegexp.sub(' ', subject).strip()
 
         if len(subject) == 0:
             subject = 'No subject'
@@ -390,7 +662,7 @@ messages, such as ``[Fwd: I am a fish.``'''
         retval = retval.strip()
         return retval
 
-    @Lazy
+    @HeaderLazy
     def subject(self):
         'The subject of the message, without the group name'
         retval = self.strip_subject(self.get('Subject', ''),
@@ -400,27 +672,29 @@ messages, such as ``[Fwd: I am a fish.``'''
     @staticmethod
     def normalise_subject(subject):
         """Compress whitespace and lower-case subject"""
-        return re.sub('\s+', '', subject).lower()
+        return whitespaceRegexp.sub('', subject).lower()
 
-    @Lazy
+    @HeaderLazy
     def compressed_subject(self):
         '''The :mailheader:`Subject` without whitespace and all
 lowercase. Useful for comparisons.'''
         return self.normalise_subject(self.subject)
 
-    @Lazy
+    @HeaderLazy
     def sender(self):
         '''The email address of the person who wrote the message.
 
 The :mailheader:`From`, rather than the :mailheader:`Sender`.'''
         retval = ''
-        sender = self.message.get('From')
+        sender = self.headerOverlay.get('From')
         if sender:
-            name, addr = parseaddr(sender)
+            # A raw 8-bit header, from email.parser.BytesParser, is an
+            # email.header.Header rather than a string.
+            name, addr = parseaddr(unicodeOrString(sender))
             retval = addr.lower()
         return retval
 
-    @Lazy
+    @HeaderLazy
     def name(self):
         '''Get the name of the person who wrote the messsage'''
         sender = self.get('From')
@@ -429,21 +703,39 @@ The :mailheader:`From`, rather than the :mailheader:`Sender`.'''
             retval, sender = parseaddr(sender)
         return retval
 
-    @Lazy
+    @HeaderLazy
     def topic_id(self):
         '''The identifier of the topic that this post will belong to.
 
 A topic_id for two posts will clash if the
 :meth:`EmailMessage.compressedsubject`, group identifier, and site
 identifier are all identical'''
-        items = self.compressed_subject + ':' + self.group_id + ':' + \
-            self.site_id
+        key = (self.compressed_subject, self.group_id, self.site_id)
+        retval = topicIdCache.get_or_set(
+            key, lambda: self.calculate_topic_id(*key))
+        return retval
+
+    @staticmethod
+    def calculate_topic_id(compressedSubject, groupId, siteId):
+        '''Calculate the identifier of a topic
+
+:param str compressedSubject: The compressed subject of the post.
+:param str groupId: The identifier for the group.
+:param str siteId: The identifier for the site that contains the group.
+:returns: The topic identifier.
+:rtype: unicode
+
+Busy topics have many posts with the same subject, so the identifiers are
+cached by the :attr:`topic_id` property (in
+:data:`gs.group.list.base.emailmessage.topicIdCache`) rather than
+calculated using this method every time.'''
+        items = compressedSubject + ':' + groupId + ':' + siteId
         tid = md5(items.encode('utf-8')).hexdigest()
 
         retval = to_unicode_or_bust(convert_int2b62(INT(tid, 16)))
         return retval
 
-    @Lazy
+    @HeaderLazy
     def post_id(self):
         '''The identifier for the post
 
@@ -459,7 +751,7 @@ A post_id for two posts will clash if
         md5Body = md5(self.body.encode('utf-8')).hexdigest()
         items = (self.topic_id + ':' + self.subject + ':' +
                  md5Body + ':' + self.sender + ':' +
-                 self.message.get('in-reply-to', '') +
+                 self.headerOverlay.get('in-reply-to', '') +
                  ':' + str(len_payloads))
         pid = md5(items.encode('utf-8')).hexdigest()
         retval = to_unicode_or_bust(convert_int2b62(INT(pid, 16)))
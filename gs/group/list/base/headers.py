@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+
+
+class HeaderOverlay(object):
+    '''The edits to the headers of a message
+
+:param message: The parsed message.
+:type message: :class:`email.message.Message`
+
+The edits to the headers (:meth:`add`, :meth:`replace` and
+:meth:`delete`) are recorded by the overlay, rather than changing the
+parsed message. The headers are copied the first time they are edited,
+and each edit increments the :attr:`version`, so values that are
+calculated from the headers can be cached until the version changes.
+
+Until there are edits the headers are read directly from the message.
+Changes made directly to the message after the first edit are not seen.'''
+    def __init__(self, message):
+        self.message = message
+        self.version = 0
+        self.edits = []
+        self.editedHeaders = None
+
+    def set_message(self, message, bump=True):
+        '''Change the message that the edits apply to
+
+:param message: The new parsed message.
+:type message: :class:`email.message.Message`
+:param bool bump: If ``False`` the :attr:`version` is left unchanged,
+                  because the new message has the same headers as the
+                  old one.
+
+The edits are applied to the headers of the new message.'''
+        self.message = message
+        self.editedHeaders = None
+        for edit in self.edits:
+            try:
+                self.apply(*edit)
+            except KeyError:
+                # The header to replace is missing from the new message
+                pass
+        if bump:
+            self.version += 1
+
+    def detach(self):
+        '''Copy the headers, and drop the message
+
+The headers can be read and edited after the message is dropped.'''
+        if self.editedHeaders is None:
+            self.editedHeaders = list(self.message.items())
+        self.message = None
+
+    def apply(self, action, name, value):
+        if self.editedHeaders is None:
+            self.editedHeaders = list(self.message.items())
+        lowerName = name.lower()
+        if action == 'add':
+            self.editedHeaders.append((name, value))
+        elif action == 'replace':
+            for i, (k, v) in enumerate(self.editedHeaders):
+                if k.lower() == lowerName:
+                    self.editedHeaders[i] = (k, value)
+                    break
+            else:
+                raise KeyError(name)
+        elif action == 'delete':
+            self.editedHeaders = [(k, v) for k, v in self.editedHeaders
+                                  if k.lower() != lowerName]
+        else:  # pragma: no cover
+            raise ValueError('Unknown action "{0}"'.format(action))
+
+    def edit(self, action, name, value=None):
+        self.apply(action, name, value)
+        self.edits.append((action, name, value))
+        self.version += 1
+
+    def add(self, name, value):
+        '''Add a header, after all the other headers
+
+:param str name: The name of the header.
+:param str value: The value of the header.'''
+        self.edit('add', name, value)
+
+    def replace(self, name, value):
+        '''Replace the first header with a name
+
+:param str name: The name of the header.
+:param str value: The new value of the header.
+:raises KeyError: There is no header with that name.'''
+        self.edit('replace', name, value)
+
+    def delete(self, name):
+        '''Delete all the headers with a name
+
+:param str name: The name of the headers.'''
+        self.edit('delete', name)
+
+    def items(self):
+        '''Get all the headers
+
+:returns: The headers.
+:rtype: A list of ``(name, value)`` 2-tuples.'''
+        if self.editedHeaders is None:
+            retval = self.message.items()
+        else:
+            retval = list(self.editedHeaders)
+        return retval
+
+    def get_all(self, name, failobj=None):
+        '''Get the values of all the headers with a name
+
+:param str name: The name of the headers.
+:param failobj: The value to return if there are no headers.
+:returns: The values of the headers, or ``failobj``.'''
+        if self.editedHeaders is None:
+            retval = self.message.get_all(name, failobj)
+        else:
+            lowerName = name.lower()
+            retval = [v for k, v in self.editedHeaders
+                      if k.lower() == lowerName]
+            retval = retval if retval else failobj
+        return retval
+
+    def get(self, name, failobj=None):
+        '''Get the value of the first header with a name
+
+:param str name: The name of the header.
+:param failobj: The value to return if the header is absent.
+:returns: The value of the header, or ``failobj``.'''
+        if self.editedHeaders is None:
+            retval = self.message.get(name, failobj)
+        else:
+            values = self.get_all(name)
+            retval = values[0] if values else failobj
+        return retval
+
+
+class HeaderLazy(object):
+    '''Like :class:`zope.cachedescriptors.property.Lazy`, but the value is
+calculated again if the headers of the message have changed.
+
+:param function func: The function that calculates the value.
+:param str key: The name of the attribute that the value depends on, or
+                ``None`` if the value depends on all the headers.
+
+The instance must have a ``headersVersion`` attribute. If a ``key`` is
+given the value is only calculated again when that attribute changes
+(see :meth:`keyed`), rather than when any header changes. A value that
+is set explicitly is kept until it is deleted.'''
+    def __init__(self, func, key=None):
+        self.func = func
+        self.key = key
+        self.__name__ = func.__name__
+        self.__doc__ = func.__doc__
+        self.cacheName = '_headerLazy_' + func.__name__
+
+    @classmethod
+    def keyed(cls, key):
+        '''Create a decorator for a value that depends on one attribute
+
+:param str key: The name of the attribute.
+:returns: The decorator.'''
+        def decorator(func):
+            return cls(func, key)
+        return decorator
+
+    def __get__(self, inst, cls):
+        if inst is None:
+            return self
+        if self.key is None:
+            version = inst.headersVersion
+        else:
+            version = getattr(inst, self.key)
+        cached = inst.__dict__.get(self.cacheName)
+        if (cached is not None) and (cached[0] in (version, None)):
+            retval = cached[1]
+        else:
+            retval = self.func(inst)
+            inst.__dict__[self.cacheName] = (version, retval)
+        return retval
+
+    def __set__(self, inst, value):
+        # A version of None is never out of date
+        inst.__dict__[self.cacheName] = (None, value)
+
+    def __delete__(self, inst):
+        inst.__dict__.pop(self.cacheName, None)
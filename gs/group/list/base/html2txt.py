@@ -24,9 +24,44 @@ except:  # Python 2
     from htmlentitydefs import name2codepoint
     unicodeOrString = unicode
     unichrOrChr = unichr
+from collections import deque
+from enum import Enum
+from logging import getLogger
 import sys
 from textwrap import TextWrapper
+from time import time
 from gs.core import to_ascii, to_unicode_or_bust
+log = getLogger('gs.group.list.base.html2txt')
+
+
+class HTMLLimit(Enum):
+    '''An enumeration of the limits on converting HTML to text'''
+    # __order__ is only needed in 2.x
+    __order__ = 'input_size output_size elements time references'
+
+    #: The number of characters of HTML
+    input_size = 0
+
+    #: The number of characters of text, before the whitespace is
+    #: simplified
+    output_size = 1
+
+    #: The number of elements (start tags)
+    elements = 2
+
+    #: The number of seconds since the first chunk of HTML was fed
+    time = 3
+
+    #: The number of character and entity references
+    references = 4
+
+
+class LimitReached(Exception):
+    '''Raised by the :class:`HTMLConverter` to stop the parser when a
+limit is reached. It is caught by the converter.'''
+    def __init__(self, limit):
+        super(LimitReached, self).__init__(limit)
+        self.limit = limit
 
 
 class HTMLConverter(HTMLParser):
@@ -36,28 +71,71 @@ class HTMLConverter(HTMLParser):
     plain text. It does this by getting all the data in the HTML
     elements, simplifying the whitespace, and then removing duplicate
     newlines. In addition it puts the value of the ``href`` attributes
-    of the anchor elements in angle-brackets after the anchor-text.'''
+    of the anchor elements in angle-brackets after the anchor-text.
+
+    The text is collected as a list of fragments, which are joined
+    once for each paragraph, and once for the document, rather than
+    by concatenating strings (which is slow for large documents with
+    many small text nodes).
+
+    :param int max_input: The maximum number of characters of HTML.
+    :param int max_output: The maximum number of characters of text.
+    :param int max_elements: The maximum number of elements.
+    :param int max_references: The maximum number of character and
+                               entity references.
+    :param float time_limit: The maximum number of seconds to spend
+                             converting the HTML.
+    :param function clock: The function that returns the current time.
+
+    Each limit is ``None`` (the default) if it is unlimited. When a
+    limit is reached the rest of the HTML is ignored, the
+    :attr:`truncated` attribute is set to the :class:`HTMLLimit` that
+    was reached, and the :attr:`truncationMarker` is added to the end
+    of the text. The time is checked as each element starts and as
+    each piece of text is produced, so a paragraph is always wrapped
+    in one go; ``max_output`` limits how large the paragraph can be.'''
 
     dupeNewlineRE = re.compile('\s+\n\n+')
     dupeSpaceRE = re.compile('\s+')
+    truncationMarker = '[...]'
 
     # See Ticket 596 <https://projects.iopen.net/groupserver/ticket/596>
 
-    def __init__(self):
+    def __init__(self, max_input=None, max_output=None, max_elements=None,
+                 max_references=None, time_limit=None, clock=time):
         if sys.version_info >= (3, 4):
             HTMLParser.__init__(self, convert_charrefs=False)
         else:
             HTMLParser.__init__(self)  # Old-style class
+        self.max_input = max_input
+        self.max_output = max_output
+        self.max_elements = max_elements
+        self.max_references = max_references
+        self.time_limit = time_limit
+        self.clock = clock
+        self.inputSize = self.outputSize = self.elementCount = 0
+        self.referenceCount = 0
+        self.startTime = None
+        self.truncated = None
         self.textWrapper = TextWrapper(
             width=74, replace_whitespace=True, drop_whitespace=True)
-        self.outText = ''
+        self.outParts = []
         self.lastHREF = []
         self.lastData = ''
+        # The fragments of the current paragraph, or None if outside
         self.outP = None
 
+    @property
+    def outText(self):
+        'The text that has been converted so far'
+        retval = ''.join(self.outParts)
+        return retval
+
     def __unicode__(self):
         text = self.dupeNewlineRE.sub('\n\n', self.outText)
         retval = to_unicode_or_bust(text).strip()
+        if self.truncated is not None:
+            retval = (retval + '\n\n' + self.truncationMarker).strip()
         return retval
 
     def __str__(self):
@@ -68,7 +146,59 @@ class HTMLConverter(HTMLParser):
             retval = to_ascii(u)
         return retval
 
+    def feed(self, data):
+        '''Convert a chunk of HTML
+
+:param unicode data: The next chunk of the HTML document.
+
+The HTML is ignored once a limit has been reached.'''
+        if self.truncated is None:
+            if self.startTime is None:
+                self.startTime = self.clock()
+            limit = None
+            if ((self.max_input is not None)
+                    and (self.inputSize + len(data) > self.max_input)):
+                data = data[:self.max_input - self.inputSize]
+                limit = HTMLLimit.input_size
+            self.inputSize += len(data)
+            try:
+                HTMLParser.feed(self, data)
+            except LimitReached as lr:
+                limit = lr.limit
+            if limit is not None:
+                self.truncate(limit)
+
+    def close(self):
+        '''Finish converting the HTML'''
+        if self.truncated is None:
+            try:
+                HTMLParser.close(self)
+            except LimitReached as lr:
+                self.truncate(lr.limit)
+
+    def truncate(self, limit):
+        '''Stop converting the HTML
+
+:param limit: The limit that was reached.
+:type limit: A member of the :class:`HTMLLimit` enumeration.
+
+The current paragraph is finished, and the rest of the HTML is
+ignored.'''
+        self.truncated = limit
+        if self.outP is not None:
+            self.outParts.append(self.end_paragraph())
+
+    def check_time(self):
+        if ((self.time_limit is not None)
+                and (self.clock() - self.startTime > self.time_limit)):
+            raise LimitReached(HTMLLimit.time)
+
     def handle_starttag(self, tag, attrs):
+        self.elementCount += 1
+        if ((self.max_elements is not None)
+                and (self.elementCount > self.max_elements)):
+            raise LimitReached(HTMLLimit.elements)
+        self.check_time()
         # Remember the href attribute of the anchor, because it will
         #   be displayed *after* the data. The attribute may not be
         #   set because some crack smoking madman may have added anchor
@@ -77,7 +207,7 @@ class HTMLConverter(HTMLParser):
             attrsDict = dict(attrs)
             self.lastHREF.append(attrsDict.get('href', ''))
         elif tag == 'p':
-            self.outP = ''
+            self.outP = []
 
     def handle_endtag(self, tag):
         # Display the value of the href attribute of the anchor, if set.
@@ -88,23 +218,45 @@ class HTMLConverter(HTMLParser):
             if href and (href != self.lastData):
                 self.emit(' <{0}> '.format(href))
         elif tag == 'p':
-            t = self.dupeSpaceRE.sub(' ', self.outP)
-            wrappedTxt = self.textWrapper.fill(t).lstrip() + '\n\n'
-            self.outP = None
-            self.emit(wrappedTxt)
+            self.outParts.append(self.end_paragraph())
+
+    def end_paragraph(self):
+        t = self.dupeSpaceRE.sub(' ', ''.join(self.outP))
+        retval = self.textWrapper.fill(t).lstrip() + '\n\n'
+        self.outP = None
+        return retval
 
     def emit(self, c):
+        limit = None
+        if ((self.max_output is not None)
+                and (self.outputSize + len(c) > self.max_output)):
+            c = c[:self.max_output - self.outputSize]
+            limit = HTMLLimit.output_size
+        self.outputSize += len(c)
         if self.outP is None:
-            self.outText = self.outText + c
+            self.outParts.append(c)
         else:
-            self.outP = self.outP + c
+            self.outP.append(c)
+        if limit is not None:
+            raise LimitReached(limit)
+        self.check_time()
+
+    def count_reference(self):
+        # --=mpj17=-- Each reference produces at most one character, but
+        # takes as long to parse as an element.
+        self.referenceCount += 1
+        if ((self.max_references is not None)
+                and (self.referenceCount > self.max_references)):
+            raise LimitReached(HTMLLimit.references)
 
     def handle_charref(self, name):
+        self.count_reference()
         i = int(name)
         c = unichrOrChr(i)
         self.emit(c)
 
     def handle_entityref(self, name):
+        self.count_reference()
         i = name2codepoint.get(name, None)
         if i is not None:
             c = unichrOrChr(i)
@@ -117,18 +269,215 @@ class HTMLConverter(HTMLParser):
         self.emit(d)
 
 
-def convert_to_txt(html):
+def convert_to_txt(html, max_input=None, max_output=None, max_elements=None,
+                   max_references=None, time_limit=None):
     '''Convert an HTML document to a plain-text document
 
 :param unicode html: The HTML document to convert, as a string (or ``unicode``).
+:param int max_input: The maximum number of characters of HTML.
+:param int max_output: The maximum number of characters of text.
+:param int max_elements: The maximum number of elements.
+:param int max_references: The maximum number of character and entity
+                           references.
+:param float time_limit: The maximum number of seconds to spend converting
+                         the HTML.
 :returns: A plain-text version of the document.
-:rtype: unicode'''
+:rtype: unicode
+
+If a limit is reached the text is truncated, and ends with the
+:attr:`HTMLConverter.truncationMarker`. The limit that was reached is
+logged.'''
     if not html:
         raise ValueError('html argument not set.')
-    converter = HTMLConverter()
+    converter = HTMLConverter(max_input, max_output, max_elements,
+                              max_references, time_limit)
 
     converter.feed(html)
     converter.close()
 
     retval = unicodeOrString(converter)
+    if converter.truncated is not None:
+        m = 'Truncated the text from %d characters of HTML: the %s limit '\
+            'was reached'
+        log.warning(m, len(html), converter.truncated.name)
     return retval
+
+
+class StreamingHTMLConverter(HTMLConverter):
+    '''Convert HTML to plain text, a paragraph at a time
+
+    The HTML is given to :meth:`feed` in chunks, and :meth:`feed` and
+    :meth:`close` return generators of the paragraphs that have been
+    finished. Joining all the paragraphs with two newlines gives the
+    same text as :func:`convert_to_txt`, however the document is split
+    into chunks. The paragraphs that are yielded are not kept, so
+    neither the whole document nor the whole of the text is held in
+    memory at once (only the paragraph that is being converted).
+
+    The text after the last ``<`` in a chunk is held back until the
+    next chunk (or :meth:`close`) so the text between two elements is
+    always handled in one piece, as it would be if the document was
+    converted all at once. If more than :attr:`maxUnfed` characters
+    are held back the text up to the last white-space is converted, so
+    a document with few elements is not held in memory either (unless
+    the text lacks white-space). Likewise a paragraph is only finished
+    once the text of the next paragraph starts, as the whitespace
+    between the paragraphs is simplified.'''
+
+    # The end of a run of whitespace that separates two paragraphs
+    paragraphBreakRE = re.compile(r'\n\n\s*(?=\S)')
+    # A run of white-space that the text can be split at
+    textSplitRE = re.compile(r'(?<=\S)\s+(?=[^\s&])', re.UNICODE)
+    #: The number of characters of HTML that can be held back
+    maxUnfed = 64 * 1024
+
+    def __init__(self, *args, **kwargs):
+        HTMLConverter.__init__(self, *args, **kwargs)
+        self.unfed = ''
+        # The text of the unfinished paragraph, as fragments that end
+        # with a character that is not white-space, and the fragments of
+        # the white-space that follows
+        self.pending = []
+        self.pendingSpace = []
+        self.finished = deque()
+        self.started = False
+
+    def feed(self, data):
+        '''Convert a chunk of HTML
+
+:param unicode data: The next chunk of the HTML document.
+:returns: The paragraphs that have been finished.
+:rtype: A generator of Unicode strings.'''
+        if self.truncated is None:
+            data = self.unfed + data
+            i = max(data.rfind('<'), 0)
+            if ((self.max_input is not None)
+                    and (self.inputSize + len(data) > self.max_input)):
+                i = len(data)  # Feed it all, so the input is truncated
+            elif len(data) - i > self.maxUnfed:
+                i = max(self.last_space(data, i), i)
+            if i:
+                HTMLConverter.feed(self, data[:i])
+            self.unfed = data[i:]
+        self.split_paragraphs(final=False)
+        return self.paragraphs()
+
+    def last_space(self, data, start):
+        '''Find where the text can be split without changing the output
+
+:param unicode data: The HTML.
+:param int start: The position to search after.
+:returns: The start of the last run of white-space that can be split at,
+          or -1.
+:rtype: int
+
+The parser splits the text at each entity or character reference, and a
+piece of text that is only white-space is converted to a newline. So
+the run of white-space must follow a character that is not
+white-space, and be followed by one that is not white-space or an
+``&``.'''
+        retval = -1
+        for m in self.textSplitRE.finditer(data, start + 1):
+            retval = m.start()
+        return retval
+
+    def close(self):
+        '''Finish converting the HTML
+
+:returns: The last paragraphs of the text.
+:rtype: A generator of Unicode strings.'''
+        HTMLConverter.feed(self, self.unfed)
+        self.unfed = ''
+        HTMLConverter.close(self)
+        self.split_paragraphs(final=True)
+        return self.paragraphs()
+
+    def split_paragraphs(self, final):
+        '''Move the finished paragraphs from the text to the queue
+
+:param bool final: True if the document has been completely converted.
+
+The duplicate newlines are removed from the text before the last break
+between paragraphs (from all of the text if ``final`` is True). The
+whitespace that is left after the last break is kept with the
+unfinished paragraph.'''
+        text = ''.join(self.outParts)
+        del self.outParts[:]
+        end = len(text.rstrip())
+        complete = ''
+        if final:
+            complete = ''.join(self.pending + self.pendingSpace) + text
+            self.pending = []
+            self.pendingSpace = []
+        elif not end:
+            # Only white-space, which cannot finish a paragraph
+            if text:
+                self.pendingSpace.append(text)
+        else:
+            # Any break must be in the white-space at the end of the
+            # unfinished paragraph, or in the new text, so only they are
+            # searched (which keeps the time linear).
+            space = ''.join(self.pendingSpace)
+            text = space + text
+            end += len(space)
+            cut = 0
+            for m in self.paragraphBreakRE.finditer(text, 0, end):
+                cut = m.end()
+            if cut:
+                complete = ''.join(self.pending) + text[:cut]
+                self.pending = [text[cut:end]]
+            else:
+                self.pending.append(text[:end])
+            self.pendingSpace = [text[end:]]
+        complete = self.dupeNewlineRE.sub('\n\n', complete)
+        complete = complete.rstrip() if final else complete
+        complete = complete if self.started else complete.lstrip()
+        paragraphs = complete.split('\n\n') if complete else []
+        if paragraphs and not final:
+            self.pending.insert(0, paragraphs.pop())
+        if final and (self.truncated is not None):
+            paragraphs.append(self.truncationMarker)
+        if paragraphs:
+            self.started = True
+        self.finished.extend(paragraphs)
+
+    def paragraphs(self):
+        '''The paragraphs that have been finished
+
+:returns: The paragraphs that have been finished, which are removed from
+          the converter as they are yielded.
+:rtype: A generator of Unicode strings.'''
+        while self.finished:
+            yield to_unicode_or_bust(self.finished.popleft())
+
+
+def iter_convert_to_txt(chunks, max_input=None, max_output=None,
+                        max_elements=None, max_references=None,
+                        time_limit=None):
+    '''Convert an HTML document to plain text, a paragraph at a time
+
+:param chunks: The HTML document, in chunks.
+:type chunks: An iterable of strings (or ``unicode``).
+:param int max_input: The maximum number of characters of HTML.
+:param int max_output: The maximum number of characters of text.
+:param int max_elements: The maximum number of elements.
+:param int max_references: The maximum number of character and entity
+                           references.
+:param float time_limit: The maximum number of seconds to spend converting
+                         the HTML.
+:returns: The paragraphs of the plain-text version of the document.
+:rtype: A generator of Unicode strings.
+
+Unlike :func:`convert_to_txt` an empty document produces no paragraphs,
+rather than raising a :exc:`ValueError`. If a limit is reached the last
+paragraph is the :attr:`HTMLConverter.truncationMarker`, and the rest of
+the chunks are not read.'''
+    converter = StreamingHTMLConverter(max_input, max_output, max_elements,
+                                       max_references, time_limit)
+    for chunk in chunks:
+        for paragraph in converter.feed(chunk):
+            yield paragraph
+        if converter.truncated is not None:
+            break
+    for paragraph in converter.close():
+        yield paragraph
@@ -27,8 +27,9 @@ class IEmailMessage(Interface):
 
     encoding = Attribute("The encoding of the email and headers.")
     attachments = Attribute(
-        "A list of attachment payloads, each structured as a dictionary, "
-        "from the email (both body and attachments).")
+        "A list of attachment payloads, each structured as an Attachment "
+        "that can be used like a dictionary, from the email (both body "
+        "and attachments).")
     body = Attribute("The plain text body of the email message.")
     html_body = Attribute("The html body of the email message, if one "
                           "exists")
@@ -65,3 +66,49 @@ class IEmailMessage(Interface):
         @param default: default value, if header does not exist. Defaults to
             '' if left unspecified
         """
+
+
+class ISenderIdResolver(Interface):
+    """Resolve the email addresses of many message authors at once."""
+
+    def resolve(addresses):
+        """Get the identifiers of the people with some email addresses
+
+        @param addresses: the email addresses to look up
+        @return: a dictionary that maps each address to the user
+            identifier; addresses that do not belong to anyone may be
+            absent, or map to ''
+        """
+
+
+class IAttachmentStore(Interface):
+    """Store each distinct attachment once, no matter how many
+    messages it is attached to."""
+
+    def put(attachment):
+        """Store an attachment, or add a reference to the stored copy
+
+        @param attachment: the attachment to store
+        @return: the key for the stored attachment
+        """
+
+    def open(key):
+        """Open a stored attachment for reading
+
+        @param key: the key for the stored attachment
+        @return: a file-like object, opened in binary mode
+        """
+
+    def refcount(key):
+        """Get the number of references to a stored attachment
+
+        @param key: the key for the stored attachment
+        @return: the number of references, or 0 if it is not stored
+        """
+
+    def release(key):
+        """Remove a reference to a stored attachment, deleting the
+        attachment when there are no more references
+
+        @param key: the key for the stored attachment
+        """
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+import re
+from zope.cachedescriptors.property import Lazy
+from .cache import LRUCache
+from .replyto import ReplyTo
+from .subject import SubjectMode, SubjectStripper
+
+
+class ListContext(object):
+    '''The information about a list that is needed to process a message
+
+:param str list_title: The name of the group.
+:param str group_id: The identifier for the group.
+:param str site_id: The identifier for the site that contains the group.
+:param reply_to: The reply-to setting for the group.
+:type reply_to: A member of the :class:`.replyto.ReplyTo` enumeration.
+:param subject_mode: How the subject of a message is normalised.
+:type subject_mode: A member of the :class:`.subject.SubjectMode`
+                    enumeration.
+
+The same list receives many messages. The context for a list is created
+once (normally by :func:`get_list_context`) and shared by all the
+:class:`.emailmessage.EmailMessage` instances for that list, so the
+regular expression that matches the list title in the
+:mailheader:`Subject` is only compiled once.'''
+    def __init__(self, list_title='', group_id='', site_id='',
+                 reply_to=ReplyTo.group, subject_mode=SubjectMode.legacy):
+        self.list_title = list_title
+        self.group_id = group_id
+        self.site_id = site_id
+        self.reply_to = reply_to
+        self.subject_mode = subject_mode
+        self.titleRegexp = None
+        if list_title:
+            pattern = r'\[%s\]' % re.escape(list_title)
+            self.titleRegexp = re.compile(pattern)
+
+    def __repr__(self):
+        m = '<ListContext {0!r} group_id={1!r} site_id={2!r}>'
+        retval = m.format(self.list_title, self.group_id, self.site_id)
+        return retval
+
+    def strip_list_title(self, subject):
+        '''Remove the list title from the subject
+
+:param str subject: The subject
+:returns: The subject without the group name
+:rtype: Unicode'''
+        retval = subject
+        if self.titleRegexp is not None:
+            retval = self.titleRegexp.sub('', subject).strip()
+        return retval
+
+    @Lazy
+    def subjectStripper(self):
+        'The :class:`.subject.SubjectStripper` for the list title'
+        retval = SubjectStripper(self.list_title)
+        return retval
+
+
+#: The contexts that are returned by :func:`get_list_context`
+listContexts = LRUCache(512)
+
+
+def get_list_context(list_title='', group_id='', site_id='',
+                     reply_to=ReplyTo.group, subject_mode=SubjectMode.legacy):
+    '''Get the context for a list
+
+:param str list_title: The name of the group.
+:param str group_id: The identifier for the group.
+:param str site_id: The identifier for the site that contains the group.
+:param reply_to: The reply-to setting for the group.
+:type reply_to: A member of the :class:`.replyto.ReplyTo` enumeration.
+:param subject_mode: How the subject of a message is normalised.
+:type subject_mode: A member of the :class:`.subject.SubjectMode`
+                    enumeration.
+:returns: The context for the list.
+:rtype: :class:`ListContext`
+
+The contexts are kept in a least-recently-used cache
+(:data:`listContexts`), so only the contexts for the busiest lists are
+held in memory.'''
+    key = (list_title, group_id, site_id, reply_to, subject_mode)
+    retval = listContexts.get_or_set(
+        key, lambda: ListContext(list_title, group_id, site_id, reply_to,
+                                 subject_mode))
+    return retval
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from hashlib import sha256
+import sqlite3
+import sys
+from threading import Lock
+from .emailmessage import EmailMessage
+from .listcontext import get_list_context
+from .snapshot import ParsedPost
+
+if (sys.version_info < (3, )):
+    unicodeOrString = unicode
+else:
+    unicodeOrString = str
+
+
+class ParseCache(object):
+    '''A persistent cache of parsed messages
+
+:param str path: The path to the SQLite database that holds the cache
+                 (which is created if it does not exist), or
+                 ``':memory:'``.
+:param int max_size: The maximum total size (in bytes) of the cached
+                     snapshots.
+
+Mail servers retry, and messages are delivered more than once, so the
+same message is often parsed many times. The cache holds a
+:class:`.snapshot.ParsedPost` for each message, keyed by the SHA-256 of
+the raw message and the :class:`.listcontext.ListContext` that it was
+parsed with, so :meth:`parse` only parses a message the first time it is
+seen. When the cache grows larger than ``max_size`` the snapshots that
+were used least recently are evicted.
+
+The cache does not replace parsing with the
+:class:`.emailmessage.EmailMessage` constructor: :meth:`parse` returns the
+snapshot, rather than an :class:`.emailmessage.EmailMessage`, because
+the snapshot is what is cached.
+
+Many processes can share the database (mail servers usually retry a
+delivery with a different worker). The total size of the snapshots, and
+the counter that records when each snapshot was used, are kept in the
+database and changed in the same transaction as the snapshots.
+
+The ``sender_id`` of the cached snapshots is always ``''``, because the
+identifiers can change: use :func:`.senderid.resolve_sender_ids`, or the
+``sender_id_cb``, to look them up.'''
+    #: The number of snapshots that are read at a time by :meth:`evict`
+    evictBatch = 64
+
+    def __init__(self, path, max_size=64 * 1024 * 1024):
+        self.path = path
+        self.max_size = max_size
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS posts ('
+                'digest BLOB PRIMARY KEY, snapshot BLOB NOT NULL, '
+                'size INTEGER NOT NULL, used INTEGER NOT NULL)')
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS posts_used ON posts (used)')
+            # The one row that holds the total size of the snapshots, and
+            # the counter for the used column.
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS totals ('
+                'id INTEGER PRIMARY KEY CHECK (id = 0), '
+                'size INTEGER NOT NULL, used INTEGER NOT NULL)')
+            self.connection.execute(
+                'INSERT OR IGNORE INTO totals (id, size, used) '
+                'SELECT 0, COALESCE(SUM(size), 0), COALESCE(MAX(used), 0) '
+                'FROM posts')
+
+    @property
+    def size(self):
+        'The total size (in bytes) of the cached snapshots'
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT size FROM totals').fetchone()
+        return row[0]
+
+    def use(self):
+        '''Increment the counter for the used column
+
+:returns: The new value of the counter.
+:rtype: int
+
+Updating the totals starts the transaction, and locks the database
+against the other writers until the transaction ends.'''
+        self.connection.execute('UPDATE totals SET used = used + 1')
+        row = self.connection.execute('SELECT used FROM totals').fetchone()
+        return row[0]
+
+    @staticmethod
+    def digest(messageString, list_context):
+        '''Calculate the key for a message
+
+:param messageString: The raw message, as bytes or a string.
+:param list_context: The context the message is parsed with.
+:type list_context: :class:`.listcontext.ListContext`
+:returns: The SHA-256 digest of the message and the context.
+:rtype: bytes'''
+        if isinstance(messageString, unicodeOrString):
+            messageString = messageString.encode('utf-8', 'replace')
+            kind = b's'
+        else:
+            kind = b'b'
+        context = '\0'.join((list_context.list_title,
+                             list_context.group_id, list_context.site_id,
+                             list_context.subject_mode.name))
+        h = sha256(kind)
+        h.update(context.encode('utf-8'))
+        h.update(b'\0')
+        h.update(messageString)
+        retval = h.digest()
+        return retval
+
+    def get(self, digest):
+        '''Get a snapshot from the cache
+
+:param bytes digest: The key for the message (see :meth:`digest`).
+:returns: The snapshot, or ``None`` if the message is not cached.
+:rtype: :class:`.snapshot.ParsedPost`'''
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT snapshot FROM posts WHERE digest = ?',
+                (sqlite3.Binary(digest), )).fetchone()
+            if row is None:
+                self.misses += 1
+                retval = None
+            else:
+                self.hits += 1
+                with self.connection:
+                    self.connection.execute(
+                        'UPDATE posts SET used = ? WHERE digest = ?',
+                        (self.use(), sqlite3.Binary(digest)))
+                retval = ParsedPost.from_bytes(bytes(row[0]))
+        return retval
+
+    def set(self, digest, post):
+        '''Add a snapshot to the cache
+
+:param bytes digest: The key for the message (see :meth:`digest`).
+:param post: The snapshot of the message.
+:type post: :class:`.snapshot.ParsedPost`'''
+        data = post.to_bytes()
+        with self.lock:
+            with self.connection:
+                used = self.use()
+                row = self.connection.execute(
+                    'SELECT size FROM posts WHERE digest = ?',
+                    (sqlite3.Binary(digest), )).fetchone()
+                change = len(data) - (row[0] if row is not None else 0)
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO posts (digest, snapshot, size, '
+                    'used) VALUES (?, ?, ?, ?)',
+                    (sqlite3.Binary(digest), sqlite3.Binary(data),
+                     len(data), used))
+                self.connection.execute(
+                    'UPDATE totals SET size = size + ?', (change, ))
+                self.evict()
+
+    def evict(self):
+        '''Remove the least recently used snapshots, until the cache fits
+
+The snapshots are read :attr:`evictBatch` at a time, oldest first (using
+the index of the ``used`` column), rather than reading every row. This is
+called by :meth:`set`, inside its transaction.'''
+        size = self.connection.execute(
+            'SELECT size FROM totals').fetchone()[0]
+        startSize = size
+        while size > self.max_size:
+            rows = self.connection.execute(
+                'SELECT digest, size FROM posts ORDER BY used LIMIT ?',
+                (self.evictBatch, )).fetchall()
+            if not rows:
+                break
+            for digest, rowSize in rows:
+                if size <= self.max_size:
+                    break
+                self.connection.execute(
+                    'DELETE FROM posts WHERE digest = ?', (digest, ))
+                size -= rowSize
+                self.evictions += 1
+        if size != startSize:
+            self.connection.execute('UPDATE totals SET size = ?', (size, ))
+
+    def parse(self, messageString, list_title='', group_id='', site_id='',
+              list_context=None):
+        '''Parse a message, unless it is in the cache
+
+:param messageString: The raw message, as bytes or a string.
+:returns: The snapshot of the message.
+:rtype: :class:`.snapshot.ParsedPost`
+
+The other parameters are the same as the
+:class:`.emailmessage.EmailMessage` constructor.'''
+        if list_context is None:
+            list_context = get_list_context(list_title, group_id, site_id)
+        digest = self.digest(messageString, list_context)
+        retval = self.get(digest)
+        if retval is None:
+            message = EmailMessage(messageString, list_context=list_context)
+            retval = message.snapshot()
+            self.set(digest, retval)
+        return retval
+
+    @property
+    def hit_rate(self):
+        '''The proportion of look-ups that were found in the cache
+
+:rtype: float'''
+        lookups = self.hits + self.misses
+        retval = (self.hits / float(lookups)) if lookups else 0.0
+        return retval
+
+    def __len__(self):
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT COUNT(*) FROM posts').fetchone()
+        return row[0]
+
+    def clear(self):
+        'Remove all the snapshots from the cache'
+        with self.lock:
+            with self.connection:
+                self.connection.execute('DELETE FROM posts')
+                self.connection.execute('UPDATE totals SET size = 0')
+
+    def close(self):
+        'Close the database'
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from hashlib import md5
+from math import ceil, exp, log
+import mmap
+import os
+from struct import Struct
+from threading import Lock
+
+#: The header of the file: the magic number, the number of bits and the
+#: number of hashes in each generation, the capacity of each generation,
+#: the current generation (0 or 1), and the number of post identifiers
+#: added to the current and the older generation.
+headerStruct = Struct('>8sQQQQQQ')
+MAGIC = b'GSBLOOM2'
+hashStruct = Struct('>QQ')
+
+
+class PostIdFilter(object):
+    '''A Bloom filter of the post identifiers that have been seen recently
+
+:param str path: The file that holds the filter (which is created if it
+                 does not exist), or ``None`` to keep the filter in
+                 memory.
+:param int capacity: The number of post identifiers in each generation
+                     of the filter.
+:param float error_rate: The chance of a false positive when a generation
+                         holds ``capacity`` identifiers.
+
+A :attr:`.emailmessage.EmailMessage.post_id` is the same if a message is
+sent twice, so a duplicate can be spotted by looking for its identifier.
+Rather than querying the database for every message, the identifiers
+that have been seen are added to this filter, which is held in a
+memory-mapped file. If the filter says that an identifier has *not* been
+seen then the message is certainly new; if it says an identifier *has*
+been seen then the message is probably a duplicate, and the database
+should be checked.
+
+Identifiers cannot be removed from a Bloom filter, and the chance of a
+false positive grows as identifiers are added. So the filter holds two
+generations. Identifiers are added to the current generation, and
+looked for in both. When the current generation holds ``capacity``
+identifiers the filter is rotated (see :meth:`rotate`): the older
+generation is cleared and becomes the current one. The filter always
+remembers at least the last ``capacity`` identifiers (and at most the
+last ``2 * capacity``), and the chance of a false positive stays below
+about twice the ``error_rate``.
+
+If the file already exists the number of bits, the number of hashes and
+the capacity of the existing filter are used, rather than those given.'''
+    def __init__(self, path=None, capacity=1000000, error_rate=0.001):
+        self.path = path
+        self.lock = Lock()
+        bits = int(ceil(-capacity * log(error_rate) / (log(2) ** 2)))
+        # Round up to a whole number of bytes
+        bits = ((bits + 7) // 8) * 8
+        hashes = max(1, int(round((float(bits) / capacity) * log(2))))
+        header = headerStruct.pack(MAGIC, bits, hashes, capacity, 0, 0, 0)
+        size = headerStruct.size + (2 * bits // 8)
+        self.fileObject = None
+        if path is None:
+            self.map = mmap.mmap(-1, size)
+            self.map[:headerStruct.size] = header
+        else:
+            if not os.path.exists(path):
+                with open(path, 'wb') as outFile:
+                    outFile.write(header)
+                    outFile.truncate(size)
+            self.fileObject = open(path, 'r+b')
+            self.map = mmap.mmap(self.fileObject.fileno(), 0)
+        header = self.map[:headerStruct.size]
+        if ((len(header) < headerStruct.size)
+                or (header[:len(MAGIC)] != MAGIC)):
+            self.close()
+            raise ValueError('"{0}" is not a post-ID filter'.format(path))
+        (magic, self.bits, self.hashes, self.capacity, self.current,
+         self.count, self.olderCount) = headerStruct.unpack(header)
+
+    def positions(self, post_id):
+        '''Get the positions of the bits for a post identifier
+
+:param str post_id: The post identifier.
+:returns: The bit positions.
+:rtype: A list of ints.'''
+        # Two hashes make all the others (Kirsch and Mitzenmacher, 2006)
+        h1, h2 = hashStruct.unpack(md5(post_id.encode('utf-8')).digest())
+        retval = [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+        return retval
+
+    def offset(self, generation):
+        'The offset of the bits of a generation in the file'
+        retval = headerStruct.size + (generation * self.bits // 8)
+        return retval
+
+    def get_bit(self, generation, position):
+        offset = self.offset(generation) + (position // 8)
+        byte = ord(self.map[offset:offset + 1])
+        retval = bool(byte & (1 << (position % 8)))
+        return retval
+
+    def set_bit(self, generation, position):
+        offset = self.offset(generation) + (position // 8)
+        byte = ord(self.map[offset:offset + 1]) | (1 << (position % 8))
+        self.map[offset:offset + 1] = bytes(bytearray((byte, )))
+
+    def in_generation(self, generation, positions):
+        retval = all(self.get_bit(generation, p) for p in positions)
+        return retval
+
+    def __contains__(self, post_id):
+        positions = self.positions(post_id)
+        retval = (self.in_generation(self.current, positions)
+                  or self.in_generation(1 - self.current, positions))
+        return retval
+
+    def add(self, post_id):
+        '''Add a post identifier to the filter
+
+:param str post_id: The post identifier.
+:returns: ``True`` if the identifier has probably been seen before, and
+          ``False`` if it has certainly not been seen.
+:rtype: bool
+
+An identifier that is only in the older generation is added to the
+current generation, so it is remembered for longer.'''
+        positions = self.positions(post_id)
+        with self.lock:
+            seen = True
+            for p in positions:
+                if not self.get_bit(self.current, p):
+                    seen = False
+                    self.set_bit(self.current, p)
+            retval = seen or self.in_generation(1 - self.current, positions)
+            if not seen:
+                self.count += 1
+                if self.count >= self.capacity:
+                    self.rotate_unlocked()
+                self.write_header()
+        return retval
+
+    def write_header(self):
+        self.map[:headerStruct.size] = headerStruct.pack(
+            MAGIC, self.bits, self.hashes, self.capacity, self.current,
+            self.count, self.olderCount)
+
+    def rotate(self):
+        '''Start a new generation, forgetting the identifiers in the older
+generation
+
+This is called by :meth:`add` when the current generation holds
+``capacity`` identifiers.'''
+        with self.lock:
+            self.rotate_unlocked()
+            self.write_header()
+
+    def rotate_unlocked(self):
+        self.current = 1 - self.current
+        offset = self.offset(self.current)
+        self.map[offset:offset + (self.bits // 8)] = b'\0' * (self.bits // 8)
+        self.olderCount = self.count
+        self.count = 0
+
+    @staticmethod
+    def generation_rate(hashes, bits, count):
+        retval = (1 - exp(-float(hashes * count) / bits)) ** hashes
+        return retval
+
+    @property
+    def false_positive_rate(self):
+        '''The estimated chance of a false positive, given the number of
+identifiers that have been added to each generation
+
+The :attr:`count` is the number of identifiers that were added to the
+current generation when they had not (apparently) been seen, so it can be
+slightly less than the number of distinct identifiers added.
+
+:rtype: float'''
+        current = self.generation_rate(self.hashes, self.bits, self.count)
+        older = self.generation_rate(self.hashes, self.bits,
+                                     self.olderCount)
+        retval = 1 - ((1 - current) * (1 - older))
+        return retval
+
+    def clear(self):
+        'Forget all the post identifiers, in both generations'
+        with self.lock:
+            self.map[headerStruct.size:] = b'\0' * (2 * self.bits // 8)
+            self.current = self.count = self.olderCount = 0
+            self.write_header()
+
+    def flush(self):
+        'Write the filter to the disk'
+        self.map.flush()
+
+    def close(self):
+        'Write the filter to the disk, and close the file'
+        if self.map is not None:
+            if self.fileObject is not None:
+                self.map.flush()
+            self.map.close()
+            self.map = None
+        if self.fileObject is not None:
+            self.fileObject.close()
+            self.fileObject = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from time import time
+from zope.interface import implementer
+from .cache import LRUCache
+from .interfaces import ISenderIdResolver
+
+
+@implementer(ISenderIdResolver)
+class CallbackResolver(object):
+    '''Resolve addresses one at a time, using a callback
+
+:param function sender_id_cb: The function to call to get the identifer of
+                              the message author from an email address.
+
+This adapts a ``sender_id_cb`` (as passed to
+:class:`.emailmessage.EmailMessage`) to the
+:class:`.interfaces.ISenderIdResolver` protocol, for code that has yet to
+provide a resolver that looks up many addresses at once.'''
+    def __init__(self, sender_id_cb):
+        self.sender_id_cb = sender_id_cb
+
+    def resolve(self, addresses):
+        '''Get the identifiers for some email addresses
+
+:param addresses: The email addresses.
+:returns: The identifiers for the addresses.
+:rtype: dict'''
+        retval = {a: self.sender_id_cb(a) for a in addresses}
+        return retval
+
+
+def resolve_sender_ids(messages, resolver):
+    '''Set the sender identifiers of many messages at once
+
+:param messages: The messages.
+:type messages: A sequence of :class:`.emailmessage.EmailMessage`
+                instances.
+:param resolver: The resolver that looks up the addresses.
+:type resolver: :class:`.interfaces.ISenderIdResolver`
+:returns: The identifiers of the senders, keyed by email address.
+:rtype: dict
+
+Each :class:`.emailmessage.EmailMessage` normally calls its
+``sender_id_cb`` to get its ``sender_id``, which is one look-up for every
+message. This function gathers the distinct ``sender`` addresses of the
+``messages``, looks them all up with a single call to the ``resolve``
+method of the ``resolver``, and sets the ``sender_id`` of every message.
+Messages from an address that the resolver does not know (and messages
+without an address) have a ``sender_id`` of ``''``.
+
+The ``sender_id`` that is set is kept, even if the :mailheader:`From`
+header of a message is changed afterwards.'''
+    messages = list(messages)
+    addresses = set(m.sender for m in messages)
+    addresses.discard('')
+    retval = {}
+    if addresses:
+        retval = resolver.resolve(sorted(addresses))
+    for message in messages:
+        senderId = retval.get(message.sender, '')
+        message.sender_id = senderId if senderId else ''
+    return retval
+
+
+@implementer(ISenderIdResolver)
+class CachedSenderIdCallback(object):
+    '''Cache the identifiers returned by a ``sender_id_cb``
+
+:param function sender_id_cb: The function to call to get the identifer of
+                              the message author from an email address.
+:param float ttl: The number of seconds an identifier is cached for.
+:param float negative_ttl: The number of seconds that an address without
+                           an identifier (one that ``sender_id_cb``
+                           returns ``''`` for) is cached for.
+:param int maxsize: The maximum number of identifiers, and of addresses
+                    without identifiers, that are cached.
+:param function clock: The function that returns the current time.
+
+The same few people write most of the messages, and spam is sent from
+the same unknown addresses again and again. An instance can be passed to
+:class:`.emailmessage.EmailMessage` as the ``sender_id_cb`` so the
+identifiers are looked up once for each address, rather than once for
+each message. Known and unknown addresses are held in separate
+:class:`.cache.LRUCache` instances, so a flood of spam cannot evict the
+identifiers of the members, and unknown addresses can be looked up again
+sooner (the ``negative_ttl`` is normally shorter than the ``ttl``).
+
+Call :meth:`invalidate` when someone changes their email addresses.'''
+    def __init__(self, sender_id_cb, ttl=300, negative_ttl=60, maxsize=1024,
+                 clock=time):
+        self.sender_id_cb = sender_id_cb
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self.known = LRUCache(maxsize)
+        self.unknown = LRUCache(maxsize)
+        self.expired = 0
+
+    def cached(self, address):
+        '''Get the cached identifier for an address
+
+:param str address: The email address.
+:returns: The identifier, ``''`` if the address is known to lack one, or
+          ``None`` if the address is not cached (or the entry has
+          expired).'''
+        retval = None
+        now = self.clock()
+        for cache in (self.known, self.unknown):
+            entry = cache.get(address)
+            if entry is not None:
+                expires, senderId = entry
+                if expires > now:
+                    retval = senderId
+                else:
+                    cache.delete(address)
+                    self.expired += 1
+                break
+        return retval
+
+    def store(self, address, senderId):
+        senderId = senderId if senderId else ''
+        if senderId:
+            self.known.set(address, (self.clock() + self.ttl, senderId))
+        else:
+            self.unknown.set(address,
+                             (self.clock() + self.negative_ttl, senderId))
+
+    def __call__(self, address):
+        '''Get the identifier for an address
+
+:param str address: The email address.
+:returns: The identifier of the person with the address, or ``''``.'''
+        retval = self.cached(address)
+        if retval is None:
+            retval = self.sender_id_cb(address)
+            self.store(address, retval)
+        return retval if retval else ''
+
+    def resolve(self, addresses):
+        '''Get the identifiers for some email addresses
+
+:param addresses: The email addresses.
+:returns: The identifiers for the addresses.
+:rtype: dict'''
+        retval = {a: self(a) for a in addresses}
+        return retval
+
+    def invalidate(self, address=None):
+        '''Forget the cached identifier of an address
+
+:param str address: The email address, or ``None`` to forget all the
+                    addresses.'''
+        if address is None:
+            self.known.clear()
+            self.unknown.clear()
+        else:
+            self.known.delete(address)
+            self.unknown.delete(address)
+
+    @property
+    def stats(self):
+        '''The counters for the caches
+
+:rtype: dict'''
+        retval = {'known': self.known.stats,
+                  'unknown': self.unknown.stats,
+                  'expired': self.expired}
+        return retval
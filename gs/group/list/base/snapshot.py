@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from collections import namedtuple
+from struct import Struct
+import sys
+from .attachment import AttachmentInfo
+
+if (sys.version_info < (3, )):
+    textErrors = 'strict'
+else:
+    # Allow the lone surrogates that can come from badly encoded messages
+    textErrors = 'surrogatepass'
+
+#: The start of the binary format written by :meth:`ParsedPost.to_bytes`
+MAGIC = b'GSPP\x01'
+lengthStruct = Struct('>I')
+intStruct = Struct('>Q')
+#: The length that marks a value of ``None``
+NONE_LENGTH = 0xFFFFFFFF
+
+
+class ParsedPost(namedtuple('ParsedPost', [
+        'post_id', 'topic_id', 'subject', 'sender', 'sender_id', 'name',
+        'encoding', 'body', 'html_body', 'attachments'])):
+    '''A snapshot of the values calculated from an email message
+
+The :meth:`.emailmessage.EmailMessage.snapshot` method returns a
+snapshot of a message. The snapshot cannot be changed, and it can be
+passed to another process (as a pickle, or using :meth:`to_bytes` and
+:meth:`from_bytes`) much more cheaply than the message can be parsed
+again.
+
+The ``attachments`` are a tuple of :class:`.attachment.AttachmentInfo`
+instances. The payloads are not part of the snapshot: they are
+referred to by the ``fileid`` of each attachment.'''
+    __slots__ = ()
+
+    textFields = ('post_id', 'topic_id', 'subject', 'sender', 'sender_id',
+                  'name', 'encoding', 'body', 'html_body')
+
+    @classmethod
+    def from_message(cls, message):
+        '''Create a snapshot of a message
+
+:param message: The message.
+:type message: :class:`.emailmessage.EmailMessage`
+:returns: The snapshot.
+:rtype: :class:`ParsedPost`'''
+        attachments = tuple([a.info() for a in message.attachments])
+        retval = cls(message.post_id, message.topic_id, message.subject,
+                     message.sender, message.sender_id, message.name,
+                     message.encoding, message.body, message.html_body,
+                     attachments)
+        return retval
+
+    def to_bytes(self):
+        '''Write the snapshot in a compact binary format
+
+:returns: The snapshot as bytes.
+:rtype: bytes
+
+Each value is written as a four-byte, big-endian length followed by the
+UTF-8 encoded text, with the lengths of the attachments written as
+eight-byte integers.'''
+        out = [MAGIC]
+        for value in self[:len(self.textFields)]:
+            out.extend(self.pack_text(value))
+        out.append(lengthStruct.pack(len(self.attachments)))
+        for info in self.attachments:
+            for value in info[:2]:  # fileid, filename
+                out.extend(self.pack_text(value))
+            out.append(intStruct.pack(info.length))
+            for value in info[3:]:  # md5, charset, mimetype, contentid
+                out.extend(self.pack_text(value))
+        retval = b''.join(out)
+        return retval
+
+    @staticmethod
+    def pack_text(value):
+        if value is None:
+            retval = (lengthStruct.pack(NONE_LENGTH), )
+        else:
+            data = value.encode('utf-8', textErrors)
+            retval = (lengthStruct.pack(len(data)), data)
+        return retval
+
+    @classmethod
+    def from_bytes(cls, data):
+        '''Read a snapshot that was written by :meth:`to_bytes`
+
+:param bytes data: The snapshot, as bytes.
+:returns: The snapshot.
+:rtype: :class:`ParsedPost`
+:raises ValueError: The data is not a snapshot.'''
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError('The data is not a snapshot of a post')
+        reader = SnapshotReader(data, len(MAGIC))
+        values = [reader.text() for f in cls.textFields]
+        attachments = []
+        for i in range(reader.length()):
+            fileid, filename = reader.text(), reader.text()
+            length = reader.integer()
+            info = AttachmentInfo(fileid, filename, length, reader.text(),
+                                  reader.text(), reader.text(),
+                                  reader.text())
+            attachments.append(info)
+        if reader.offset != len(data):
+            raise ValueError('There is data after the end of the snapshot')
+        values.append(tuple(attachments))
+        retval = cls(*values)
+        return retval
+
+
+class SnapshotReader(object):
+    '''Read the values from a snapshot in the binary format'''
+    def __init__(self, data, offset=0):
+        self.data = memoryview(data)
+        self.offset = offset
+
+    def unpack(self, struct):
+        end = self.offset + struct.size
+        if end > len(self.data):
+            raise ValueError('The snapshot is truncated')
+        retval = struct.unpack(self.data[self.offset:end].tobytes())[0]
+        self.offset = end
+        return retval
+
+    def length(self):
+        return self.unpack(lengthStruct)
+
+    def integer(self):
+        return self.unpack(intStruct)
+
+    def text(self):
+        length = self.length()
+        retval = None
+        if length != NONE_LENGTH:
+            end = self.offset + length
+            if end > len(self.data):
+                raise ValueError('The snapshot is truncated')
+            data = self.data[self.offset:end].tobytes()
+            retval = data.decode('utf-8', textErrors)
+            self.offset = end
+        return retval
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from enum import Enum
+import re
+'''The :mailheader:`Subject` of a message is normalised before the topic
+identifier is calculated. This module provides the :class:`SubjectMode`
+enumeration, for choosing how the subject is normalised, and the
+:class:`SubjectStripper`, which removes the list title and the reply and
+forward prefixes from the start of a subject in a single pass.'''
+
+
+class SubjectMode(Enum):
+    '''An enumeration of the ways the subject can be normalised.'''
+    # __order__ is only needed in 2.x
+    __order__ = 'legacy prefix'
+
+    #: The list title, ``Re:``, ``Fw:`` and ``Fwd:`` are removed from
+    #: anywhere in the subject. This reproduces the topic identifiers of
+    #: existing archives.
+    legacy = 0
+
+    #: The list title, and the reply and forward prefixes in many
+    #: languages, are only removed from the start of the subject.
+    prefix = 1
+
+#: The reply and forward prefixes, in many languages
+prefixes = (
+    're', 'fw', 'fwd',  # English, and everyone else
+    'aw', 'wg',  # German
+    'sv', 'vs', 'vl',  # Scandinavian and Finnish
+    'antw', 'doorst',  # Dutch
+    'tr',  # French
+    'r', 'rif',  # Italian
+    'rv', 'res', 'enc',  # Spanish and Portuguese
+    'odp', 'pd',  # Polish
+    'ynt', 'ilt',  # Turkish
+    'ΑΠ', 'ΣΧΕΤ', 'ΠΡΘ',  # Greek
+    'отв', 'пер',  # Russian
+    '回复', '回覆', '答复', '转发', '轉寄', '轉發',  # Chinese
+    '返信', '転送',  # Japanese
+    '회신', '전달',  # Korean
+)
+# The prefixes can have a count: "Re[2]:", "Re^2:" or "Re(2):". The colon
+# can be a full-width colon.
+prefixPattern = r'(?:{0})(?:\[\d+\]|\^\d+|\(\d+\))?[ \t]*[:：]'.format(
+    '|'.join(re.escape(p) for p in sorted(prefixes, key=len, reverse=True)))
+# The white-space, and the Unicode characters that annoy
+spacePattern = '[\\s\uFFF9\uFFFA\uFFFB\uFFFC\uFEFF\u202A\u202D]*'
+trailingChars = '\uFFF9\uFFFA\uFFFB\uFFFC\uFEFF\u202B\u202E'
+spaceRegexp = re.compile(r'\s+', re.UNICODE)
+
+
+class SubjectStripper(object):
+    '''Remove the list title and prefixes from the start of a subject
+
+:param str list_title: The name of the group.
+
+A subject such as ``Re: [Ethel the Frog] AW: [Fwd: Violence]`` is
+scanned from the start, one token at a time, and each list title in
+square brackets, reply or forward prefix, and opening square bracket of a
+forwarded message is skipped. The square brackets that close the
+forwarded messages are then removed from the end of the subject, and the
+white-space is compressed. Unlike :attr:`SubjectMode.legacy` a prefix
+that appears in the middle of the subject is left alone.'''
+    def __init__(self, list_title=''):
+        self.list_title = list_title
+        titlePattern = '(?!)'  # Never matches
+        if list_title:
+            titlePattern = r'\[{0}\]'.format(re.escape(list_title))
+        p = (r'{space}(?:(?P<title>{title})|'
+             r'(?P<open>\[)(?={space}{prefix})|'
+             r'(?P<prefix>{prefix})){space}')
+        pattern = p.format(space=spacePattern, title=titlePattern,
+                           prefix=prefixPattern)
+        self.leadingRegexp = re.compile(pattern, re.IGNORECASE | re.UNICODE)
+
+    def strip(self, subject, remove_re=True):
+        '''Remove the list title and prefixes from a subject
+
+:param str subject: The subject.
+:param bool remove_re: If ``False`` the reply and forward prefixes are
+                       kept (but the list title, and the square brackets
+                       around forwarded messages, are still removed).
+:returns: The subject without the group name or prefixes, or ``No
+          subject`` if nothing is left.
+:rtype: Unicode
+
+An opening square bracket is only removed if a matching closing square
+bracket ends the subject.'''
+        pos, opened, kept = self.scan(subject, remove_re)
+        end, closed = self.close(subject, pos, opened)
+        if closed < opened:
+            # Scan again, stopping at the first bracket that is not closed
+            pos, opened, kept = self.scan(subject, remove_re, closed)
+            end, closed = self.close(subject, pos, opened)
+        kept.append(subject[pos:end])
+        retval = spaceRegexp.sub(' ', ' '.join(kept)).strip()
+        if not retval:
+            retval = 'No subject'
+        return retval
+
+    def scan(self, subject, remove_re, max_open=None):
+        '''Skip the list title and prefixes at the start of a subject
+
+:param str subject: The subject.
+:param bool remove_re: If ``False`` the reply and forward prefixes are
+                       kept.
+:param int max_open: The maximum number of forwarded messages to open,
+                     or ``None`` for no maximum.
+:returns: The position after the title and prefixes, the number of
+          forwarded messages that were opened, and the prefixes that
+          were kept.
+:rtype: A 3-tuple'''
+        pos = 0
+        opened = 0
+        kept = []
+        while True:
+            m = self.leadingRegexp.match(subject, pos)
+            if m is None:
+                break
+            if m.group('open'):
+                if opened == max_open:
+                    break
+                opened += 1
+            elif m.group('prefix') and not remove_re:
+                kept.append(m.group('prefix'))
+            pos = m.end()
+        return pos, opened, kept
+
+    def close(self, subject, pos, opened):
+        '''Remove the brackets that close the forwarded messages
+
+:param str subject: The subject.
+:param int pos: The position after the title and prefixes.
+:param int opened: The number of forwarded messages that were opened.
+:returns: The end of the subject, and the number of forwarded messages
+          that were closed.
+:rtype: A 2-tuple'''
+        end = self.rstrip(subject, len(subject))
+        closed = 0
+        while (closed < opened) and (end > pos) and (subject[end - 1] == ']'):
+            end = self.rstrip(subject, end - 1)
+            closed += 1
+        return end, closed
+
+    @staticmethod
+    def rstrip(s, end):
+        '''Find the end of a string, ignoring the trailing white-space
+
+:param str s: The string.
+:param int end: The position to look back from.
+:returns: The position after the last character that is not white-space.
+:rtype: int'''
+        while (end > 0) and (s[end - 1].isspace() or
+                             (s[end - 1] in trailingChars)):
+            end -= 1
+        return end
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from glob import glob
+from hashlib import md5
+import os
+from pickle import dumps, loads
+from pkg_resources import resource_filename
+import sys
+from unittest import TestCase, skipIf
+from email.mime.application import MIMEApplication
+from email.mime.text import MIMEText
+from email.parser import Parser
+try:
+    from email.parser import BytesParser
+except ImportError:  # Python 2
+    from email.parser import Parser as BytesParser
+from gs.group.list.base import attachment
+from gs.group.list.base.attachment import (Attachment, calculate_file_id,
+                                           md5_zeros, iter_decoded)
+from gs.group.list.base.emailmessage import EmailMessage
+
+
+class AttachmentTest(TestCase):
+    pngMagicNumber = b'\x89\x50\x4E\x47\x0D\x0A\x1A\x0A'
+
+    def create_attachment(self, payload, spool_threshold=None):
+        retval = Attachment(
+            payload=payload, fileid='ethel', filename='violence.txt',
+            length=len(payload), md5='d41d8cd98f00b204e9800998ecf8427e',
+            charset='utf-8', maintype='text', subtype='plain',
+            mimetype='text/plain', contentid='',
+            spool_threshold=spool_threshold)
+        return retval
+
+    def test_mapping(self):
+        a = self.create_attachment(b'Violence')
+        self.assertEqual(b'Violence', a['payload'])
+        self.assertEqual('violence.txt', a['filename'])
+        self.assertEqual('utf-8', a.get('charset', 'ascii'))
+        self.assertEqual('ascii', a.get('cheese', 'ascii'))
+        self.assertIn('mimetype', a)
+        self.assertEqual(list(Attachment.fields), a.keys())
+        self.assertEqual(len(Attachment.fields), len(a.items()))
+        with self.assertRaises(KeyError):
+            a['cheese']
+
+    def test_slots(self):
+        a = self.create_attachment(b'Violence')
+        self.assertFalse(hasattr(a, '__dict__'))
+        with self.assertRaises(AttributeError):
+            a.cheese = 'Gouda'
+
+    def test_pickle(self):
+        payload = b'Tonight on Ethel the Frog we look at violence.'
+        a = self.create_attachment(payload, spool_threshold=8)
+        self.addCleanup(a.close)
+        self.assertTrue(a.spooled)
+        for protocol in (0, 2):
+            r = loads(dumps(a, protocol))
+            self.assertEqual(a.items(), r.items())
+            self.assertFalse(r.spooled)
+
+    def test_not_spooled(self):
+        a = self.create_attachment(b'Violence', spool_threshold=8)
+        self.assertFalse(a.spooled)
+        self.assertEqual(b'Violence', a.open().read())
+
+    def test_spooled(self):
+        payload = b'Tonight on Ethel the Frog we look at violence.'
+        a = self.create_attachment(payload, spool_threshold=8)
+        self.addCleanup(a.close)
+        self.assertTrue(a.spooled)
+        self.assertIsNone(a.memoryPayload)
+        self.assertEqual(payload, a['payload'])
+        self.assertEqual(payload, a.open().read())
+        self.assertEqual(payload[:8], a.open().read(8))
+
+    def test_spooled_string(self):
+        'Ensure 8bit text payloads are left in memory'
+        payload = 'Tonight on Ethel the Frog we look at violence.'
+        a = self.create_attachment(payload, spool_threshold=8)
+        self.assertFalse(a.spooled)
+        self.assertEqual(payload, a.open().read())
+
+    def test_close(self):
+        payload = b'Tonight on Ethel the Frog we look at violence.'
+        a = self.create_attachment(payload, spool_threshold=8)
+        a.close()
+        self.assertFalse(a.spooled)
+
+    def test_message_spooled(self):
+        testname = os.path.join('tests', 'emails', 'withattachments.eml')
+        fullFileName = resource_filename('gs.group.list.base', testname)
+        with open(fullFileName, 'rb') as infile:
+            raw = infile.read()
+        expected = EmailMessage.from_bytes(raw)
+        message = EmailMessage.from_bytes(raw)
+        message.spool_threshold = 1024
+        self.addCleanup(message.close)
+
+        files = [a for a in message.attachments if a['filename']]
+        self.assertTrue(all([a.spooled for a in files]))
+        for e, r in zip(expected.attachments, message.attachments):
+            self.assertEqual(e['fileid'], r['fileid'])
+            self.assertEqual(e['md5'], r['md5'])
+            self.assertEqual(e['length'], r['length'])
+            self.assertEqual(e['payload'], r['payload'])
+        self.assertEqual(self.pngMagicNumber, files[0].open().read(8))
+        self.assertEqual(expected.post_id, message.post_id)
+
+    def test_message_close(self):
+        testname = os.path.join('tests', 'emails', 'withattachments.eml')
+        fullFileName = resource_filename('gs.group.list.base', testname)
+        with open(fullFileName, 'rb') as infile:
+            raw = infile.read()
+        with EmailMessage.from_bytes(raw) as message:
+            message.spool_threshold = 1024
+            files = [a for a in message.attachments if a['filename']]
+            self.assertTrue(all([a.spooled for a in files]))
+            spools = [a.spool for a in files]
+        self.assertTrue(all([s.closed for s in spools]))
+        self.assertFalse(any([a.spooled for a in files]))
+
+    def test_message_close_unparsed(self):
+        'Ensure closing a message does not create the attachments'
+        message = EmailMessage.from_bytes(b'Subject: Violence\n\nEthel\n')
+        message.close()
+        self.assertNotIn('attachments', message.__dict__)
+
+    def test_lazy(self):
+        'Ensure the payloads are only decoded when they are needed'
+        testname = os.path.join('tests', 'emails', 'withattachments.eml')
+        fullFileName = resource_filename('gs.group.list.base', testname)
+        with open(fullFileName, 'rb') as infile:
+            message = EmailMessage.from_file(infile)
+
+        self.assertTrue(all([a.part is not None
+                             for a in message.attachments]))
+        files = [a for a in message.attachments if a['filename']]
+        self.assertEqual(['image/png'] * 3, [a.mimetype for a in files])
+        self.assertTrue(all([a.part is not None for a in files]))
+
+        self.assertIn('some body', message.body)
+        self.assertTrue(all([a.part is not None for a in files]))
+
+        fileid = files[0]['fileid']
+        self.assertIsNone(files[0].memoryPayload)
+        self.assertIsNotNone(files[0].part)
+        self.assertEqual(fileid, files[0].fileid)
+
+        self.assertEqual(self.pngMagicNumber, files[0]['payload'][:8])
+        self.assertIsNone(files[0].part)
+        self.assertIsNotNone(files[1].part)
+        self.assertEqual(fileid, files[0].fileid)
+
+    @skipIf(sys.version_info < (3, ), 'Python 2 lacks a BytesParser')
+    def test_decode_part_8bit(self):
+        'Ensure 8bit payloads parsed from bytes keep their characters'
+        m = 'Content-Type: application/octet-stream\n'\
+            'Content-Transfer-Encoding: 8bit\n\nü'
+        expected = Attachment.decode_part(Parser().parsestr(m))
+        self.assertEqual('ü', expected)
+        part = BytesParser().parsebytes(m.encode('utf-8'))
+        self.assertEqual(expected, Attachment.decode_part(part))
+        part = BytesParser().parsebytes(m.encode('iso-8859-1'))
+        self.assertEqual(expected,
+                         Attachment.decode_part(part, 'iso-8859-1'))
+
+
+class CalculateFileIdTest(TestCase):
+    '''Pin the file identifiers, which must not change.'''
+    body = bytes(bytearray(range(256))) * 4 + b'Tonight on Ethel the Frog'
+    bodyId = ('2woG8zGaN8VsjNCEnqitum', 1049,
+              'ed9a80ec9fe0d846e4703e455ace2212')
+
+    @skipIf(sys.version_info < (3, ), 'Python 2 hashes the bytes')
+    def test_bytes(self):
+        r = calculate_file_id(self.body, 'application/octet-stream')
+        self.assertEqual(self.bodyId, r)
+
+    @skipIf(sys.version_info < (3, ), 'Python 2 hashes the bytes')
+    def test_bytearray(self):
+        r = calculate_file_id(bytearray(self.body),
+                              'application/octet-stream')
+        self.assertEqual(self.bodyId, r)
+
+    @skipIf(sys.version_info < (3, ), 'Python 2 hashes the bytes')
+    def test_memoryview(self):
+        r = calculate_file_id(memoryview(self.body),
+                              'application/octet-stream')
+        self.assertEqual(self.bodyId, r)
+
+    def test_empty(self):
+        r = calculate_file_id(b'', 'text/plain')
+        expected = ('3EdpOjT4CIBC9i9F3QMXaR', 0,
+                    'd41d8cd98f00b204e9800998ecf8427e')
+        self.assertEqual(expected, r)
+
+    def test_text(self):
+        r = calculate_file_id('Je ne ecrit pas fran\u00e7ais. \u2026\n',
+                              'text/plain')
+        expected = ('2ZKBYrrBNqLwEI7ATVgo2a', 28,
+                    'dc2e2920a90285ab6fef31b1e70bdcfc')
+        self.assertEqual(expected, r)
+
+    def test_md5_zeros(self):
+        '''Test that the MD5 of the zero-bytes is the same on either side of
+the checkpoint'''
+        for n in (0, 1, 1024 * 1024 + 7):
+            self.assertEqual(md5(b'\x00' * n).hexdigest(),
+                             md5_zeros(n).hexdigest())
+
+    def test_md5_zeros_unlocked(self):
+        'Test that the checkpoints are hashed without holding the lock'
+        saved = list(attachment.zeroCheckpoints)
+        del attachment.zeroCheckpoints[1:]
+        update_zeros = attachment.update_zeros
+        locked = []
+
+        def check_update_zeros(md5_sum, n):
+            locked.append(attachment.zeroCheckpointsLock.locked())
+            update_zeros(md5_sum, n)
+        attachment.update_zeros = check_update_zeros
+        try:
+            n = attachment.ZERO_CHECKPOINT + 3
+            r = md5_zeros(n)
+        finally:
+            attachment.update_zeros = update_zeros
+            attachment.zeroCheckpoints[:] = saved
+        self.assertEqual(md5(b'\x00' * n).hexdigest(), r.hexdigest())
+        self.assertEqual([False, False], locked)
+
+    @skipIf(sys.version_info < (3, ), 'Python 2 hashes the bytes')
+    def test_message(self):
+        testname = os.path.join('tests', 'emails', 'withattachments.eml')
+        fullFileName = resource_filename('gs.group.list.base', testname)
+        with open(fullFileName, 'rb') as infile:
+            message = EmailMessage.from_file(infile)
+        r = [(a['fileid'], a['length']) for a in message.attachments]
+        expected = [('24bgldT2IL8FFtsCts5wcr', 70),
+                    ('5eWM6f9Rt7IXjRzWic8zDO', 331),
+                    ('6XzhN4cZhLuU2tXN9xZjcs', 47584),
+                    ('5dtNJD2SftZJuJbsDZjzmp', 10022),
+                    ('2MlQaQOhd5ShOxpdF6SknY', 34391)]
+        self.assertEqual(expected, r)
+
+
+@skipIf(sys.version_info < (3, ), 'Python 2 decodes the whole payload')
+class IterDecodedTest(TestCase):
+    '''Test that decoding a block at a time gives the same payload and
+identifier as decoding everything at once.'''
+    def assert_same(self, part, blockSize):
+        expected = part.get_payload(decode=True)
+        r = b''.join(iter_decoded(part, blockSize))
+        self.assertEqual(expected, r)
+
+        a = Attachment.from_part(part, None)
+        a.load_file_id()
+        self.assertIsNone(a.memoryPayload)
+        self.assertEqual(calculate_file_id(expected, a.mimetype),
+                         (a.fileid, a.length, a.md5))
+
+    def test_emails(self):
+        emails = os.path.join('tests', 'emails')
+        dirName = resource_filename('gs.group.list.base', emails)
+        for fileName in glob(os.path.join(dirName, '*.eml')):
+            with open(fileName, 'rb') as infile:
+                message = EmailMessage.from_file(infile)
+            for a in message.attachments:
+                try:
+                    iter_decoded(a.part)
+                except ValueError:
+                    continue
+                for blockSize in (4, 77, 1024):
+                    self.assert_same(a.part, blockSize)
+
+    def test_base64(self):
+        payload = bytes(bytearray(range(256))) * 64
+        part = MIMEApplication(payload)
+        self.assert_same(part, 100)
+        self.assert_same(part, 4096)
+
+    def test_base64_padding(self):
+        '''Test that missing padding is fixed, like the email package
+does'''
+        part = MIMEApplication(b'Violence!')
+        part.set_payload(part.get_payload().rstrip().rstrip('='))
+        self.assert_same(part, 4)
+
+    def test_base64_invalid(self):
+        '''Test that a payload with invalid characters is decoded all at
+once'''
+        part = MIMEApplication(b'Tonight on Ethel the Frog')
+        payload = part.get_payload()
+        part.set_payload(payload[:8] + '*' + payload[8:])
+        with self.assertRaises(ValueError):
+            b''.join(iter_decoded(part, 4))
+
+        a = Attachment.from_part(part, None)
+        self.assertEqual(
+            calculate_file_id(part.get_payload(decode=True), a.mimetype),
+            (a.fileid, a.length, a.md5))
+        self.assertIsNone(a.part)
+
+    def test_quoted_printable(self):
+        part = MIMEText('Je ne ecrit pas fran\u00e7ais. ' * 100, 'plain',
+                        'iso-8859-1')
+        del part['Content-Transfer-Encoding']
+        part['Content-Transfer-Encoding'] = 'quoted-printable'
+        part.set_payload(
+            'Je ne ecrit pas fran=E7ais.=\n   \nLine two=20\n' * 50)
+        self.assert_same(part, 10)
+        self.assert_same(part, 4096)
+
+    def test_not_block_decoded(self):
+        part = MIMEText('Violence', 'plain', 'us-ascii')
+        with self.assertRaises(ValueError):
+            iter_decoded(part)
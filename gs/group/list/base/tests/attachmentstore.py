@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+import os
+from pkg_resources import resource_filename
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+from zope.interface.verify import verifyObject
+from gs.group.list.base.attachment import Attachment
+from gs.group.list.base.attachmentstore import FileAttachmentStore
+from gs.group.list.base.emailmessage import EmailMessage
+from gs.group.list.base.interfaces import IAttachmentStore
+
+
+class FileAttachmentStoreTest(TestCase):
+    def setUp(self):
+        self.tempDir = mkdtemp()
+        self.store = FileAttachmentStore(os.path.join(self.tempDir, 'files'))
+
+    def tearDown(self):
+        rmtree(self.tempDir)
+
+    @staticmethod
+    def create_attachment(payload, fileid='ethel'):
+        retval = Attachment(payload=payload, fileid=fileid,
+                            filename='violence.txt', length=len(payload),
+                            mimetype='text/plain')
+        return retval
+
+    def read(self, key):
+        with self.store.open(key) as infile:
+            retval = infile.read()
+        return retval
+
+    def test_interface(self):
+        self.assertTrue(verifyObject(IAttachmentStore, self.store))
+
+    def test_put(self):
+        key = self.store.put(self.create_attachment(b'Violence'))
+        self.assertEqual('ethel', key)
+        self.assertIn(key, self.store)
+        self.assertEqual(1, self.store.refcount(key))
+        self.assertEqual(b'Violence', self.read(key))
+
+    def test_put_twice(self):
+        key = self.store.put(self.create_attachment(b'Violence'))
+        path = self.store.path(key)
+        mtime = os.stat(path).st_mtime
+        os.utime(path, (mtime - 60, mtime - 60))
+        key2 = self.store.put(self.create_attachment(b'Violence'))
+        self.assertEqual(key, key2)
+        self.assertEqual(2, self.store.refcount(key))
+        # The file was not written again
+        self.assertEqual(mtime - 60, os.stat(path).st_mtime)
+
+    def test_same_fileid(self):
+        'Ensure that different files with the same identifier are kept'
+        key = self.store.put(self.create_attachment(b'Violence'))
+        key2 = self.store.put(self.create_attachment(b'Gangland'))
+        self.assertNotEqual(key, key2)
+        self.assertEqual('ethel-1', key2)
+        self.assertEqual(b'Violence', self.read(key))
+        self.assertEqual(b'Gangland', self.read(key2))
+        self.assertEqual('ethel-1',
+                         self.store.put(self.create_attachment(b'Gangland')))
+
+    def test_same_fileid_released(self):
+        'Ensure a file with a suffix is found after the first is released'
+        key = self.store.put(self.create_attachment(b'Violence'))
+        key2 = self.store.put(self.create_attachment(b'Gangland'))
+        self.store.release(key)
+        r = self.store.put(self.create_attachment(b'Gangland'))
+        self.assertEqual(key2, r)
+        self.assertEqual(2, self.store.refcount(key2))
+        self.assertNotIn(key, self.store)
+        # The free key is used for a new file
+        r = self.store.put(self.create_attachment(b'Piranhas'))
+        self.assertEqual(key, r)
+
+    def test_text(self):
+        key = self.store.put(self.create_attachment('Je ne ecrit pas '
+                                                    'français.'))
+        expected = 'Je ne ecrit pas français.'.encode('utf-8')
+        self.assertEqual(expected, self.read(key))
+        self.assertEqual(len(expected),
+                         self.store.read_meta(key)['length'])
+
+    def test_release(self):
+        key = self.store.put(self.create_attachment(b'Violence'))
+        self.store.put(self.create_attachment(b'Violence'))
+        self.store.release(key)
+        self.assertEqual(1, self.store.refcount(key))
+        self.store.release(key)
+        self.assertNotIn(key, self.store)
+        self.assertEqual(0, self.store.refcount(key))
+        self.assertFalse(os.path.exists(self.store.path(key)))
+        with self.assertRaises(KeyError):
+            self.store.release(key)
+        with self.assertRaises(KeyError):
+            self.store.open(key)
+
+    def test_bad_key(self):
+        with self.assertRaises(ValueError):
+            self.store.open('../ethel')
+
+    def test_message(self):
+        fileName = resource_filename(
+            'gs.group.list.base', os.path.join('tests', 'emails',
+                                               'withattachments.eml'))
+        with open(fileName, 'rb') as infile:
+            raw = infile.read()
+        message = EmailMessage.from_bytes(raw)
+        r = message.store_attachments(self.store)
+        named = [a for a in message.attachments if a['filename']]
+        self.assertEqual(named, [a for a, k in r])
+        for attachment, key in r:
+            self.assertEqual(attachment['payload'], self.read(key))
+        again = EmailMessage.from_bytes(raw).store_attachments(self.store)
+        self.assertEqual([k for a, k in r], [k for a, k in again])
+        self.assertEqual([2] * len(r),
+                         [self.store.refcount(k) for a, k in r])
+
+    def test_message_bodies(self):
+        m = 'Subject: Violence\n\nTonight on Ethel the Frog.\n'
+        r = EmailMessage(m).store_attachments(self.store, bodies=True)
+        self.assertEqual(1, len(r))
+        self.assertEqual(b'Tonight on Ethel the Frog.\n', self.read(r[0][1]))
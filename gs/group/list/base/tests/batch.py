@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from glob import glob
+import os
+from pkg_resources import resource_filename
+from unittest import TestCase
+from gs.group.list.base.batch import parse_many, ParseFailure
+from gs.group.list.base.emailmessage import EmailMessage
+
+
+class ParseManyTest(TestCase):
+    def setUp(self):
+        emails = os.path.join('tests', 'emails')
+        dirName = resource_filename('gs.group.list.base', emails)
+        self.messages = []
+        for fileName in sorted(glob(os.path.join(dirName, '*.eml'))):
+            with open(fileName, 'rb') as infile:
+                self.messages.append(infile.read())
+
+    def assert_results(self, r):
+        self.assertEqual(len(self.messages), len(r))
+        for raw, result in zip(self.messages, r):
+            expected = EmailMessage(raw, group_id='ethel')
+            self.assertEqual(expected.post_id, result.post_id)
+            self.assertEqual(expected.topic_id, result.topic_id)
+            self.assertEqual(expected.subject, result.subject)
+            self.assertEqual(expected.sender, result.sender)
+            self.assertEqual(expected.body, result.body)
+            self.assertEqual([a['fileid'] for a in expected.attachments],
+                             [a.fileid for a in result.attachments])
+
+    def test_in_process(self):
+        r = list(parse_many(self.messages, workers=1, group_id='ethel'))
+        self.assert_results(r)
+
+    def test_pool(self):
+        r = list(parse_many(iter(self.messages), workers=2,
+                            group_id='ethel', chunksize=3))
+        self.assert_results(r)
+
+    def test_stop_early(self):
+        results = parse_many(self.messages, workers=2, group_id='ethel',
+                             chunksize=1)
+        r = next(results)
+        results.close()
+        expected = EmailMessage(self.messages[0], group_id='ethel')
+        self.assertEqual(expected.post_id, r.post_id)
+
+    def assert_failure(self, messages, r):
+        self.assertEqual(len(messages), len(r))
+        self.assertIsInstance(r[1], ParseFailure)
+        self.assertEqual(1, r[1].index)
+        self.assertIn('Error', r[1].error)
+        for i in (0, 2, 3):
+            expected = EmailMessage(messages[i], group_id='ethel')
+            self.assertEqual(expected.post_id, r[i].post_id)
+
+    def test_failure_in_process(self):
+        'Ensure a message that cannot be parsed does not stop the rest'
+        messages = [self.messages[0], None] + self.messages[1:3]
+        r = list(parse_many(messages, workers=1, group_id='ethel'))
+        self.assert_failure(messages, r)
+
+    def test_failure_pool(self):
+        messages = [self.messages[0], None] + self.messages[1:3]
+        r = list(parse_many(iter(messages), workers=2, group_id='ethel',
+                            chunksize=1))
+        self.assert_failure(messages, r)
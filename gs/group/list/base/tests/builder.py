@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+import os
+from pkg_resources import resource_filename
+from unittest import TestCase
+from gs.group.list.base.builder import (EmailMessageBuilder,
+                                        MessageTooLargeError)
+from gs.group.list.base.emailmessage import EmailMessage
+
+
+class EmailMessageBuilderTest(TestCase):
+    m = '''From: Me <a.member@example.com>
+To: Group <group@groups.example.com>
+Subject: Violence
+
+Tonight on Ethel the Frog we look at violence.\n'''
+
+    @staticmethod
+    def load_email_bytes(filename):
+        testname = os.path.join('tests', 'emails', filename)
+        fullFileName = resource_filename('gs.group.list.base', testname)
+        with open(fullFileName, 'rb') as infile:
+            retval = infile.read()
+        return retval
+
+    @staticmethod
+    def chunks(s, size):
+        return [s[i:i + size] for i in range(0, len(s), size)]
+
+    def test_string(self):
+        builder = EmailMessageBuilder(list_title='Ethel the Frog',
+                                      group_id='ethel')
+        for chunk in self.chunks(self.m, 7):
+            builder.feed(chunk)
+        r = builder.close()
+
+        expected = EmailMessage(self.m, list_title='Ethel the Frog',
+                                group_id='ethel')
+        self.assertEqual('Violence', r.subject)
+        self.assertEqual(expected.body, r.body)
+        self.assertEqual(expected.post_id, r.post_id)
+
+    def test_bytes(self):
+        raw = self.load_email_bytes('withattachments.eml')
+        builder = EmailMessageBuilder(group_id='ethel')
+        for chunk in self.chunks(raw, 1024):
+            builder.feed(chunk)
+        r = builder.close()
+
+        expected = EmailMessage.from_bytes(raw, group_id='ethel')
+        self.assertEqual(expected.post_id, r.post_id)
+        self.assertEqual([a['fileid'] for a in expected.attachments],
+                         [a['fileid'] for a in r.attachments])
+
+    def test_max_size(self):
+        builder = EmailMessageBuilder(max_size=len(self.m))
+        for chunk in self.chunks(self.m, 10):
+            builder.feed(chunk)
+        r = builder.close()
+        self.assertEqual('Violence', r.subject)
+
+    def test_too_large(self):
+        builder = EmailMessageBuilder(max_size=32)
+        builder.feed(self.m[:30])
+        with self.assertRaises(MessageTooLargeError):
+            builder.feed(self.m[30:60])
+        self.assertIsNone(builder.parser)
+        with self.assertRaises(MessageTooLargeError):
+            builder.feed(self.m[60:])
+        with self.assertRaises(MessageTooLargeError):
+            builder.close()
+
+    def test_mixed(self):
+        builder = EmailMessageBuilder()
+        builder.feed(self.m[:30].encode('utf-8'))
+        with self.assertRaises(TypeError):
+            builder.feed(self.m[30:])
+        builder.feed(self.m[30:].encode('utf-8'))
+        r = builder.close()
+        self.assertEqual('Violence', r.subject)
+
+    def test_reuse(self):
+        'Test that the size of one message does not count for the next'
+        builder = EmailMessageBuilder(max_size=len(self.m))
+        for chunk in self.chunks(self.m, 10):
+            builder.feed(chunk)
+        builder.close()
+        self.assertEqual(0, builder.size)
+        builder.feed(self.m.encode('utf-8'))
+        r = builder.close()
+        self.assertEqual('Violence', r.subject)
+
+    def test_reuse_too_large(self):
+        builder = EmailMessageBuilder(max_size=32)
+        with self.assertRaises(MessageTooLargeError):
+            builder.feed(self.m)
+        with self.assertRaises(MessageTooLargeError):
+            builder.close()
+        builder.feed('Subject: Gangland\n\nPiranha\n')
+        r = builder.close()
+        self.assertEqual('Gangland', r.subject)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from unittest import TestCase
+from gs.group.list.base.charset import CharsetResolver
+
+
+class CharsetResolverTest(TestCase):
+    s = 'Je ne ecrit pas français.'
+
+    def setUp(self):
+        self.resolver = CharsetResolver()
+
+    def test_resolve(self):
+        self.assertEqual('utf-8', self.resolver.resolve('utf-8'))
+        self.assertEqual('ISO-8859-1', self.resolver.resolve('ISO-8859-1'))
+
+    def test_resolve_alias(self):
+        self.assertEqual('utf-8', self.resolver.resolve('UTF8'))
+        self.assertEqual('cp850', self.resolver.resolve('cp-850'))
+        self.assertEqual('utf-7', self.resolver.resolve('unicode-1-1-utf-7'))
+        self.assertEqual('mac_roman', self.resolver.resolve('macintosh'))
+        self.assertEqual('iso-8859-8', self.resolver.resolve('iso-8859-8-i'))
+        self.assertEqual(5, self.resolver.counts['alias'])
+
+    def test_resolve_unknown(self):
+        self.assertEqual('utf-8', self.resolver.resolve('x-unknown'))
+        self.assertEqual('utf-8', self.resolver.resolve('wierd'))
+        self.assertEqual(2, self.resolver.counts['unknown'])
+
+    def test_resolve_not_text(self):
+        'Ensure codecs that are not for text are rejected'
+        self.assertEqual('utf-8', self.resolver.resolve('base64'))
+
+    def test_resolve_not_string(self):
+        self.assertEqual('utf-8', self.resolver.resolve(None))
+        self.assertEqual('utf-8',
+                         self.resolver.resolve(('utf-8', '', 'latin-1')))
+
+    def test_resolve_cached(self):
+        self.resolver.resolve('cp-850')
+        self.resolver.resolve('cp-850')
+        self.assertEqual(1, self.resolver.counts['lookup'])
+        self.assertEqual(1, self.resolver.counts['cached'])
+        self.assertEqual(1, self.resolver.stats['labels']['hits'])
+
+    def test_decode(self):
+        r = self.resolver.decode(self.s.encode('latin-1'), 'latin-1')
+        self.assertEqual(self.s, r)
+        self.assertEqual(1, self.resolver.counts['declared'])
+
+    def test_decode_text(self):
+        self.assertEqual(self.s, self.resolver.decode(self.s, 'ascii'))
+
+    def test_decode_fallback(self):
+        'Test that text that lies about being UTF-8 is decoded'
+        r = self.resolver.decode(self.s.encode('windows-1252'), 'utf-8')
+        self.assertEqual(self.s, r)
+        self.assertEqual(1, self.resolver.counts['fallback:windows-1252'])
+
+    def test_decode_fallback_utf8(self):
+        'Test that UTF-8 that claims to be ASCII is decoded'
+        r = self.resolver.decode(self.s.encode('utf-8'), 'us-ascii')
+        self.assertEqual(self.s, r)
+        self.assertEqual(1, self.resolver.counts['fallback:utf-8'])
+
+    def test_decode_sample(self):
+        'Test that a fallback that only fails after the sample is skipped'
+        resolver = CharsetResolver(sample_size=4)
+        data = 'Violence'.encode('ascii') + b'\x81'
+        r = resolver.decode(data, 'utf-8')
+        self.assertEqual('Violence\uFFFD', r)
+        self.assertEqual(1, resolver.counts['lossy'])
+
+    def test_decode_lossy(self):
+        resolver = CharsetResolver(fallbacks=())
+        r = resolver.decode(self.s.encode('latin-1'), 'utf-8')
+        self.assertEqual(self.s.replace('ç', '\uFFFD'), r)
+        self.assertEqual(1, resolver.counts['lossy'])
@@ -27,7 +27,8 @@ import os
 from pkg_resources import resource_filename
 import sys
 from unittest import TestCase
-from gs.group.list.base.emailmessage import EmailMessage
+from gs.group.list.base.emailmessage import (
+    CompactedMessageError, EmailMessage, topicIdCache)
 
 
 class EmailMessageTest(TestCase):
@@ -237,6 +238,30 @@ Tonight on Ethel the Frog we look at violence.\n'''
         r = self.message.body
         self.assertEqual(expected, r)
 
+    def test_body_html_only_limits(self):
+        th = MIMEText(
+            '<p>Tonight on Ethel the Frog\u2026</p><p>we look at '
+            'violence.\n</p>', 'html', 'utf-8')
+        for h, v in self.message.message.items():
+            th.add_header(h, v)
+        self.message.message = th
+        self.message.htmlLimits = {'max_elements': 1}
+
+        expected = 'Tonight on Ethel the Frog\u2026\n\n[...]'
+        r = self.message.body
+        self.assertEqual(expected, r)
+
+    def test_body_html_only_references(self):
+        'Ensure a body of references is limited by default'
+        th = MIMEText('&amp;' * 100000, 'html', 'utf-8')
+        for h, v in self.message.message.items():
+            th.add_header(h, v)
+        self.message.message = th
+
+        r = self.message.body
+        maxReferences = self.message.htmlLimits['max_references']
+        self.assertEqual('&' * maxReferences + '\n\n[...]', r)
+
     def test_body_html_only_latin1(self):
         th = MIMEText(
             "<p>Je ne ecrit pas français.</p>", 'html', 'latin-1')
@@ -661,7 +686,9 @@ encoding'''
         self.message.message = m
 
         self.assertIn('<HTML>', self.message.html_body)
-        expected = self.simpleEmailExpected.replace('ç', '').strip()
+        # The text is decoded using Windows-1252, rather than losing the
+        # characters that are not UTF-8
+        expected = self.simpleEmailExpected.strip()
         self.assertEqual(expected, self.message.body.strip())
 
     # Real World stress tests follow
@@ -839,8 +866,7 @@ claims that it is 7bit and UTF-8'''
         m = self.load_email('simple-latin1-7bit_utf8_borken.eml')
         self.message.message = m
 
-        expected = self.simpleEmailExpected.replace('ç', '')
-        self.assertEqual(expected, self.message.body)
+        self.assertEqual(self.simpleEmailExpected, self.message.body)
 
     def test_simple_utf8_base64(self):
         m = self.load_email('simple-utf8-base64.eml')
@@ -886,3 +912,251 @@ that it is 7bit'''
         for a in attachments:
             self.assertEqual(self.pngMagicNumber, a['payload'][:8],
                              '{0} is not a PNG'.format(a['filename']))
+
+    def assert_same_message(self, expected, r):
+        self.assertEqual(expected.topic_id, r.topic_id)
+        self.assertEqual(expected.post_id, r.post_id)
+        self.assertEqual([a['fileid'] for a in expected.attachments],
+                         [a['fileid'] for a in r.attachments])
+
+    @staticmethod
+    def load_email_bytes(filename):
+        '''Load the raw bytes of a sample email file'''
+        testname = os.path.join('tests', 'emails', filename)
+        fullFileName = resource_filename('gs.group.list.base', testname)
+        with open(fullFileName, 'rb') as infile:
+            retval = infile.read()
+        return retval
+
+    def test_from_bytes(self):
+        r = EmailMessage.from_bytes(self.m.encode('utf-8'),
+                                    list_title='Ethel the Frog',
+                                    group_id='ethel')
+        self.assertEqual('Violence', r.subject)
+        self.assert_same_message(self.message, r)
+
+    def test_from_bytes_attachments(self):
+        raw = self.load_email_bytes('withattachments.eml')
+        expected = EmailMessage(raw.decode('utf-8'), group_id='ethel')
+        r = EmailMessage.from_bytes(raw, group_id='ethel')
+        self.assert_same_message(expected, r)
+
+    def test_from_bytes_8bit(self):
+        raw = self.load_email_bytes('simple-utf8-8bit.eml')
+        expected = EmailMessage(raw.decode('utf-8'), group_id='ethel')
+        r = EmailMessage.from_bytes(raw, group_id='ethel')
+        self.assertEqual(self.simpleEmailExpected, r.body)
+        self.assert_same_message(expected, r)
+
+    def test_from_bytes_8bit_headers(self):
+        'Ensure raw UTF-8 headers are decoded'
+        m = '''From: José <a.member@example.com>
+To: Group <group@groups.example.com>
+Subject: [Ethel the Frog] Café
+
+Tonight on Ethel the Frog we look at violence.\n'''
+        expected = EmailMessage(m, list_title='Ethel the Frog',
+                                group_id='ethel')
+        r = EmailMessage.from_bytes(m.encode('utf-8'),
+                                    list_title='Ethel the Frog',
+                                    group_id='ethel')
+        self.assertEqual('a.member@example.com', r.sender)
+        self.assertEqual('José', r.name)
+        self.assertEqual('Café', r.subject)
+        self.assertEqual('café', r.compressed_subject)
+        self.assert_same_message(expected, r)
+        self.assertEqual(expected.snapshot(), r.snapshot())
+
+    def test_from_bytes_8bit_no_charset(self):
+        'Ensure 8bit parts without a charset are decoded as UTF-8'
+        m = '''From: Me <a.member@example.com>
+To: Group <group@groups.example.com>
+Subject: Violence
+MIME-Version: 1.0
+Content-Type: multipart/mixed; boundary="frog"
+
+--frog
+Content-Type: text/plain
+Content-Transfer-Encoding: 8bit
+
+Café au lait
+--frog
+Content-Type: application/octet-stream
+Content-Disposition: attachment; filename="frog.bin"
+Content-Transfer-Encoding: 8bit
+
+ü
+--frog--
+'''
+        expected = EmailMessage(m, group_id='ethel')
+        r = EmailMessage.from_bytes(m.encode('utf-8'), group_id='ethel')
+        self.assertEqual('Café au lait', r.body)
+        self.assertEqual([a['length'] for a in expected.attachments],
+                         [a['length'] for a in r.attachments])
+        self.assert_same_message(expected, r)
+
+    def test_from_bytes_8bit_lies(self):
+        'Ensure the charset fallbacks are used for 8bit parts from bytes'
+        m = '''From: Me <a.member@example.com>
+To: Group <group@groups.example.com>
+Subject: Violence
+Content-Type: text/plain; charset={0}
+Content-Transfer-Encoding: 8bit
+
+Je ne ecrit pas fran\xe7ais.
+'''
+        r = EmailMessage.from_bytes(m.format('utf-8').encode('latin-1'))
+        self.assertEqual(self.simpleEmailExpected, r.body)
+        r = EmailMessage.from_bytes(m.format('x-unknown').encode('utf-8'))
+        self.assertEqual(self.simpleEmailExpected, r.body)
+
+    def test_from_file(self):
+        raw = self.load_email_bytes('ms-outlook-01.eml')
+        expected = EmailMessage(raw.decode('utf-8'), group_id='ethel')
+        testname = os.path.join('tests', 'emails', 'ms-outlook-01.eml')
+        fullFileName = resource_filename('gs.group.list.base', testname)
+        with open(fullFileName, 'rb') as infile:
+            r = EmailMessage.from_file(infile, group_id='ethel')
+        self.assert_same_message(expected, r)
+
+    def test_message_object(self):
+        'Ensure an already parsed message can be passed in'
+        m = Parser().parsestr(self.m)
+        r = EmailMessage(m, list_title='Ethel the Frog', group_id='ethel')
+        self.assertIs(m, r.message)
+        self.assert_same_message(self.message, r)
+
+    def test_headers_only(self):
+        r = EmailMessage(self.m, list_title='Ethel the Frog',
+                         group_id='ethel', headers_only=True)
+        self.assertEqual('Violence', r.subject)
+        self.assertEqual('a.member@example.com', r.sender)
+        self.assertEqual(self.message.topic_id, r.topic_id)
+        self.assertFalse(r.message.is_multipart())
+        self.assertIsNotNone(r._unparsed)
+
+    def test_headers_only_upgrade(self):
+        raw = self.load_email_bytes('withattachments.eml')
+        expected = EmailMessage.from_bytes(raw, group_id='ethel')
+        r = EmailMessage.from_bytes(raw, group_id='ethel',
+                                    headers_only=True)
+        self.assertEqual(expected.topic_id, r.topic_id)
+        self.assertIsInstance(r.message.get_payload(), type(''))
+
+        self.assertEqual(expected.post_id, r.post_id)
+        self.assertTrue(r.message.is_multipart())
+        self.assertIsNone(r._unparsed)
+        self.assert_same_message(expected, r)
+
+    def test_headers_only_body(self):
+        'Ensure the body is not parsed in headers-only mode'
+        raw = self.load_email_bytes('withattachments.eml')
+        r = EmailMessage.from_bytes(raw, group_id='ethel',
+                                    headers_only=True)
+        self.assertEqual('', r.message.get_payload())
+        expected = EmailMessage.from_bytes(raw, group_id='ethel')
+        self.assertEqual(expected.message.items(), r.message.items())
+
+    def test_split_headers(self):
+        for eol in ('\n', '\r\n'):
+            m = eol.join(['Subject: Violence', 'From: a@example.com', '',
+                          'Body', '', 'More'])
+            r = EmailMessage.split_headers(m)
+            self.assertEqual(eol.join(['Subject: Violence',
+                                       'From: a@example.com']), r)
+            r = EmailMessage.split_headers(m.encode('ascii'))
+            self.assertEqual(eol.join(['Subject: Violence',
+                                       'From: a@example.com']).encode(
+                                           'ascii'), r)
+        self.assertEqual('', EmailMessage.split_headers('\nBody'))
+        self.assertEqual('Subject: Violence',
+                         EmailMessage.split_headers('Subject: Violence'))
+
+    def test_headers_only_replaced(self):
+        'Ensure a replaced message is not clobbered by the full parse'
+        r = EmailMessage(self.m, group_id='ethel', headers_only=True)
+        m = self.load_email('withattachments.eml')
+        r.message = m
+        self.assertEqual(5, len(r.attachments))
+        self.assertIs(m, r.message)
+
+    def test_get_cached(self):
+        r = self.message.get('Subject')
+        self.assertEqual('Violence', r)
+        self.assertEqual({'Violence': 'Violence'},
+                         self.message.decodedHeaders)
+
+    def test_get_cached_changed(self):
+        'Ensure a changed header is decoded again'
+        self.assertEqual('Violence', self.message.get('Subject'))
+        s = 'Je ne ecrit pas français.'
+        subj = Header(s.encode('latin-1'), 'latin-1').encode()
+        self.message.message.replace_header('Subject', subj)
+        self.assertEqual(s, self.message.get('Subject'))
+        self.assertEqual(s, self.message.decodedHeaders[subj])
+
+    def test_get_cached_header(self):
+        'Ensure that Header instances are decoded, but not cached'
+        s = 'Tonight on Ethel the Frog… we look at violence'
+        self.message.message.replace_header('Subject', Header(s, 'utf-8'))
+        self.assertEqual(s, self.message.get('Subject'))
+        self.assertNotIn(s, self.message.decodedHeaders.values())
+
+    def test_decode_header_value_ascii(self):
+        r = self.message.decode_header_value('Violence')
+        self.assertEqual('Violence', r)
+
+    def test_topic_id_cached(self):
+        key = ('violence', 'ethel', '')
+        topicIdCache.delete(key)
+        misses = topicIdCache.misses
+        self.assertEqual('2kxkamRQ35fmTJ6pTRK8yN', self.message.topic_id)
+        self.assertEqual(misses + 1, topicIdCache.misses)
+        self.assertEqual('2kxkamRQ35fmTJ6pTRK8yN', topicIdCache.get(key))
+
+        hits = topicIdCache.hits
+        r = EmailMessage(self.m + '.', list_title='Ethel the Frog',
+                         group_id='ethel')
+        self.assertEqual('2kxkamRQ35fmTJ6pTRK8yN', r.topic_id)
+        self.assertEqual(hits + 1, topicIdCache.hits)
+
+    def test_calculate_topic_id(self):
+        r = self.message.calculate_topic_id('violence', 'ethel', '')
+        self.assertEqual('2kxkamRQ35fmTJ6pTRK8yN', r)
+
+    def test_compact(self):
+        m = self.load_email('withattachments.eml')
+        expected = EmailMessage(m, list_title='Ethel the Frog')
+        r = EmailMessage(m, list_title='Ethel the Frog')
+        self.assertIs(r, r.compact())
+        with self.assertRaises(CompactedMessageError):
+            r.message
+        self.assertEqual(expected.post_id, r.post_id)
+        self.assertEqual(expected.topic_id, r.topic_id)
+        self.assertEqual(expected.body, r.body)
+        self.assertEqual(expected.headers, r.headers)
+        self.assertEqual(expected.get('Subject'), r.get('Subject'))
+        self.assertEqual([a.items() for a in expected.attachments],
+                         [a.items() for a in r.attachments])
+        self.assertEqual([None] * 5, [a.part for a in r.attachments])
+
+    def test_compact_edit(self):
+        'Ensure the headers can be edited after the message is compacted'
+        self.message.compact()
+        self.message.compact()  # Does nothing
+        postId = self.message.post_id
+        self.message.replace_header('Subject', 'Gangland')
+        self.assertEqual('Gangland', self.message.subject)
+        self.assertNotEqual(postId, self.message.post_id)
+
+    def test_compact_headers_only(self):
+        r = EmailMessage(self.m, list_title='Ethel the Frog',
+                         group_id='ethel', headers_only=True)
+        r.compact()
+        self.assertEqual(self.message.post_id, r.post_id)
+        self.assertIn('violence', r.body)
+
+    def test_compact_replaced(self):
+        self.message.compact()
+        self.message.message = Parser().parsestr(self.m)
+        self.assertEqual('Violence', self.message.message['Subject'])
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from email.parser import Parser
+from unittest import TestCase
+from gs.group.list.base.emailmessage import EmailMessage
+from gs.group.list.base.headers import HeaderOverlay
+
+
+class HeaderOverlayTest(TestCase):
+    m = '''From: Me <a.member@example.com>
+To: Group <group@groups.example.com>
+Subject: Violence
+X-Frog: Ethel
+X-Frog: Harry
+
+Tonight on Ethel the Frog we look at violence.\n'''
+
+    def setUp(self):
+        self.message = Parser().parsestr(self.m)
+        self.overlay = HeaderOverlay(self.message)
+
+    def test_unedited(self):
+        self.assertEqual(self.message.items(), self.overlay.items())
+        self.assertEqual('Violence', self.overlay.get('subject'))
+        self.assertEqual(['Ethel', 'Harry'], self.overlay.get_all('x-frog'))
+        self.assertEqual(0, self.overlay.version)
+
+    def test_add(self):
+        self.overlay.add('In-Reply-To', '<violence@example.com>')
+        self.assertEqual('<violence@example.com>',
+                         self.overlay.get('in-reply-to'))
+        self.assertEqual(('In-Reply-To', '<violence@example.com>'),
+                         self.overlay.items()[-1])
+        self.assertEqual(1, self.overlay.version)
+        self.assertNotIn('In-Reply-To', self.message)
+
+    def test_replace(self):
+        self.overlay.replace('x-frog', 'Dinsdale')
+        self.assertEqual(['Dinsdale', 'Harry'],
+                         self.overlay.get_all('X-Frog'))
+        self.assertEqual('Ethel', self.message['X-Frog'])
+
+    def test_replace_missing(self):
+        with self.assertRaises(KeyError):
+            self.overlay.replace('In-Reply-To', '<violence@example.com>')
+        self.assertEqual(0, self.overlay.version)
+
+    def test_delete(self):
+        self.overlay.delete('X-Frog')
+        self.assertIsNone(self.overlay.get('X-Frog'))
+        self.assertEqual('Cheese', self.overlay.get('X-Frog', 'Cheese'))
+        self.assertEqual(3, len(self.overlay.items()))
+        self.assertEqual(['Ethel', 'Harry'], self.message.get_all('X-Frog'))
+
+    def test_set_message(self):
+        'Test that the edits are applied to a new message'
+        self.overlay.replace('Subject', 'Gangland')
+        self.overlay.replace('X-Frog', 'Dinsdale')
+        m = Parser().parsestr('Subject: Cheese\n\nShop\n')
+        self.overlay.set_message(m)
+        self.assertEqual('Gangland', self.overlay.get('Subject'))
+        self.assertIsNone(self.overlay.get('X-Frog'))
+        self.assertEqual(3, self.overlay.version)
+
+    def test_set_message_no_bump(self):
+        'Test that the version can be kept when the message is replaced'
+        self.overlay.replace('Subject', 'Gangland')
+        m = Parser().parsestr(self.m)
+        self.overlay.set_message(m, bump=False)
+        self.assertIs(m, self.overlay.message)
+        self.assertEqual('Gangland', self.overlay.get('Subject'))
+        self.assertEqual(1, self.overlay.version)
+
+
+class EmailMessageHeadersTest(TestCase):
+    def setUp(self):
+        self.message = EmailMessage(HeaderOverlayTest.m,
+                                    list_title='Ethel the Frog',
+                                    group_id='ethel')
+
+    def test_replace_subject(self):
+        topicId = self.message.topic_id
+        postId = self.message.post_id
+        self.message.replace_header('Subject', '[Ethel the Frog] Gangland')
+        self.assertEqual('[Ethel the Frog] Gangland',
+                         self.message.get('Subject'))
+        self.assertEqual('Gangland', self.message.subject)
+        self.assertEqual('gangland', self.message.compressed_subject)
+        self.assertNotEqual(topicId, self.message.topic_id)
+        self.assertNotEqual(postId, self.message.post_id)
+        self.assertEqual('Violence', self.message.message['Subject'])
+
+    def test_headers_edited(self):
+        version = self.message.headersVersion
+        self.assertNotIn('In-Reply-To', self.message.headers)
+        self.message.add_header('In-Reply-To', '<violence@example.com>')
+        self.assertEqual(version + 1, self.message.headersVersion)
+        self.assertTrue(self.message.headers.endswith(
+            'In-Reply-To: <violence@example.com>'))
+
+    def test_headers_message_changed(self):
+        'Test that a change made directly to the message is seen'
+        self.assertNotIn('X-Foo', self.message.headers)
+        self.message.message['X-Foo'] = 'bar'
+        self.assertTrue(self.message.headers.endswith('X-Foo: bar'))
+        self.assertEqual('bar', self.message.get('X-Foo'))
+
+    def test_del_header(self):
+        self.message.del_header('From')
+        self.assertEqual('', self.message.sender)
+        self.assertEqual('', self.message.name)
+
+    def test_set(self):
+        'Test that a value that is set is kept'
+        self.message.subject = 'Cheese'
+        self.message.replace_header('Subject', 'Gangland')
+        self.assertEqual('Cheese', self.message.subject)
+        del self.message.subject
+        self.assertEqual('Gangland', self.message.subject)
+
+    def test_headers_only_sender_id(self):
+        'Test that the sender is looked up once if the body is parsed'
+        calls = []
+
+        def sender_id_cb(address):
+            calls.append(address)
+            return 'dinsdale'
+        raw = HeaderOverlayTest.m.encode('utf-8')
+        message = EmailMessage.from_bytes(raw, sender_id_cb=sender_id_cb,
+                                          headers_only=True)
+        version = message.headersVersion
+        self.assertEqual('dinsdale', message.sender_id)
+        self.assertTrue(message.post_id)
+        self.assertTrue(message.message.get_payload())
+        self.assertEqual('dinsdale', message.sender_id)
+        self.assertEqual(1, len(calls))
+        self.assertEqual(version, message.headersVersion)
+
+    def test_sender_id_other_header(self):
+        'Test that the sender is only looked up again if From changes'
+        calls = []
+
+        def sender_id_cb(address):
+            calls.append(address)
+            return address.split('@')[0]
+        message = EmailMessage(HeaderOverlayTest.m,
+                               sender_id_cb=sender_id_cb)
+        sender_id = message.sender_id
+        message.add_header('X-GS-Formatted', 'True')
+        message.replace_header('Subject', 'Gangland')
+        self.assertEqual(sender_id, message.sender_id)
+        self.assertEqual(1, len(calls))
+        message.replace_header('From', 'Dinsdale <dinsdale@example.com>')
+        self.assertEqual('dinsdale', message.sender_id)
+        self.assertEqual(2, len(calls))
+
+    def test_headers_only(self):
+        'Test that the edits survive parsing the body'
+        raw = HeaderOverlayTest.m.encode('utf-8')
+        message = EmailMessage.from_bytes(raw, headers_only=True)
+        message.replace_header('Subject', 'Gangland')
+        self.assertIn('violence', message.body)
+        self.assertTrue(message.message.get_payload())
+        self.assertEqual('Gangland', message.subject)
@@ -17,8 +17,9 @@ import codecs
 import os
 from pkg_resources import resource_filename
 from unittest import TestCase
-from gs.group.list.base.html2txt import (HTMLConverter, convert_to_txt,
-                                         unicodeOrString)
+from gs.group.list.base.html2txt import (
+    HTMLConverter, convert_to_txt, unicodeOrString, StreamingHTMLConverter,
+    iter_convert_to_txt, HTMLLimit)
 
 
 class HTMLConverterTest(TestCase):
@@ -94,6 +95,14 @@ class HTMLConverterTest(TestCase):
             expected = infile.read().strip()
         self.assertEqual(expected, r)
 
+    def test_out_text(self):
+        'Test that the text so far excludes the open paragraph'
+        self.converter.feed('<p>Ethel the Frog.</p><p>Violence')
+        self.assertEqual('Ethel the Frog.\n\n', self.converter.outText)
+        self.converter.feed('.</p>')
+        self.assertEqual('Ethel the Frog.\n\nViolence.\n\n',
+                         self.converter.outText)
+
 
 class ConvertToTextTest(TestCase):
     def test_html(self):
@@ -117,3 +126,192 @@ class ConvertToTextTest(TestCase):
     def test_fail(self):
         with self.assertRaises(ValueError):
             convert_to_txt(None)
+
+
+class StreamingHTMLConverterTest(TestCase):
+    def setUp(self):
+        self.converter = StreamingHTMLConverter()
+
+    @staticmethod
+    def load_html():
+        n = os.path.join('tests', 'multi-p.html')
+        fullFileName = resource_filename('gs.group.list.base', n)
+        with codecs.open(fullFileName, encoding='utf-8') as infile:
+            retval = infile.read()
+        return retval
+
+    def test_feed(self):
+        'Test that the finished paragraphs are yielded by feed'
+        r = list(self.converter.feed('<p>Ethel the Frog.</p><p>Viol'))
+        self.assertEqual([], r)
+        r = list(self.converter.feed('ence.</p><p>Piranha'))
+        self.assertEqual(['Ethel the Frog.'], r)
+        r = list(self.converter.feed('</p><p>Brothers</p>'))
+        self.assertEqual(['Violence.'], r)
+        r = list(self.converter.close())
+        self.assertEqual(['Piranha', 'Brothers'], r)
+
+    def test_not_yielded(self):
+        'Test that paragraphs are kept if the generator is not used'
+        self.converter.feed('<p>Ethel the Frog.</p><p>Violence.</p><p>')
+        r = self.converter.feed('Piranha</p><p>')
+        self.assertEqual('Ethel the Frog.', next(r))
+        r = list(self.converter.close())
+        self.assertEqual(['Violence.', 'Piranha'], r)
+
+    def test_split_text(self):
+        'Test the text between two elements is split across chunks'
+        chunks = ['<p>Ethel <b>the</b>', '   ', ' Frog</p>']
+        r = list(iter_convert_to_txt(chunks))
+        expected = convert_to_txt(''.join(chunks))
+        self.assertEqual([expected], r)
+
+    def test_chunks(self):
+        'Test that the text is the same however the HTML is split'
+        html = self.load_html()
+        expected = convert_to_txt(html)
+        for size in (1, 3, 17, 256, len(html)):
+            chunks = [html[i:i + size] for i in range(0, len(html), size)]
+            r = '\n\n'.join(iter_convert_to_txt(chunks))
+            self.assertEqual(expected, r)
+
+    def test_paragraphs(self):
+        html = self.load_html()
+        r = list(iter_convert_to_txt([html]))
+        self.assertEqual(convert_to_txt(html).split('\n\n'), r)
+
+    def test_empty(self):
+        r = list(iter_convert_to_txt([]))
+        self.assertEqual([], r)
+
+    def test_unfed(self):
+        'Test that text without elements is not all held back'
+        chunk = 'Ethel the Frog &amp; violence. ' * 32
+        html = '<div>' + (chunk * 1000)
+        expected = convert_to_txt(html)
+        self.converter.feed('<div>')
+        for i in range(1000):
+            list(self.converter.feed(chunk))
+            self.assertLessEqual(len(self.converter.unfed),
+                                 self.converter.maxUnfed + len(chunk))
+        r = list(self.converter.close())
+        self.assertEqual([expected], r)
+
+    def test_unfed_split(self):
+        'Test that the text is split where the output is unchanged'
+        html = '<p>Ethel  &amp; the &#233;\n Frog &amp;&amp; x</p> Violence'
+        expected = convert_to_txt(html)
+        self.converter.maxUnfed = 0
+        r = []
+        for c in html:
+            r.extend(self.converter.feed(c))
+        r.extend(self.converter.close())
+        self.assertEqual(expected, '\n\n'.join(r))
+
+    def test_last_space(self):
+        self.assertEqual(9, self.converter.last_space('Ethel the Frog', 0))
+        self.assertEqual(-1, self.converter.last_space('Ethel &amp;', 0))
+        self.assertEqual(11, self.converter.last_space('Ethel &amp; Frog', 0))
+        self.assertEqual(-1, self.converter.last_space('Ethel  ', 0))
+        self.assertEqual(-1, self.converter.last_space('<p>Ethel the', 8))
+
+
+class HTMLConverterLimitsTest(TestCase):
+    html = '<p>Tonight on Ethel the Frog.</p><p>We look at violence.</p>'
+
+    def test_unlimited(self):
+        converter = HTMLConverter()
+        converter.feed(self.html)
+        converter.close()
+        self.assertIsNone(converter.truncated)
+        expected = 'Tonight on Ethel the Frog.\n\nWe look at violence.'
+        self.assertEqual(expected, unicodeOrString(converter))
+
+    def test_max_input(self):
+        converter = HTMLConverter(max_input=40)
+        converter.feed(self.html)
+        converter.close()
+        self.assertEqual(HTMLLimit.input_size, converter.truncated)
+        self.assertEqual(40, converter.inputSize)
+        expected = 'Tonight on Ethel the Frog.\n\nWe l\n\n[...]'
+        self.assertEqual(expected, unicodeOrString(converter))
+
+    def test_max_input_chunks(self):
+        'Test that the input is ignored after the limit is reached'
+        converter = HTMLConverter(max_input=40)
+        converter.feed(self.html[:30])
+        converter.feed(self.html[30:])
+        converter.feed('<p>Piranha</p>')
+        converter.close()
+        self.assertEqual(HTMLLimit.input_size, converter.truncated)
+        self.assertNotIn('Piranha', unicodeOrString(converter))
+
+    def test_max_output(self):
+        converter = HTMLConverter(max_output=10)
+        converter.feed(self.html)
+        converter.close()
+        self.assertEqual(HTMLLimit.output_size, converter.truncated)
+        self.assertEqual('Tonight on\n\n[...]', unicodeOrString(converter))
+
+    def test_max_elements(self):
+        html = '<div>' * 1000 + 'Ethel the Frog'
+        converter = HTMLConverter(max_elements=100)
+        converter.feed(html)
+        converter.close()
+        self.assertEqual(HTMLLimit.elements, converter.truncated)
+        self.assertEqual(101, converter.elementCount)
+        self.assertEqual('[...]', unicodeOrString(converter))
+
+    def test_max_references(self):
+        html = 'Ethel' + '&amp;' * 1000
+        converter = HTMLConverter(max_references=100)
+        converter.feed(html)
+        converter.close()
+        self.assertEqual(HTMLLimit.references, converter.truncated)
+        self.assertEqual(101, converter.referenceCount)
+        expected = 'Ethel' + '&' * 100 + '\n\n[...]'
+        self.assertEqual(expected, unicodeOrString(converter))
+
+    def test_max_references_unknown(self):
+        'Test that unknown entities count as references'
+        converter = HTMLConverter(max_references=1)
+        converter.feed('<p>Ethel&piranha;&amp;</p>')
+        converter.close()
+        self.assertEqual(HTMLLimit.references, converter.truncated)
+
+    def test_time_limit(self):
+        now = [0]
+
+        def clock():
+            now[0] += 1
+            return now[0]
+        # The clock is read when the HTML is first fed, and as each
+        # element is started and each piece of text is produced.
+        converter = HTMLConverter(time_limit=2, clock=clock)
+        converter.feed(self.html)
+        converter.close()
+        self.assertEqual(HTMLLimit.time, converter.truncated)
+        expected = 'Tonight on Ethel the Frog.\n\n[...]'
+        self.assertEqual(expected, unicodeOrString(converter))
+
+    def test_convert_to_txt(self):
+        r = convert_to_txt(self.html, max_output=10)
+        self.assertEqual('Tonight on\n\n[...]', r)
+
+    def test_stream(self):
+        'Test that the marker is the last paragraph of a stream'
+        chunks = [self.html[i:i + 5] for i in range(0, len(self.html), 5)]
+        for kwargs in ({'max_input': 30}, {'max_output': 30},
+                       {'max_elements': 1}):
+            r = list(iter_convert_to_txt(iter(chunks), **kwargs))
+            self.assertEqual('[...]', r[-1])
+            expected = convert_to_txt(self.html, **kwargs)
+            self.assertEqual(expected, '\n\n'.join(r))
+
+    def test_stream_stops(self):
+        'Test that the rest of the chunks are not read'
+        def chunks():
+            yield self.html
+            raise AssertionError('Read too many chunks')
+        r = list(iter_convert_to_txt(chunks(), max_output=10))
+        self.assertEqual(['Tonight on', '[...]'], r)
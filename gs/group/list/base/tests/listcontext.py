@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from unittest import TestCase
+from gs.group.list.base.cache import LRUCache
+from gs.group.list.base.emailmessage import EmailMessage
+from gs.group.list.base.listcontext import (get_list_context, ListContext,
+                                            listContexts)
+from gs.group.list.base.replyto import ReplyTo
+from gs.group.list.base.subject import SubjectMode
+
+
+class LRUCacheTest(TestCase):
+    def setUp(self):
+        self.cache = LRUCache(2)
+
+    def test_get_missing(self):
+        r = self.cache.get('ethel')
+        self.assertIsNone(r)
+        self.assertEqual(1, self.cache.misses)
+        self.assertEqual(0, self.cache.hits)
+
+    def test_get(self):
+        self.cache.set('ethel', 'frog')
+        r = self.cache.get('ethel')
+        self.assertEqual('frog', r)
+        self.assertEqual(1, self.cache.hits)
+        self.assertIn('ethel', self.cache)
+
+    def test_evict(self):
+        self.cache.set('ethel', 'frog')
+        self.cache.set('dinsdale', 'piranha')
+        self.cache.get('ethel')  # Now dinsdale is the least recently used
+        self.cache.set('doug', 'piranha')
+        self.assertEqual(2, len(self.cache))
+        self.assertNotIn('dinsdale', self.cache)
+        self.assertIn('ethel', self.cache)
+        self.assertEqual(1, self.cache.evictions)
+
+    def test_get_or_set(self):
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return 'frog'
+        self.assertEqual('frog', self.cache.get_or_set('ethel', factory))
+        self.assertEqual('frog', self.cache.get_or_set('ethel', factory))
+        self.assertEqual(1, len(calls))
+        self.assertEqual(1, self.cache.stats['hits'])
+        self.assertEqual(1, self.cache.stats['misses'])
+
+    def test_get_or_set_none(self):
+        'Test that a value of None is cached'
+        self.cache.get_or_set('ethel', lambda: None)
+        self.assertIsNone(self.cache.get_or_set('ethel', lambda: 'frog'))
+
+    def test_delete_clear(self):
+        self.cache.set('ethel', 'frog')
+        self.cache.delete('ethel')
+        self.cache.delete('ethel')
+        self.assertNotIn('ethel', self.cache)
+        self.cache.set('ethel', 'frog')
+        self.cache.get('ethel')
+        self.cache.clear()
+        self.assertEqual(0, len(self.cache))
+        self.assertEqual(0, self.cache.hits)
+
+    def test_maxsize(self):
+        with self.assertRaises(ValueError):
+            LRUCache(0)
+
+
+class ListContextTest(TestCase):
+    def test_strip_list_title(self):
+        c = ListContext('Ethel the Frog', 'ethel', 'example')
+        r = c.strip_list_title('[Ethel the Frog] Violence')
+        self.assertEqual('Violence', r)
+        self.assertEqual(ReplyTo.group, c.reply_to)
+
+    def test_strip_list_title_odd(self):
+        c = ListContext('Ethel (the) Frog?')
+        r = c.strip_list_title('Re: [Ethel (the) Frog?] Violence')
+        self.assertEqual('Re:  Violence', r)
+
+    def test_strip_list_title_none(self):
+        c = ListContext()
+        r = c.strip_list_title('[Ethel the Frog] Violence')
+        self.assertEqual('[Ethel the Frog] Violence', r)
+
+    def test_get_list_context(self):
+        c = get_list_context('Ethel the Frog', 'ethel', 'example')
+        self.assertIs(c, get_list_context('Ethel the Frog', 'ethel',
+                                          'example'))
+        self.assertIsNot(c, get_list_context('Ethel the Frog', 'ethel',
+                                             'example', ReplyTo.author))
+        key = ('Ethel the Frog', 'ethel', 'example', ReplyTo.group,
+               SubjectMode.legacy)
+        self.assertIn(key, listContexts)
+
+    def test_message(self):
+        m = 'Subject: [Ethel the Frog] Violence\n\nBody\n'
+        c = get_list_context('Ethel the Frog', 'ethel', 'example')
+        r = EmailMessage(m, list_context=c)
+        self.assertIs(c, r.listContext)
+        self.assertEqual('ethel', r.group_id)
+        self.assertEqual('example', r.site_id)
+        self.assertEqual('Violence', r.subject)
+        expected = EmailMessage(m, 'Ethel the Frog', 'ethel', 'example')
+        self.assertEqual(expected.topic_id, r.topic_id)
+        self.assertEqual(expected.post_id, r.post_id)
+
+    def test_message_title_changed(self):
+        'Test that the list title on the message is still used'
+        m = 'Subject: [Ethel the Frog] Violence\n\nBody\n'
+        r = EmailMessage(m, list_context=ListContext('Ethel'))
+        r.list_title = 'Ethel the Frog'
+        self.assertEqual('Violence', r.subject)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+from gs.group.list.base.emailmessage import EmailMessage
+from gs.group.list.base.listcontext import get_list_context
+from gs.group.list.base.parsecache import ParseCache
+
+
+class ParseCacheTest(TestCase):
+    m = '''From: Me <a.member@example.com>
+To: Group <group@groups.example.com>
+Subject: {0}
+
+Tonight on Ethel the Frog we look at violence.\n'''
+
+    def setUp(self):
+        self.cache = ParseCache(':memory:')
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_parse(self):
+        m = self.m.format('Violence')
+        r = self.cache.parse(m, group_id='ethel')
+        expected = EmailMessage(m, group_id='ethel')
+        self.assertEqual(expected.post_id, r.post_id)
+        self.assertEqual(0, self.cache.hits)
+        self.assertEqual(1, self.cache.misses)
+        self.assertEqual(r, self.cache.parse(m, group_id='ethel'))
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(0.5, self.cache.hit_rate)
+        self.assertEqual(1, len(self.cache))
+
+    def test_context(self):
+        'Ensure the same message in different groups is cached twice'
+        m = self.m.format('Violence')
+        r = self.cache.parse(m, group_id='ethel')
+        c = get_list_context(group_id='dinsdale')
+        r2 = self.cache.parse(m, list_context=c)
+        self.assertNotEqual(r.topic_id, r2.topic_id)
+        self.assertEqual(2, len(self.cache))
+        self.assertEqual(0, self.cache.hits)
+
+    def test_bytes(self):
+        m = self.m.format('Violence')
+        self.cache.parse(m)
+        self.cache.parse(m.encode('utf-8'))
+        self.assertEqual(2, self.cache.misses)
+
+    def test_evict(self):
+        m = self.m.format('Violence')
+        size = len(self.cache.parse(m).to_bytes())
+        self.cache.max_size = (size * 2) + 16
+        self.cache.parse(self.m.format('Gangland'))
+        self.cache.parse(m)  # Now Gangland is the least recently used
+        self.cache.parse(self.m.format('Piranhas'))
+        self.assertEqual(2, len(self.cache))
+        self.assertEqual(1, self.cache.evictions)
+        self.assertLessEqual(self.cache.size, self.cache.max_size)
+        self.cache.parse(m)
+        self.assertEqual(2, self.cache.hits)
+
+    def test_evict_batches(self):
+        'Test that more snapshots than are in a batch can be evicted'
+        self.cache.evictBatch = 2
+        subjects = ['Violence', 'Gangland', 'Piranhas', 'Cheese', 'Spam']
+        for subject in subjects:
+            self.cache.parse(self.m.format(subject))
+        self.cache.max_size = self.cache.size // 4
+        self.cache.parse(self.m.format('Dinsdale'))
+        self.assertLessEqual(self.cache.size, self.cache.max_size)
+        self.assertLessEqual(4, self.cache.evictions)
+        r = self.cache.parse(self.m.format('Dinsdale'))
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual('Dinsdale', r.subject)
+
+    def test_hit_rate_empty(self):
+        self.assertEqual(0.0, self.cache.hit_rate)
+
+    def test_clear(self):
+        self.cache.parse(self.m.format('Violence'))
+        self.cache.clear()
+        self.assertEqual(0, len(self.cache))
+        self.assertEqual(0, self.cache.size)
+
+    def test_persistent(self):
+        tempDir = mkdtemp()
+        try:
+            path = os.path.join(tempDir, 'cache.sqlite')
+            m = self.m.format('Violence')
+            with ParseCache(path) as cache:
+                expected = cache.parse(m)
+            with ParseCache(path) as cache:
+                self.assertEqual(expected, cache.parse(m))
+                self.assertEqual(1, cache.hits)
+                self.assertEqual(len(expected.to_bytes()), cache.size)
+        finally:
+            rmtree(tempDir)
+
+    def test_shared(self):
+        'Ensure caches that share a database agree on the size and age'
+        tempDir = mkdtemp()
+        try:
+            path = os.path.join(tempDir, 'cache.sqlite')
+            with ParseCache(path) as a, ParseCache(path) as b:
+                a.parse(self.m.format('Violence'))
+                b.parse(self.m.format('Gangland'))
+                self.assertEqual(a.size, b.size)
+                a.max_size = a.size + 16
+                b.parse(self.m.format('Violence'))
+                self.assertEqual(1, b.hits)
+                # Gangland is the least recently used, by either cache
+                a.parse(self.m.format('Piranhas'))
+                self.assertEqual(1, a.evictions)
+                self.assertEqual(2, len(b))
+                self.assertLessEqual(b.size, a.max_size)
+                b.parse(self.m.format('Violence'))
+                self.assertEqual(2, b.hits)
+                b.parse(self.m.format('Gangland'))
+                self.assertEqual(2, b.misses)
+        finally:
+            rmtree(tempDir)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+from gs.group.list.base.emailmessage import EmailMessage
+from gs.group.list.base.postidfilter import PostIdFilter
+
+
+class PostIdFilterTest(TestCase):
+    def setUp(self):
+        self.filter = PostIdFilter(capacity=1000, error_rate=0.01)
+
+    def tearDown(self):
+        self.filter.close()
+
+    def test_add(self):
+        self.assertFalse(self.filter.add('ZTcsX0Tw8Nww2LggPn78Y'))
+        self.assertTrue(self.filter.add('ZTcsX0Tw8Nww2LggPn78Y'))
+        self.assertIn('ZTcsX0Tw8Nww2LggPn78Y', self.filter)
+        self.assertNotIn('2kxkamRQ35fmTJ6pTRK8yN', self.filter)
+        self.assertEqual(1, self.filter.count)
+
+    def test_message(self):
+        m = '''From: Me <a.member@example.com>
+To: Group <group@groups.example.com>
+Subject: Violence
+
+Tonight on Ethel the Frog we look at violence.\n'''
+        first = EmailMessage(m, group_id='ethel')
+        again = EmailMessage(m, group_id='ethel')
+        self.assertFalse(self.filter.add(first.post_id))
+        self.assertTrue(self.filter.add(again.post_id))
+
+    def test_false_positives(self):
+        for i in range(990):
+            self.filter.add('post{0}'.format(i))
+        # The count skips the (rare) identifiers that look like repeats
+        self.assertGreater(self.filter.count, 950)
+        self.assertEqual(0, self.filter.current)
+        falsePositives = sum(1 for i in range(10000)
+                             if 'other{0}'.format(i) in self.filter)
+        # Allow for some bad luck
+        self.assertLess(falsePositives, 300)
+        self.assertLess(self.filter.false_positive_rate, 0.02)
+
+    def test_clear(self):
+        self.filter.add('ZTcsX0Tw8Nww2LggPn78Y')
+        self.filter.rotate()
+        self.filter.add('2kxkamRQ35fmTJ6pTRK8yN')
+        self.filter.clear()
+        self.assertNotIn('ZTcsX0Tw8Nww2LggPn78Y', self.filter)
+        self.assertNotIn('2kxkamRQ35fmTJ6pTRK8yN', self.filter)
+        self.assertEqual(0, self.filter.count)
+        self.assertEqual(0, self.filter.olderCount)
+        self.assertEqual(0.0, self.filter.false_positive_rate)
+
+    def test_rotate(self):
+        'Test that the older generation is still seen, until it is rotated'
+        self.filter.add('ZTcsX0Tw8Nww2LggPn78Y')
+        self.filter.rotate()
+        self.assertEqual(1, self.filter.current)
+        self.assertEqual(1, self.filter.olderCount)
+        self.assertIn('ZTcsX0Tw8Nww2LggPn78Y', self.filter)
+        self.filter.rotate()
+        self.assertNotIn('ZTcsX0Tw8Nww2LggPn78Y', self.filter)
+
+    def test_add_older(self):
+        'Test that an identifier in the older generation is kept'
+        self.filter.add('ZTcsX0Tw8Nww2LggPn78Y')
+        self.filter.rotate()
+        self.assertTrue(self.filter.add('ZTcsX0Tw8Nww2LggPn78Y'))
+        self.assertEqual(1, self.filter.count)
+        self.filter.rotate()
+        self.assertIn('ZTcsX0Tw8Nww2LggPn78Y', self.filter)
+
+    def test_rotate_full(self):
+        'Test that the recent identifiers are kept as the filter rotates'
+        f = PostIdFilter(capacity=100, error_rate=0.0001)
+        try:
+            for i in range(1000):
+                f.add('post{0}'.format(i))
+            self.assertLess(f.count, 100)
+            recent = 900 + f.count
+            self.assertTrue(all('post{0}'.format(i) in f
+                                for i in range(recent, 1000)))
+            forgotten = sum(1 for i in range(800) if 'post{0}'.format(i) in f)
+            self.assertLess(forgotten, 5)
+        finally:
+            f.close()
+
+    def test_file(self):
+        tempDir = mkdtemp()
+        try:
+            path = os.path.join(tempDir, 'postids.bloom')
+            with PostIdFilter(path, capacity=1000) as f:
+                f.add('ZTcsX0Tw8Nww2LggPn78Y')
+                f.rotate()
+                f.add('2kxkamRQ35fmTJ6pTRK8yN')
+                bits = f.bits
+            with PostIdFilter(path, capacity=10) as f:
+                self.assertEqual(bits, f.bits)
+                self.assertEqual(1000, f.capacity)
+                self.assertEqual(1, f.current)
+                self.assertEqual(1, f.count)
+                self.assertEqual(1, f.olderCount)
+                self.assertIn('2kxkamRQ35fmTJ6pTRK8yN', f)
+                self.assertIn('ZTcsX0Tw8Nww2LggPn78Y', f)
+        finally:
+            rmtree(tempDir)
+
+    def test_not_filter(self):
+        tempDir = mkdtemp()
+        try:
+            path = os.path.join(tempDir, 'violence.txt')
+            with open(path, 'wb') as outFile:
+                outFile.write(b'Tonight on Ethel the Frog we look at '
+                              b'violence.\n')
+            with self.assertRaises(ValueError):
+                PostIdFilter(path)
+        finally:
+            rmtree(tempDir)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from mock import MagicMock
+from unittest import TestCase
+from zope.interface.verify import verifyObject
+from gs.group.list.base.emailmessage import EmailMessage
+from gs.group.list.base.interfaces import ISenderIdResolver
+from gs.group.list.base.senderid import (
+    CachedSenderIdCallback, CallbackResolver, resolve_sender_ids)
+
+
+class ResolveSenderIdsTest(TestCase):
+    m = '''From: {0}
+To: Group <group@groups.example.com>
+Subject: Violence
+
+Tonight on Ethel the Frog we look at violence.\n'''
+
+    def setUp(self):
+        self.senderIdCb = MagicMock(side_effect=AssertionError)
+        froms = ('Me <a.member@example.com>', 'a.member@example.com',
+                 'Dinsdale <dinsdale@example.com>', 'Doug <doug@example.com>')
+        self.messages = [EmailMessage(self.m.format(f),
+                                      sender_id_cb=self.senderIdCb)
+                         for f in froms]
+        self.resolver = MagicMock()
+        self.resolver.resolve.return_value = {
+            'a.member@example.com': 'amember', 'dinsdale@example.com': ''}
+
+    def test_resolve(self):
+        r = resolve_sender_ids(self.messages, self.resolver)
+        self.resolver.resolve.assert_called_once_with(
+            ['a.member@example.com', 'dinsdale@example.com',
+             'doug@example.com'])
+        self.assertEqual('amember', r['a.member@example.com'])
+        ids = [m.sender_id for m in self.messages]
+        self.assertEqual(['amember', 'amember', '', ''], ids)
+        self.assertEqual(0, self.senderIdCb.call_count)
+
+    def test_no_sender(self):
+        m = EmailMessage('Subject: Violence\n\nBody\n')
+        r = resolve_sender_ids([m], self.resolver)
+        self.assertEqual({}, r)
+        self.assertEqual(0, self.resolver.resolve.call_count)
+        self.assertEqual('', m.sender_id)
+
+    def test_callback_resolver(self):
+        cb = MagicMock(return_value='amember')
+        resolver = CallbackResolver(cb)
+        self.assertTrue(verifyObject(ISenderIdResolver, resolver))
+        resolve_sender_ids(self.messages[:2], resolver)
+        cb.assert_called_once_with('a.member@example.com')
+        self.assertEqual('amember', self.messages[1].sender_id)
+
+
+class CachedSenderIdCallbackTest(TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        ids = {'a.member@example.com': 'amember'}
+        self.senderIdCb = MagicMock(side_effect=lambda a: ids.get(a, ''))
+        self.cb = CachedSenderIdCallback(self.senderIdCb, ttl=300,
+                                         negative_ttl=60, maxsize=2,
+                                         clock=lambda: self.now)
+
+    def test_cached(self):
+        self.assertEqual('amember', self.cb('a.member@example.com'))
+        self.assertEqual('amember', self.cb('a.member@example.com'))
+        self.assertEqual(1, self.senderIdCb.call_count)
+        self.assertEqual(1, self.cb.stats['known']['hits'])
+
+    def test_expired(self):
+        self.cb('a.member@example.com')
+        self.now += 301
+        self.assertEqual('amember', self.cb('a.member@example.com'))
+        self.assertEqual(2, self.senderIdCb.call_count)
+        self.assertEqual(1, self.cb.stats['expired'])
+
+    def test_negative(self):
+        self.assertEqual('', self.cb('spam@example.com'))
+        self.assertEqual('', self.cb('spam@example.com'))
+        self.assertEqual(1, self.senderIdCb.call_count)
+        self.assertNotIn('spam@example.com', self.cb.known)
+        self.now += 61
+        self.cb('spam@example.com')
+        self.assertEqual(2, self.senderIdCb.call_count)
+
+    def test_negative_bounded(self):
+        'Test that unknown addresses do not evict the known addresses'
+        self.cb('a.member@example.com')
+        for i in range(10):
+            self.cb('spam{0}@example.com'.format(i))
+        self.assertEqual(2, len(self.cb.unknown))
+        self.assertIn('a.member@example.com', self.cb.known)
+
+    def test_invalidate(self):
+        self.cb('a.member@example.com')
+        self.cb('spam@example.com')
+        self.cb.invalidate('a.member@example.com')
+        self.cb('a.member@example.com')
+        self.cb('spam@example.com')
+        self.assertEqual(3, self.senderIdCb.call_count)
+        self.cb.invalidate()
+        self.assertEqual(0, len(self.cb.known) + len(self.cb.unknown))
+
+    def test_message(self):
+        m = ResolveSenderIdsTest.m.format('a.member@example.com')
+        r = [EmailMessage(m, sender_id_cb=self.cb) for i in range(3)]
+        self.assertEqual(['amember'] * 3, [e.sender_id for e in r])
+        self.assertEqual(1, self.senderIdCb.call_count)
+
+    def test_resolver(self):
+        self.assertTrue(verifyObject(ISenderIdResolver, self.cb))
+        r = self.cb.resolve(['a.member@example.com', 'spam@example.com'])
+        self.assertEqual({'a.member@example.com': 'amember',
+                          'spam@example.com': ''}, r)
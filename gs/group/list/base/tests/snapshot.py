@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from glob import glob
+import os
+from pickle import dumps, loads
+from pkg_resources import resource_filename
+from unittest import TestCase
+from gs.group.list.base.emailmessage import EmailMessage
+from gs.group.list.base.snapshot import ParsedPost
+
+
+class ParsedPostTest(TestCase):
+    def setUp(self):
+        emails = os.path.join('tests', 'emails')
+        dirName = resource_filename('gs.group.list.base', emails)
+        self.messages = []
+        for fileName in sorted(glob(os.path.join(dirName, '*.eml'))):
+            with open(fileName, 'rb') as infile:
+                self.messages.append(EmailMessage(infile.read(),
+                                                  group_id='ethel'))
+
+    def test_snapshot(self):
+        for m in self.messages:
+            r = m.snapshot()
+            self.assertEqual(m.post_id, r.post_id)
+            self.assertEqual(m.topic_id, r.topic_id)
+            self.assertEqual(m.subject, r.subject)
+            self.assertEqual(m.name, r.name)
+            self.assertEqual(m.html_body, r.html_body)
+            self.assertEqual(m.encoding, r.encoding)
+            self.assertEqual(len(m.attachments), len(r.attachments))
+            self.assertEqual([a['fileid'] for a in m.attachments],
+                             [a.fileid for a in r.attachments])
+
+    def test_frozen(self):
+        r = self.messages[0].snapshot()
+        with self.assertRaises(AttributeError):
+            r.subject = 'Violence'
+
+    def test_pickle(self):
+        for m in self.messages:
+            s = m.snapshot()
+            r = loads(dumps(s, 2))
+            self.assertEqual(s, r)
+            self.assertIsInstance(r, ParsedPost)
+
+    def test_bytes(self):
+        for m in self.messages:
+            s = m.snapshot()
+            r = ParsedPost.from_bytes(s.to_bytes())
+            self.assertEqual(s, r)
+
+    def test_bytes_none(self):
+        'Ensure that None values (such as the charset) are kept'
+        m = self.messages[0]
+        s = m.snapshot()._replace(sender_id=None)
+        r = ParsedPost.from_bytes(s.to_bytes())
+        self.assertIsNone(r.sender_id)
+        self.assertEqual(s.attachments, r.attachments)
+
+    def test_bytes_not_snapshot(self):
+        with self.assertRaises(ValueError):
+            ParsedPost.from_bytes(b'Violence')
+
+    def test_bytes_truncated(self):
+        data = self.messages[0].snapshot().to_bytes()
+        with self.assertRaises(ValueError):
+            ParsedPost.from_bytes(data[:-1])
+        with self.assertRaises(ValueError):
+            ParsedPost.from_bytes(data + b'\0')
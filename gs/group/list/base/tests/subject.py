@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# Copyright © 2015 OnlineGroups.net and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################
+from __future__ import absolute_import, unicode_literals
+from unittest import TestCase
+from gs.group.list.base.emailmessage import EmailMessage
+from gs.group.list.base.listcontext import get_list_context
+from gs.group.list.base.subject import SubjectMode, SubjectStripper
+
+
+class SubjectStripperTest(TestCase):
+    def setUp(self):
+        self.stripper = SubjectStripper('Ethel the Frog')
+
+    def assertStripped(self, expected, subject, remove_re=True):
+        r = self.stripper.strip(subject, remove_re)
+        self.assertEqual(expected, r)
+
+    def test_title(self):
+        self.assertStripped('Violence', '[Ethel the Frog] Violence')
+
+    def test_title_middle(self):
+        'Test that the list title is only removed from the start'
+        self.assertStripped('Violence [Ethel the Frog]',
+                            'Violence [Ethel the Frog]')
+
+    def test_re(self):
+        self.assertStripped('Violence', 'Re: [Ethel the Frog] RE: Violence')
+
+    def test_re_middle(self):
+        'Test that "re:" is only removed from the start'
+        self.assertStripped('Gangland: re: Violence',
+                            'Re: Gangland: re: Violence')
+        self.assertStripped('Area: 51', 'Area: 51')
+
+    def test_re_count(self):
+        self.assertStripped('Violence', 'Re[2]: Re^3: Re(4): Violence')
+
+    def test_multilingual(self):
+        self.assertStripped('Violence', 'AW: SV: Antw: Vs: Violence')
+        self.assertStripped('Violence', 'WG: TR: RV: Violence')
+
+    def test_chinese(self):
+        self.assertStripped('暴力', '回复：[Ethel the Frog] 暴力')
+
+    def test_fwd(self):
+        self.assertStripped('Violence', '[Fwd: Violence]')
+
+    def test_fwd_nested(self):
+        self.assertStripped('I am a fish',
+                            'Re: [Fwd: Re: [Fwd: I am a fish] ]')
+
+    def test_fwd_unclosed(self):
+        'Test that a bracket that is not closed at the end is kept'
+        self.assertStripped('[Fwd: I am a fish', '[Fwd: I am a fish')
+        self.assertStripped('[Fwd: hi] there', '[Fwd: hi] there')
+        self.assertStripped('[Fwd: hi] there', '[Fwd: hi] there', False)
+        self.assertStripped('[Fwd: hi] there', 'Re: [Fwd: hi] there')
+        self.assertStripped('Re: [Fwd: hi] there', 'Re: [Fwd: hi] there',
+                            False)
+
+    def test_fwd_nested_unclosed(self):
+        'Test that only the forwards that are closed are removed'
+        self.assertStripped('[Fwd: I am] a fish',
+                            '[Fwd: [Fwd: I am] a fish]')
+
+    def test_bracket_tag(self):
+        'Test that square brackets that are not forwards are kept'
+        self.assertStripped('[Python] Violence', '[Python] Violence')
+
+    def test_keep_re(self):
+        self.assertStripped('Re: Fwd: Violence',
+                            'Re: [Ethel the Frog] [Fwd: Violence]', False)
+
+    def test_whitespace(self):
+        self.assertStripped('Violence in British Gangland',
+                            ' Re:\uFEFF Violence  in\t British\n '
+                            'Gangland \u202E')
+
+    def test_empty(self):
+        self.assertStripped('No subject', '')
+        self.assertStripped('No subject', 'Re: [Ethel the Frog]')
+
+    def test_no_title(self):
+        r = SubjectStripper().strip('Re: [Ethel the Frog] Violence')
+        self.assertEqual('[Ethel the Frog] Violence', r)
+
+
+class SubjectModeTest(TestCase):
+    m = '''From: Me <a.member@example.com>
+To: Group <group@groups.example.com>
+Subject: {0}
+
+Tonight on Ethel the Frog we look at violence.\n'''
+
+    def message(self, subject, mode):
+        c = get_list_context('Ethel the Frog', 'ethel', 'example',
+                             subject_mode=mode)
+        retval = EmailMessage(self.m.format(subject), list_context=c)
+        return retval
+
+    def test_legacy_default(self):
+        'Test that the legacy topic identifiers are kept by default'
+        subject = 'Re: [Ethel the Frog] Violence'
+        r = self.message(subject, SubjectMode.legacy)
+        expected = EmailMessage(self.m.format(subject), 'Ethel the Frog',
+                                'ethel', 'example')
+        self.assertEqual(expected.topic_id, r.topic_id)
+        self.assertEqual(expected.post_id, r.post_id)
+
+    def test_legacy_middle(self):
+        r = self.message('Gangland: re: Violence', SubjectMode.legacy)
+        self.assertEqual('Gangland: Violence', r.subject)
+
+    def test_prefix(self):
+        r = self.message('AW: [Ethel the Frog] Violence', SubjectMode.prefix)
+        self.assertEqual('Violence', r.subject)
+        expected = self.message('Violence', SubjectMode.prefix)
+        self.assertEqual(expected.topic_id, r.topic_id)
+
+    def test_prefix_middle(self):
+        r = self.message('Gangland: re: Violence', SubjectMode.prefix)
+        self.assertEqual('Gangland: re: Violence', r.subject)
@@ -14,11 +14,39 @@
 ############################################################################
 from __future__ import absolute_import, unicode_literals
 from unittest import TestSuite, main as unittest_main
+from gs.group.list.base.tests.attachment import (AttachmentTest,
+                                                  CalculateFileIdTest,
+                                                  IterDecodedTest)
+from gs.group.list.base.tests.attachmentstore import (
+    FileAttachmentStoreTest)
+from gs.group.list.base.tests.batch import ParseManyTest
+from gs.group.list.base.tests.builder import EmailMessageBuilderTest
+from gs.group.list.base.tests.charset import CharsetResolverTest
 from gs.group.list.base.tests.emailmessage import EmailMessageTest
+from gs.group.list.base.tests.headers import (HeaderOverlayTest,
+                                              EmailMessageHeadersTest)
 from gs.group.list.base.tests.html2txt import (
-    HTMLConverterTest, ConvertToTextTest)
+    HTMLConverterTest, ConvertToTextTest, StreamingHTMLConverterTest,
+    HTMLConverterLimitsTest)
+from gs.group.list.base.tests.listcontext import (LRUCacheTest,
+                                                  ListContextTest)
+from gs.group.list.base.tests.parsecache import ParseCacheTest
+from gs.group.list.base.tests.postidfilter import PostIdFilterTest
 from gs.group.list.base.tests.replyto import ReplyToTest
-testCases = (EmailMessageTest, HTMLConverterTest, ConvertToTextTest, ReplyToTest)
+from gs.group.list.base.tests.senderid import (ResolveSenderIdsTest,
+                                               CachedSenderIdCallbackTest)
+from gs.group.list.base.tests.snapshot import ParsedPostTest
+from gs.group.list.base.tests.subject import (SubjectStripperTest,
+                                              SubjectModeTest)
+testCases = (EmailMessageTest, HTMLConverterTest, ConvertToTextTest,
+             ReplyToTest, EmailMessageBuilderTest, AttachmentTest,
+             CalculateFileIdTest, IterDecodedTest, ParseManyTest,
+             HeaderOverlayTest, EmailMessageHeadersTest, LRUCacheTest,
+             ListContextTest, SubjectStripperTest, SubjectModeTest,
+             ResolveSenderIdsTest, CachedSenderIdCallbackTest,
+             ParsedPostTest, ParseCacheTest, PostIdFilterTest,
+             FileAttachmentStoreTest, CharsetResolverTest,
+             StreamingHTMLConverterTest, HTMLConverterLimitsTest)
 
 
 def load_tests(loader, tests, pattern):